@@ -1,28 +1,55 @@
-﻿from flask import Flask, render_template, request, redirect, url_for, session
+﻿from flask import Flask, Response, render_template, request, redirect, url_for, session, stream_with_context
 from decimal import Decimal
 from datetime import datetime
-from email.message import EmailMessage
 import csv
+import json
 import os
-import smtplib
 import secrets
+import threading
 import time
 
 try:
-    from . import dados
+    from . import cadastros, correio, dados, usuarios
 except ImportError:
+    import cadastros
+    import correio
     import dados
+    import usuarios
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "genio-secret-key")
 INACTIVITY_SECONDS = 180
+EVENTOS_KEEPALIVE_SECONDS = 25
+# Cada stream SSE ocupa uma thread do gthread: a conexão fecha depois de
+# EVENTOS_CONEXAO_SECONDS (o EventSource reconecta sozinho) e, acima de
+# EVENTOS_MAX_CONEXOES streams abertos, o dashboard volta ao polling
+EVENTOS_CONEXAO_SECONDS = int(os.environ.get("EVENTOS_CONEXAO_SECONDS", "120"))
+EVENTOS_MAX_CONEXOES = int(os.environ.get("EVENTOS_MAX_CONEXOES", "8"))
+EXTRATO_PAGINA = 50
+EXTRATO_PAGINA_MAX = 500
+EVOLUCAO_PONTOS_MIN = 3
+EVOLUCAO_PONTOS_MAX = 5000
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 CSV_DIR = os.path.join(BASE_DIR, "csv")
-USER_CSV = os.path.join(CSV_DIR, "usuarios.csv")
-CADASTRO_CSV = os.path.join(CSV_DIR, "cadastro.csv")
 ENCARGOS_CSV = os.path.join(CSV_DIR, "encargos.csv")
 
+_eventos_vagas = threading.BoundedSemaphore(EVENTOS_MAX_CONEXOES)
+
+
+def iniciar_servicos():
+    """Sobe as threads de segundo plano do processo que atende as requisições.
+
+    Chamada pelo post_fork de gunicorn.conf.py (uma vez por worker) e pelo __main__;
+    importar o módulo não inicia nada.
+    """
+    # Regera informacoes.csv/relatorio.csv em segundo plano quando as planilhas mudam
+    dados.iniciar_atualizador()
+    # Envia os e-mails enfileirados por _send_email (inclusive os que ficaram de uma execução
+    # anterior), com novas tentativas em caso de falha; CORREIO_WORKER_SEGUNDOS=0 desliga
+    correio.iniciar_worker()
+
+
 def _normalizar_cpf(cpf):
     return "".join(ch for ch in str(cpf or "") if ch.isdigit())
 
@@ -32,70 +59,29 @@ def _normalizar_email(email):
 
 
 def validar_login(usuario, senha):
-    with open(USER_CSV, newline="", encoding="utf-8") as file:
-        leitor = csv.DictReader(file)
-        for linha in leitor:
-            if linha["usuario"] == usuario and linha["senha"] == senha:
-                return True
-    
-    return False
+    # Credenciais em memória (recarregadas quando usuarios.csv muda), senhas com hash
+    return usuarios.validar_login(usuario, senha)
 
 def cadastro_existente(cpf, email):
-    if not os.path.exists(CADASTRO_CSV):
-        return False
-
-    cpf_norm = _normalizar_cpf(cpf)
-    email_norm = _normalizar_email(email)
+    return cadastros.existe(cpf, email)
 
-    with open(CADASTRO_CSV, newline="", encoding="utf-8") as file:
-        leitor = csv.DictReader(file)
-        for linha in leitor:
-            cpf_linha = _normalizar_cpf(linha.get("cpf"))
-            email_linha = _normalizar_email(linha.get("email"))
-            if (cpf_norm and cpf_linha == cpf_norm) or (email_norm and email_linha == email_norm):
-                return True
-            
-    return False
 
 def buscar_nome_por_cpf(cpf):
-    if not cpf or not os.path.exists(CADASTRO_CSV):
+    if not cpf:
         return None
-
-    with open(CADASTRO_CSV, newline="", encoding="utf-8") as file:
-        leitor = csv.DictReader(file)
-        for linha in leitor:
-            if linha.get("cpf") == cpf:
-                return linha.get("nome")
-
-    return None
+    return cadastros.buscar_nome_por_cpf(cpf)
 
 
 def buscar_nome_por_cpf_informacoes(cpf):
-    if not cpf or not os.path.exists(dados.INFORMACOES_CSV):
-        return None
-
-    cpf_norm = dados._normalizar_cpf(cpf)
-    if not cpf_norm:
+    if not cpf:
         return None
 
     try:
-        with open(dados.INFORMACOES_CSV, newline="", encoding="utf-8") as file:
-            leitor = csv.DictReader(file)
-            if not leitor.fieldnames:
-                return None
-            campos = {name: (name or "").strip().lower() for name in leitor.fieldnames}
-            cpf_col = next((orig for orig, low in campos.items() if "cpf" in low), None)
-            nome_col = next((orig for orig, low in campos.items() if "nome" in low), None)
-            if not cpf_col or not nome_col:
-                return None
-            for linha in leitor:
-                cpf_val = dados._normalizar_cpf(linha.get(cpf_col))
-                if cpf_val == cpf_norm:
-                    return (linha.get(nome_col) or "").strip() or None
+        participante = dados.buscar_participante_por_cpf(cpf)
     except Exception:
         return None
 
-    return None
+    return participante.get("nome") if participante else None
 
 
 def carregar_encargos():
@@ -184,43 +170,8 @@ def _is_protected_path():
 
 
 def _send_email(to_address, subject, body, html_body=None):
-    smtp_host = os.environ.get("SMTP_HOST", "smtp.gmail.com")
-    smtp_port_raw = os.environ.get("SMTP_PORT", "587")
-    smtp_user = os.environ.get("SMTP_USER")
-    smtp_pass = os.environ.get("SMTP_PASS")
-    smtp_use_ssl = os.environ.get("SMTP_USE_SSL", "0").lower() in ["1", "true", "yes", "on"]
-
-    if not smtp_user or not smtp_pass:
-        raise RuntimeError("SMTP_USER/SMTP_PASS nao configurados")
-
-    try:
-        smtp_port = int(smtp_port_raw)
-    except ValueError:
-        raise RuntimeError("SMTP_PORT invalido")
-
-    destino = (to_address or "").strip() or smtp_user
-
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = smtp_user
-    msg["To"] = destino
-    msg.set_content(body)
-    if html_body:
-        msg.add_alternative(html_body, subtype="html")
-
-    try:
-        if smtp_use_ssl:
-            server = smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20)
-        else:
-            server = smtplib.SMTP(smtp_host, smtp_port, timeout=20)
-        with server:
-            if not smtp_use_ssl:
-                server.starttls()
-            server.login(smtp_user, smtp_pass)
-            server.send_message(msg)
-    except Exception as exc:
-        raise RuntimeError(f"falha SMTP {smtp_host}:{smtp_port} ({type(exc).__name__})") from exc
-
+    # Só grava na fila (csv/correio.sqlite3); o worker do correio faz o envio SMTP
+    _, destino = correio.enfileirar(to_address, subject, body, html_body)
     return destino
 
 
@@ -237,85 +188,19 @@ def _gerar_codigo_verificacao():
 
 
 def _buscar_cadastro_por_cpf_ou_email(cpf, email):
-    if not os.path.exists(CADASTRO_CSV):
-        return None
-
-    cpf_norm = _normalizar_cpf(cpf)
-    email_norm = _normalizar_email(email)
-
-    with open(CADASTRO_CSV, newline="", encoding="utf-8") as file:
-        leitor = csv.DictReader(file)
-        for linha in leitor:
-            cpf_linha = _normalizar_cpf(linha.get("cpf"))
-            email_linha = _normalizar_email(linha.get("email"))
-            if (cpf_norm and cpf_linha == cpf_norm) or (email_norm and email_linha == email_norm):
-                return linha
-    return None
+    return cadastros.buscar(cpf, email)
 
 
 def _atualizar_cadastro_por_cpf_ou_email(cpf, email, updates):
-    if not os.path.exists(CADASTRO_CSV):
-        return False
-
-    cpf_norm = _normalizar_cpf(cpf)
-    email_norm = _normalizar_email(email)
-
-    with open(CADASTRO_CSV, newline="", encoding="utf-8") as file:
-        leitor = csv.DictReader(file)
-        fieldnames = leitor.fieldnames or []
-        rows = list(leitor)
-
-    if not fieldnames:
-        return False
-
-    for key in updates.keys():
-        if key not in fieldnames:
-            fieldnames.append(key)
-
-    updated = False
-    for row in rows:
-        cpf_row = _normalizar_cpf(row.get("cpf"))
-        email_row = _normalizar_email(row.get("email"))
-        if (cpf_norm and cpf_row == cpf_norm) or (email_norm and email_row == email_norm):
-            for key, value in updates.items():
-                row[key] = value
-            updated = True
-            break
-
-    if not updated:
-        return False
-
-    with open(CADASTRO_CSV, "w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-
-    return True
+    return cadastros.atualizar(cpf, email, updates)
 
 
-def _garantir_campos_cadastro(campos):
-    if not os.path.exists(CADASTRO_CSV):
-        return campos
-
-    with open(CADASTRO_CSV, newline="", encoding="utf-8") as file:
-        leitor = csv.DictReader(file)
-        fieldnames = leitor.fieldnames or []
-        rows = list(leitor)
-
-    novos = list(fieldnames)
-    for campo in campos:
-        if campo not in novos:
-            novos.append(campo)
-
-    if novos == fieldnames:
-        return fieldnames
-
-    with open(CADASTRO_CSV, "w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=novos)
-        writer.writeheader()
-        writer.writerows(rows)
-
-    return novos
+def _resposta_condicional(payload, etag):
+    # Responde 304 quando o cliente já tem esta versão (If-None-Match)
+    resposta = app.json.response(payload)
+    resposta.set_etag(etag)
+    resposta.headers["Cache-Control"] = "no-cache"
+    return resposta.make_conditional(request)
 
 
 def _primeiro_nome(texto):
@@ -343,7 +228,9 @@ def verificar_sessao():
         session.clear()
         return redirect(url_for("login", msg="sessao_expirada"))
 
-    session["last_activity"] = now
+    # Reconexão do SSE não é atividade do usuário: não prorroga a sessão
+    if request.path != "/eventos":
+        session["last_activity"] = now
     return None
 
 @app.route("/", methods=["GET", "POST"])
@@ -397,7 +284,15 @@ def cadastro():
             "codigo_expira_em": str(expira_em),
             "email_verificado": "nao"
         }
- 
+
+        # O índice único barra o mesmo CPF/e-mail enviado em paralelo; o código só
+        # vai para a fila depois que o cadastro foi gravado
+        if not cadastros.inserir(dados):
+            return render_template(
+                "cadastro.html",
+                erro="CPF ou e-mail já cadastrado no sistema."
+            )
+
         try:
             primeiro_nome = _primeiro_nome(dados.get("nome"))
             saudacao = f"Olá, {primeiro_nome}!" if primeiro_nome else "Olá!"
@@ -425,24 +320,14 @@ def cadastro():
                 html
             )
         except Exception:
+            # O cadastro já existe: na confirmação dá para pedir outro código
             return render_template(
-                "cadastro.html",
-                erro="Falha ao enviar o código de confirmação. Tente novamente."
+                "confirmacao.html",
+                erro="Falha ao enviar o código de confirmação. Solicite um novo.",
+                cpf=cpf,
+                email=email
             )
 
-        criar_arquivo = not os.path.exists(CADASTRO_CSV)
-        fieldnames = list(dados.keys())
-        if not criar_arquivo:
-            fieldnames = _garantir_campos_cadastro(fieldnames) or fieldnames
-
-        with open(CADASTRO_CSV, "a", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-
-            if criar_arquivo:
-                writer.writeheader()
-
-            writer.writerow(dados)
-
         return redirect(url_for(
             "confirmar",
             cpf=cpf,
@@ -620,18 +505,17 @@ def confirmar_reenviar():
 def dashboard():
     usuario = session.get("usuario")
     nome = buscar_nome_por_cpf_informacoes(usuario) or buscar_nome_por_cpf(usuario)
-    dados.atualizar_informacoes_csv()
-    saldos = dados.buscar_saldos_por_cpf(usuario)
-    saldos_totais = dados.buscar_saldos_totais()
-    evolucao = dados.buscar_evolucao_caixinha(limite=None)
-    dados.gerar_relatorio_csv()
+    modelo = dados.montar_dashboard(usuario)
     return render_template(
         "dashboard.html",
         nome=nome,
         usuario=usuario,
-        saldos=saldos,
-        saldos_totais=saldos_totais,
-        evolucao=evolucao,
+        saldos=modelo["saldos"],
+        saldos_totais=modelo["saldos_totais"],
+        evolucao=modelo["evolucao"],
+        evolucao_total=modelo["evolucao_total"],
+        evolucao_geracao=modelo["evolucao_geracao"],
+        evolucao_pontos=dados.EVOLUCAO_PONTOS_DASHBOARD,
     )
 
 
@@ -639,19 +523,11 @@ def dashboard():
 def emprestimo():
     usuario = session.get("usuario")
     nome = buscar_nome_por_cpf_informacoes(usuario) or buscar_nome_por_cpf(usuario)
-    dados.atualizar_informacoes_csv()
-    saldos = dados.buscar_saldos_por_cpf(usuario)
-
-    saldo_aplicado = None
-    if saldos and saldos.get("aplicado"):
-        saldo_aplicado = dados._parse_decimal(saldos.get("aplicado"))
-    if saldo_aplicado is None:
-        saldo_aplicado = Decimal("0")
+    participante = dados.buscar_participante_por_cpf(usuario)
+    saldo_aplicado = (participante or {}).get("aplicado_centavos") or 0
 
     emprestimos_info = dados.buscar_emprestimos_ativos_por_cpf(usuario)
-    saldo_devedor = emprestimos_info.get("saldo_devedor_num", Decimal("0")) if emprestimos_info else Decimal("0")
-    if saldo_devedor is None:
-        saldo_devedor = Decimal("0")
+    saldo_devedor = emprestimos_info.get("saldo_devedor_centavos", 0) if emprestimos_info else 0
 
     encargos = carregar_encargos()
     max_perc_txt = encargos.get("max_valor_perc", "20")
@@ -659,10 +535,8 @@ def emprestimo():
         max_perc_dec = Decimal(str(max_perc_txt))
     except Exception:
         max_perc_dec = Decimal("20")
-    saldo_base = saldo_aplicado * (Decimal("1") + (max_perc_dec / Decimal("100")))
-    saldo_disponivel = saldo_base - saldo_devedor
-    if saldo_disponivel < Decimal("0"):
-        saldo_disponivel = Decimal("0")
+    saldo_base = dados._multiplicar_centavos(saldo_aplicado, Decimal("1") + (max_perc_dec / Decimal("100")))
+    saldo_disponivel = max(saldo_base - saldo_devedor, 0)
 
     bloqueado_por_saldo = saldo_devedor > saldo_base
     aviso_bloqueio = None
@@ -672,8 +546,8 @@ def emprestimo():
             "A simulacao esta liberada, mas novas contratacoes estao temporariamente bloqueadas."
         )
 
-    saldo_disponivel_fmt = dados._formatar_real(saldo_disponivel)
-    saldo_devedor_fmt = dados._formatar_real(saldo_devedor) or "R$ 0,00"
+    saldo_disponivel_fmt = dados._formatar_centavos(saldo_disponivel)
+    saldo_devedor_fmt = dados._formatar_centavos(saldo_devedor)
     juros_txt = encargos.get("juros_mensal", "4.08")
     try:
         juros_dec = Decimal(str(juros_txt))
@@ -695,7 +569,7 @@ def emprestimo():
         nome=nome,
         usuario=usuario,
         saldo_disponivel=saldo_disponivel_fmt,
-        saldo_disponivel_num=str(saldo_disponivel),
+        saldo_disponivel_num=str(dados._centavos_para_decimal(saldo_disponivel)),
         saldo_devedor=saldo_devedor_fmt,
         emprestimos_ativos=emprestimos_info.get("emprestimos", []) if emprestimos_info else [],
         bloqueado_por_saldo=bloqueado_por_saldo,
@@ -711,21 +585,58 @@ def emprestimo():
 def extrato():
     usuario = session.get("usuario")
     nome = buscar_nome_por_cpf_informacoes(usuario) or buscar_nome_por_cpf(usuario)
-    transacoes = dados.buscar_extrato_por_cpf(usuario)
+    pagina = dados.buscar_extrato_paginado(usuario, limite=EXTRATO_PAGINA)
     return render_template(
         "extrato.html",
         nome=nome,
         usuario=usuario,
-        transacoes=transacoes
+        transacoes=pagina["transacoes"],
+        proximo_cursor=pagina["proximo_cursor"]
+    )
+
+
+@app.route("/extrato/dados")
+def extrato_dados():
+    usuario = session.get("usuario")
+    if not usuario:
+        return {"status": "erro"}, 401
+    try:
+        limite = int(request.args.get("limite") or EXTRATO_PAGINA)
+    except ValueError:
+        limite = EXTRATO_PAGINA
+    limite = max(1, min(limite, EXTRATO_PAGINA_MAX))
+    cursor = (request.args.get("cursor") or "").strip() or None
+    return dados.buscar_extrato_paginado(usuario, cursor=cursor, limite=limite)
+
+
+@app.route("/extrato/exportar")
+def extrato_exportar():
+    usuario = session.get("usuario")
+    if not usuario:
+        return {"status": "erro"}, 401
+    formato = (request.args.get("formato") or "csv").strip().lower()
+    if formato == "jsonl":
+        linhas = (json.dumps(item, ensure_ascii=False) + "\n" for item in dados.iterar_extrato(usuario))
+        mimetype = "application/x-ndjson"
+    else:
+        formato = "csv"
+        linhas = dados.iterar_extrato_csv(usuario)
+        mimetype = "text/csv"
+    return Response(
+        stream_with_context(linhas),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=extrato.{formato}"}
     )
 
 @app.route("/relatorio/atualizar")
 def atualizar_relatorio():
     if not session.get("usuario"):
         return {"status": "erro"}, 401
-    caminho = dados.gerar_relatorio_csv()
-    status = "ok" if caminho else "erro"
-    return {"status": status}
+    estado = dados.estado_derivados()
+    if not estado["atualizador_ativo"]:
+        dados.iniciar_atualizador()
+    status = "ok" if estado["relatorio"] else "pendente"
+    return _resposta_condicional({"status": status}, dados.etag_dados("relatorio", status))
 
 
 @app.route("/evolucao/dados")
@@ -740,16 +651,79 @@ def evolucao_dados():
             limite = None
     else:
         limite = None
-    return dados.buscar_evolucao_caixinha(limite=limite)
+    desde = request.args.get("since", type=int)
+    geracao = request.args.get("geracao", type=int)
+    pontos = request.args.get("pontos", type=int)
+    agrupar = request.args.get("agrupar")
+    etag = dados.etag_dados("evolucao", limite, desde, geracao, pontos, agrupar)
+    if request.if_none_match.contains(etag):
+        return _resposta_condicional([], etag)
+    if pontos:
+        pontos = min(max(pontos, EVOLUCAO_PONTOS_MIN), EVOLUCAO_PONTOS_MAX)
+    if desde is not None:
+        # Só os pontos novos a partir do índice que o cliente já tem (com reset, a série
+        # inteira, reduzida se pontos veio)
+        return _resposta_condicional(dados.buscar_evolucao_desde(desde, geracao, pontos), etag)
+    if agrupar:
+        # Fechamento por semana ou mês
+        if agrupar not in ("semana", "mes"):
+            return {"erro": "agrupar deve ser semana ou mes"}, 400
+        return _resposta_condicional(dados.buscar_evolucao_agrupada(agrupar, limite=limite), etag)
+    if pontos:
+        return _resposta_condicional(dados.buscar_evolucao_reduzida(pontos, limite=limite), etag)
+    return _resposta_condicional(dados.repositorio().relatorio(limite=limite), etag)
+
+
+@app.route("/eventos")
+def eventos():
+    if not session.get("usuario"):
+        return {"status": "erro"}, 401
+    if not _eventos_vagas.acquire(blocking=False):
+        return {"status": "erro", "detail": "muitas_conexoes"}, 503
+
+    ultimo_id = request.headers.get("Last-Event-ID", "")
+    atual = dados.sequencia_eventos()
+    seq = int(ultimo_id) if ultimo_id.isdigit() else atual
+    # Id de antes de um reinício do servidor: a contagem recomeçou
+    seq = min(seq, atual)
+    last_activity = int(session.get("last_activity") or 0)
+
+    def gerar():
+        nonlocal seq
+        fim = time.monotonic() + EVENTOS_CONEXAO_SECONDS
+        yield "retry: 2000\n\n"
+        while time.monotonic() < fim:
+            # A sessão desta conexão é a do momento em que ela abriu; logout
+            # em outra aba vale a partir da próxima reconexão
+            if not session.get("usuario") or int(time.time()) - last_activity > INACTIVITY_SECONDS:
+                return
+            espera = min(EVENTOS_KEEPALIVE_SECONDS, max(fim - time.monotonic(), 0))
+            evento = dados.aguardar_evento(seq, timeout=espera)
+            if evento is None:
+                yield ": keep-alive\n\n"
+                continue
+            seq = evento["seq"]
+            yield f"event: dados\nid: {seq}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+    resposta = Response(
+        stream_with_context(gerar()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Libera a vaga quando o servidor fecha a resposta, mesmo que o gerador nem tenha começado
+    resposta.call_on_close(_eventos_vagas.release)
+    return resposta
 
 
 @app.route("/informacoes/atualizar")
 def atualizar_informacoes():
     if not session.get("usuario"):
         return {"status": "erro"}, 401
-    df = dados.atualizar_informacoes_csv()
-    status = "ok" if df is not None else "erro"
-    return {"status": status}
+    estado = dados.estado_derivados()
+    if not estado["atualizador_ativo"]:
+        dados.iniciar_atualizador()
+    status = "ok" if estado["informacoes"] else "pendente"
+    return _resposta_condicional({"status": status}, dados.etag_dados("informacoes", status))
 
 
 @app.route("/session/ping")
@@ -780,10 +754,20 @@ def email_teste():
     return {"status": "ok", "destino": destino}
 
 
+@app.route("/correio/estado")
+def correio_estado():
+    if not session.get("usuario"):
+        return {"status": "erro"}, 401
+    return {"status": "ok", **correio.estatisticas()}
+
+
 @app.route("/logout")
 def logout():
     session.clear()
     return redirect(url_for("login"))
 
 if __name__ == "__main__":
+    # Com o reloader do modo debug, só o processo filho (o que atende) sobe as threads
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        iniciar_servicos()
     app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Escrita e travas dos arquivos derivados em csv/, usadas por dados, usuarios e cadastros
+# (sem puxar o pandas de dados para quem só precisa disto).
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TRAVAS_DIR = os.path.join(BASE_DIR, "csv", ".cache")
+
+_travas_lock = threading.Lock()
+_travas = {}
+
+
+def versao_arquivo(caminho):
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+def _liberar_trava(arquivo):
+    try:
+        if fcntl is not None:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+        else:
+            arquivo.seek(0)
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        arquivo.close()
+
+
+def _abrir_trava(caminho, bloquear):
+    # flock no Linux, msvcrt.locking no Windows
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    arquivo = open(caminho, "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | (0 if bloquear else fcntl.LOCK_NB))
+            return arquivo
+        arquivo.seek(0)
+        while True:
+            try:
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+                return arquivo
+            except OSError:
+                if not bloquear:
+                    raise
+                time.sleep(0.05)
+    except OSError:
+        arquivo.close()
+        return None
+
+
+@contextmanager
+def trava_derivado(destino, bloquear=True, pasta=None):
+    """Trava entre processos (e threads) para quem regera destino; reentrante na mesma thread.
+
+    O arquivo .lock fica em pasta (padrão csv/.cache). Com bloquear=False, entrega
+    False na hora se outro já está regerando.
+    """
+    caminho = os.path.join(pasta or TRAVAS_DIR, os.path.basename(destino) + ".lock")
+    with _travas_lock:
+        trava = _travas.get(caminho)
+        if trava is None:
+            trava = _travas[caminho] = {"rlock": threading.RLock(), "profundidade": 0, "arquivo": None}
+    if not trava["rlock"].acquire(blocking=bloquear):
+        yield False
+        return
+    try:
+        if trava["profundidade"] == 0:
+            trava["arquivo"] = _abrir_trava(caminho, bloquear)
+            if trava["arquivo"] is None:
+                yield False
+                return
+        trava["profundidade"] += 1
+        try:
+            yield True
+        finally:
+            trava["profundidade"] -= 1
+            if trava["profundidade"] == 0:
+                _liberar_trava(trava["arquivo"])
+                trava["arquivo"] = None
+    finally:
+        trava["rlock"].release()
+
+
+@contextmanager
+def escrita_atomica(destino, modo="w", **kwargs):
+    """Escreve num temporário ao lado de destino e, se tudo der certo, fsync + os.replace.
+
+    Leitores concorrentes veem o arquivo antigo inteiro ou o novo inteiro, nunca pela metade.
+    """
+    pasta = os.path.dirname(destino) or "."
+    os.makedirs(pasta, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(destino)}.", suffix=".tmp", dir=pasta)
+    try:
+        with os.fdopen(fd, modo, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            if os.path.exists(destino):
+                shutil.copymode(destino, tmp)
+            else:
+                os.chmod(tmp, 0o644)
+        except OSError:
+            pass
+        os.replace(tmp, destino)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,387 @@
+import argparse
+import datetime
+import os
+import shutil
+import smtplib
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import openpyxl
+import pandas as pd
+
+import cadastros
+import correio
+import dados
+import usuarios
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return {
+        "mediana_ms": statistics.median(tempos) * 1000,
+        "p99_ms": tempos[min(len(tempos) - 1, int(len(tempos) * 0.99))] * 1000,
+    }
+
+
+def _apontar_dados_para(pasta):
+    # Redireciona os caminhos do módulo dados para uma cópia isolada
+    dados.XLSX_PATH = os.path.join(pasta, "Caixinha 2026.xlsx")
+    dados.RELATORIO_XLSX = os.path.join(pasta, "Relatorio.xlsx")
+    dados.CSV_DIR = os.path.join(pasta, "csv")
+    dados.CACHE_DIR = os.path.join(dados.CSV_DIR, ".cache")
+    dados.INFORMACOES_CSV = os.path.join(dados.CSV_DIR, "informacoes.csv")
+    dados.EVOLUCAO_CSV = os.path.join(dados.CSV_DIR, "evolucao_caixinha.csv")
+    dados.RELATORIO_CSV = os.path.join(dados.CSV_DIR, "relatorio.csv")
+    dados.EXPORTACOES_DIR = os.path.join(dados.CSV_DIR, "exportacoes")
+    dados.RELATORIO_ESTADO = os.path.join(dados.CACHE_DIR, "relatorio.json")
+    os.makedirs(dados.CSV_DIR, exist_ok=True)
+    dados.limpar_cache()
+
+
+def _gerar_caixinha(caminho, participantes):
+    wb = openpyxl.Workbook(write_only=True)
+    aba = wb.create_sheet("Participantes")
+    aba.append(["ID", "Nome", "CPF", "Endereço", "E-mail", "Telefone", "Vencimento", "Mensal", "Aplicado", "Projetado", "Atual"])
+    for i in range(1, participantes + 1):
+        aba.append([i, f"Participante {i}", f"{i:011d}", i, f"p{i}@exemplo.com", "", 6, 50, 100 + i % 50, 1.5, 2.0 + (i % 7) / 10])
+    extrato = wb.create_sheet("Extrato")
+    extrato.append(["ID", "Categoria", "Tipo", "Data", "Valor", "Transação"])
+    for i in range(1, participantes + 1):
+        extrato.append([i, "Aplicação", "Entrada", "2026-03-01", 50, f"t{i}"])
+    wb.save(caminho)
+
+
+def _gerar_emprestimos(caminho, emprestimos, parcelas_por_emprestimo, participantes):
+    # Planilha sintética com as abas Participantes, Empréstimos e Parcelas
+    wb = openpyxl.Workbook(write_only=True)
+    aba = wb.create_sheet("Participantes")
+    aba.append(["ID", "Nome", "CPF", "Endereço", "E-mail", "Telefone", "Vencimento", "Mensal", "Aplicado", "Projetado", "Atual"])
+    for i in range(1, participantes + 1):
+        aba.append([i, f"Participante {i}", f"{i:011d}", i, f"p{i}@exemplo.com", "", 6, 50, 100, 1.5, 2.0])
+    aba = wb.create_sheet("Empréstimos")
+    aba.append(["ID", "id_participante", "Data emprestimo", "Valor", "Juros", "Parcelas", "Valor final", "Saldo", "Status"])
+    for i in range(1, emprestimos + 1):
+        valor = 100 + i % 900
+        aba.append([i, 1 + i % (participantes + 5), datetime.datetime(2026, 1, 1 + i % 28), valor, 0.0408,
+                    parcelas_por_emprestimo, round(valor * 1.0408, 3), None, "Em aberto"])
+    aba = wb.create_sheet("Parcelas")
+    aba.append(["ID", "Id_Empréstimo", "Parcela", "Vencimento", "Valor", "Saldo", "Status"])
+    n = 0
+    for i in range(1, emprestimos + 1):
+        valor = round((100 + i % 900) * 1.0408 / parcelas_por_emprestimo, 3)
+        for parcela in range(1, parcelas_por_emprestimo + 1):
+            n += 1
+            vencimento = datetime.datetime(2026, 1 + parcela % 12, 1 + i % 28)
+            if n % 97 == 0:
+                vencimento = vencimento.strftime("%d/%m/%Y")
+            aba.append([n, i, parcela, vencimento, valor, valor if n % 3 else None,
+                        "Pago" if parcela <= parcelas_por_emprestimo // 3 else "Em aberto"])
+    wb.save(caminho)
+
+
+def _agregar_emprestimos_por_linha(parcelas, emprestimos, participantes_por_id):
+    # Implementação anterior (groupby + iterrows, dinheiro lido célula a célula com
+    # _parse_decimal via _para_centavos), mantida só para comparação
+    col_status_parc = dados._encontrar_coluna(parcelas.columns, ["status"])
+    col_id_emprest_parc = dados._encontrar_coluna(parcelas.columns, ["id_emprest", "id emprest"])
+    col_parcela = dados._encontrar_coluna(parcelas.columns, ["parcela"])
+    col_vencimento = dados._encontrar_coluna(parcelas.columns, ["venc"])
+    col_saldo_parcela = dados._encontrar_coluna(parcelas.columns, ["saldo"])
+    col_valor_parcela = dados._encontrar_coluna(parcelas.columns, ["valor"])
+    col_id_emprest = dados._encontrar_coluna(emprestimos.columns, ["id"])
+    col_id_part = dados._encontrar_coluna(emprestimos.columns, ["id_participante", "id participante"])
+    col_valor_final = dados._encontrar_coluna(emprestimos.columns, ["valor final", "valor_total", "valor total"])
+    col_valor = dados._encontrar_coluna(emprestimos.columns, ["valor"])
+
+    parcelas["_status_norm"] = parcelas[col_status_parc].fillna("").astype(str).str.strip().str.lower()
+    # Soma dos valores de todas as parcelas (pagas ou não), para o resíduo de arredondamento
+    valores_por_emprestimo = {}
+    for _, linha in parcelas.iterrows():
+        valor = dados._para_centavos(linha.get(col_valor_parcela))
+        if valor is None:
+            valor = dados._para_centavos(linha.get(col_saldo_parcela))
+        id_emprest_norm = dados._normalizar_id(linha.get(col_id_emprest_parc))
+        soma, quantidade = valores_por_emprestimo.get(id_emprest_norm, (0, 0))
+        valores_por_emprestimo[id_emprest_norm] = (soma + (valor or 0), quantidade + 1)
+    parcelas_abertas = parcelas[parcelas["_status_norm"] == "em aberto"].copy()
+    parcelas_abertas["_id_emprest_norm"] = parcelas_abertas[col_id_emprest_parc].apply(dados._normalizar_id)
+    emprestimos["_id_emprest_norm"] = emprestimos[col_id_emprest].apply(dados._normalizar_id)
+    emprestimos["_id_part_norm"] = emprestimos[col_id_part].apply(dados._normalizar_id)
+    mapa_emprestimos = emprestimos.set_index("_id_emprest_norm").to_dict(orient="index")
+
+    ativos = []
+    for id_emprest_norm, grupo in parcelas_abertas.groupby("_id_emprest_norm"):
+        emprestimo = mapa_emprestimos.get(id_emprest_norm)
+        if not id_emprest_norm or not emprestimo:
+            continue
+        id_participante = emprestimo.get("_id_part_norm")
+        participante = participantes_por_id.get(id_participante)
+        cpf = participante["cpf"] if participante else None
+        if not cpf:
+            continue
+        saldo_devedor = 0
+        detalhes = []
+        for _, linha in grupo.iterrows():
+            valor_parcela = dados._para_centavos(linha.get(col_saldo_parcela))
+            if valor_parcela is None:
+                valor_parcela = dados._para_centavos(linha.get(col_valor_parcela))
+            if valor_parcela is None:
+                valor_parcela = 0
+            saldo_devedor += valor_parcela
+            vencimento_fmt = ""
+            dt = pd.to_datetime(linha.get(col_vencimento), errors="coerce")
+            if not pd.isna(dt):
+                vencimento_fmt = dt.strftime("%d/%m/%Y")
+            else:
+                vencimento_fmt = str(linha.get(col_vencimento) or "").strip()
+            detalhes.append({
+                "parcela": str(linha.get(col_parcela) or "").strip(),
+                "vencimento": vencimento_fmt,
+                "valor": dados._formatar_centavos(valor_parcela),
+                "_centavos": valor_parcela,
+            })
+        detalhes.sort(
+            key=lambda item: (
+                pd.to_datetime(item.get("vencimento"), errors="coerce", dayfirst=True)
+                if item.get("vencimento")
+                else pd.Timestamp.max
+            ),
+        )
+        valor_total = dados._para_centavos(emprestimo.get(col_valor_final))
+        if valor_total is None:
+            valor_total = dados._para_centavos(emprestimo.get(col_valor))
+        if valor_total is None:
+            valor_total = saldo_devedor
+        else:
+            soma, quantidade = valores_por_emprestimo[id_emprest_norm]
+            residuo = valor_total - soma
+            if residuo and abs(residuo) <= quantidade:
+                ultima = detalhes[-1]
+                ultima["valor"] = dados._formatar_centavos(ultima["_centavos"] + residuo)
+                saldo_devedor += residuo
+        ativos.append({
+            "cpf": cpf,
+            "id_participante": str(id_participante or "").strip(),
+            "id_emprestimo": str(emprestimo.get(col_id_emprest) or id_emprest_norm).strip(),
+            "valor_total_centavos": valor_total,
+            "valor_total": dados._formatar_centavos(valor_total),
+            "saldo_devedor_centavos": saldo_devedor,
+            "saldo_devedor": dados._formatar_centavos(saldo_devedor),
+            "parcelas_abertas": len(detalhes),
+            "parcelas_detalhes": [{k: v for k, v in item.items() if k != "_centavos"} for item in detalhes],
+        })
+    return sorted(ativos, key=lambda item: dados._normalizar_id(item.get("id_emprestimo")))
+
+
+def benchmark_emprestimos(emprestimos, parcelas_por_emprestimo, repeticoes):
+    with tempfile.TemporaryDirectory() as pasta:
+        _apontar_dados_para(pasta)
+        inicio = time.perf_counter()
+        _gerar_emprestimos(dados.XLSX_PATH, emprestimos, parcelas_por_emprestimo, participantes=1000)
+        abas = dados.carregar_abas(
+            dados.XLSX_PATH,
+            {"parcelas": ["parcelas", "parcela"], "emprestimos": ["emprestimos", "emprestimo"]},
+        )
+        print(f"planilha sintética: {emprestimos} empréstimos, {len(abas['parcelas'])} parcelas "
+              f"({time.perf_counter() - inicio:.1f} s para gerar e ler)")
+
+        por_id = dados.indice_participantes()["por_id"]
+        participantes = pd.DataFrame({"id_norm": list(por_id), "cpf": [p["cpf"] for p in por_id.values()]})
+
+        # As duas versões repetem os avisos de inferência de formato do pandas
+        warnings.simplefilter("ignore", UserWarning)
+        novo = dados.agregar_emprestimos_ativos(abas["parcelas"], abas["emprestimos"], participantes)
+        antigo = _agregar_emprestimos_por_linha(abas["parcelas"].copy(), abas["emprestimos"].copy(), por_id)
+        print(f"resultados iguais: {novo == antigo} ({len(novo)} empréstimos ativos)")
+
+        tempo_novo = _medir(
+            lambda: dados.agregar_emprestimos_ativos(abas["parcelas"], abas["emprestimos"], participantes),
+            repeticoes,
+        )
+        tempo_antigo = _medir(
+            lambda: _agregar_emprestimos_por_linha(abas["parcelas"].copy(), abas["emprestimos"].copy(), por_id),
+            max(1, repeticoes // 5),
+        )
+        print(f"por linha (iterrows, _parse_decimal por célula)  mediana={tempo_antigo['mediana_ms']:9.1f} ms")
+        print(f"colunar (agregar_emprestimos_ativos)             mediana={tempo_novo['mediana_ms']:9.1f} ms  "
+              f"({tempo_antigo['mediana_ms'] / tempo_novo['mediana_ms']:.1f}x)")
+
+
+def benchmark_login(custos, simultaneos, logins, alvo_p99_ms, usuarios_total=1000):
+    # Cada custo do scrypt: logins via validar_login com `simultaneos` threads ao mesmo tempo
+    escolhido = None
+    with tempfile.TemporaryDirectory() as pasta:
+        usuarios.USER_CSV = os.path.join(pasta, "usuarios.csv")
+        for n in custos:
+            # O mesmo hash em todas as linhas: o que se mede é a verificação, não a migração
+            armazenado = usuarios.gerar_hash("123456", n=n)
+            with open(usuarios.USER_CSV, "w", newline="", encoding="utf-8") as f:
+                f.write("usuario,senha\n")
+                for i in range(usuarios_total):
+                    f.write(f"{i:011d},{armazenado}\n")
+            usuarios.credenciais()
+
+            def login(i):
+                inicio = time.perf_counter()
+                assert usuarios.validar_login(f"{i % usuarios_total:011d}", "123456")
+                return time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=simultaneos) as executor:
+                tempos = sorted(executor.map(login, range(logins)))
+            total = time.perf_counter() - inicio
+            p99 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.99))] * 1000
+            print(f"n={n:>7}  mediana={statistics.median(tempos) * 1000:8.1f} ms  p99={p99:8.1f} ms  "
+                  f"{logins / total:7.1f} logins/s  ({simultaneos} simultâneos, {128 * usuarios.SCRYPT_R * n // 1024} KiB)")
+            if p99 <= alvo_p99_ms:
+                escolhido = n if escolhido is None else max(escolhido, n)
+    if escolhido is None:
+        print(f"nenhum custo ficou abaixo de p99={alvo_p99_ms} ms")
+    else:
+        print(f"maior custo com p99 <= {alvo_p99_ms} ms: USUARIOS_SCRYPT_N={escolhido}")
+
+
+def benchmark_cadastro(tamanhos, novos):
+    # Cadastros novos (consulta de existência + inserção) com a base já com N registros
+    with tempfile.TemporaryDirectory() as pasta:
+        cadastros.CADASTRO_CSV = os.path.join(pasta, "cadastro.csv")
+        for tamanho in tamanhos:
+            cadastros.CADASTRO_DB = os.path.join(pasta, f"cadastro-{tamanho}.sqlite3")
+            conn = cadastros._conexao()
+            conn.execute("BEGIN")
+            cadastros._importar_linhas(
+                conn,
+                ({"nome": f"Participante {i}", "cpf": f"{i:011d}", "email": f"p{i}@exemplo.com"} for i in range(tamanho)),
+            )
+            conn.execute("COMMIT")
+
+            tempos = []
+            for i in range(tamanho, tamanho + novos):
+                inicio = time.perf_counter()
+                if not cadastros.existe(f"{i:011d}", f"p{i}@exemplo.com"):
+                    cadastros.inserir({"nome": f"Participante {i}", "cpf": f"{i:011d}", "email": f"p{i}@exemplo.com"})
+                tempos.append(time.perf_counter() - inicio)
+            tempos.sort()
+            print(f"{tamanho:>8} cadastros  mediana={statistics.median(tempos) * 1000:7.3f} ms  "
+                  f"p99={tempos[int(len(tempos) * 0.99)] * 1000:7.3f} ms  {len(tempos) / sum(tempos):8.0f} cadastros/s")
+
+
+def benchmark_dashboard(tamanhos, repeticoes):
+    origem_relatorio = dados.RELATORIO_XLSX
+    for participantes in tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            shutil.copy2(origem_relatorio, os.path.join(pasta, "Relatorio.xlsx"))
+            _apontar_dados_para(pasta)
+            _gerar_caixinha(dados.XLSX_PATH, participantes)
+            cpf = f"{participantes:011d}"
+
+            inicio = time.perf_counter()
+            dados.montar_dashboard(cpf)
+            frio = (time.perf_counter() - inicio) * 1000
+
+            quente = _medir(lambda: dados.montar_dashboard(cpf), repeticoes)
+            print(
+                f"dashboard participantes={participantes:>6}  frio={frio:8.1f} ms  "
+                f"quente mediana={quente['mediana_ms']:.3f} ms  p99={quente['p99_ms']:.3f} ms"
+            )
+
+
+def benchmark_correio(mensagens, atraso_ms):
+    # O servidor SMTP falso é o mesmo dos testes
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+    import smtp_falso
+
+    servidor = smtp_falso.servidor_smtp(atraso_ms / 1000)
+    os.environ.update(
+        SMTP_HOST="127.0.0.1", SMTP_PORT=str(servidor.server_address[1]),
+        SMTP_USER="teste@example.com", SMTP_PASS="teste", SMTP_USE_SSL="0", SMTP_STARTTLS="0",
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        correio.CORREIO_DB = os.path.join(pasta, "correio.sqlite3")
+        # Worker parado enquanto enfileira: mede só a gravação na fila
+        correio.WORKER_INTERVALO = 0
+
+        # Como era: uma conexão SMTP por e-mail, dentro da requisição
+        def envio_direto():
+            msg = correio._montar_mensagem(
+                {"destino": "destino@example.com", "assunto": "Teste", "corpo": "Mensagem", "html": None},
+                "teste@example.com",
+            )
+            with smtplib.SMTP("127.0.0.1", servidor.server_address[1], timeout=20) as smtp:
+                smtp.send_message(msg)
+
+        direto = _medir(envio_direto, min(mensagens, 50))
+        print(f"envio direto      mediana={direto['mediana_ms']:8.3f} ms  p99={direto['p99_ms']:8.3f} ms")
+
+        conexoes_antes = servidor.conexoes
+        enfileirar = _medir(
+            lambda: correio.enfileirar("destino@example.com", "Teste", "Mensagem"), mensagens
+        )
+        print(f"enfileirar        mediana={enfileirar['mediana_ms']:8.3f} ms  p99={enfileirar['p99_ms']:8.3f} ms")
+
+        inicio = time.perf_counter()
+        correio.iniciar_worker(intervalo=0.05)
+        while correio.estatisticas()["pendentes"] or correio.estatisticas()["enviando"]:
+            time.sleep(0.05)
+        drenagem = time.perf_counter() - inicio
+        correio.parar_worker()
+        estado = correio.estatisticas()
+        print(
+            f"fila drenada em {drenagem:.2f} s  ({mensagens / drenagem:.0f} e-mails/s, "
+            f"{servidor.conexoes - conexoes_antes} conexão(ões) SMTP)"
+        )
+        print(f"estatisticas: {estado}")
+    servidor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do Banco Gênio")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_dashboard = sub.add_parser("dashboard", help="montar_dashboard após o aquecimento, por nº de participantes")
+    p_dashboard.add_argument("--participantes", type=int, nargs="+", default=[10, 1000, 10000])
+    p_dashboard.add_argument("--repeticoes", type=int, default=200)
+
+    p_emprestimos = sub.add_parser("emprestimos", help="agregação das parcelas em aberto: por linha x colunar")
+    p_emprestimos.add_argument("--emprestimos", type=int, default=10000)
+    p_emprestimos.add_argument("--parcelas", type=int, default=10, help="parcelas por empréstimo")
+    p_emprestimos.add_argument("--repeticoes", type=int, default=5)
+
+    p_login = sub.add_parser("login", help="latência de login por custo do scrypt, com logins simultâneos")
+    p_login.add_argument("--custos", type=int, nargs="+", default=[2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15])
+    p_login.add_argument("--simultaneos", type=int, default=8)
+    p_login.add_argument("--logins", type=int, default=200)
+    p_login.add_argument("--alvo-p99-ms", type=float, default=500)
+
+    p_cadastro = sub.add_parser("cadastro", help="cadastros novos por segundo, por tamanho da base")
+    p_cadastro.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 10000, 100000])
+    p_cadastro.add_argument("--novos", type=int, default=500)
+
+    p_correio = sub.add_parser("correio", help="fila de e-mail com um servidor SMTP local: enfileirar x envio direto")
+    p_correio.add_argument("--mensagens", type=int, default=500)
+    p_correio.add_argument("--atraso-ms", type=float, default=50, help="atraso do servidor SMTP por comando")
+
+    args = parser.parse_args()
+    if args.comando == "cadastro":
+        benchmark_cadastro(args.tamanhos, args.novos)
+    elif args.comando == "login":
+        benchmark_login(args.custos, args.simultaneos, args.logins, args.alvo_p99_ms)
+    elif args.comando == "dashboard":
+        benchmark_dashboard(args.participantes, args.repeticoes)
+    elif args.comando == "emprestimos":
+        benchmark_emprestimos(args.emprestimos, args.parcelas, args.repeticoes)
+    elif args.comando == "correio":
+        benchmark_correio(args.mensagens, args.atraso_ms)
+
+
+if __name__ == "__main__":
+    main()
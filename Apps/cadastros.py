@@ -0,0 +1,249 @@
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import threading
+
+try:
+    from . import arquivos
+except ImportError:
+    import arquivos
+
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CADASTRO_CSV = os.path.join(BASE_DIR, "csv", "cadastro.csv")
+CADASTRO_DB = os.environ.get("CADASTRO_DB", os.path.join(BASE_DIR, "csv", "cadastro.sqlite3"))
+
+CAMPOS = [
+    "nome", "cpf", "email", "telefone", "cep", "logradouro", "bairro", "cidade", "uf",
+    "numero", "complemento", "status", "codigo_verificacao", "codigo_enviado_em",
+    "codigo_expira_em", "email_verificado",
+]
+# Colunas internas, fora dos registros devolvidos e do CSV exportado
+_INTERNAS = ("id", "cpf_norm", "email_norm")
+
+
+def _normalizar_cpf(cpf):
+    return "".join(ch for ch in str(cpf or "") if ch.isdigit())
+
+
+def _normalizar_email(email):
+    return (email or "").strip().lower()
+
+
+def _coluna(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+# Uma conexão por thread (e por caminho do banco); o WAL deixa leituras
+# acontecerem enquanto outro processo grava
+_local = threading.local()
+_criacao_lock = threading.Lock()
+
+
+def _conexao():
+    conexoes = getattr(_local, "conexoes", None)
+    if conexoes is None:
+        conexoes = _local.conexoes = {}
+    conn = conexoes.get(CADASTRO_DB)
+    if conn is None:
+        os.makedirs(os.path.dirname(CADASTRO_DB), exist_ok=True)
+        conn = sqlite3.connect(CADASTRO_DB, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _criar_schema(conn)
+        conexoes[CADASTRO_DB] = conn
+    return conn
+
+
+def _criar_schema(conn):
+    with _criacao_lock:
+        existe = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cadastro'"
+        ).fetchone()
+        if existe:
+            return
+        colunas = ", ".join(f"{_coluna(campo)} TEXT NOT NULL DEFAULT ''" for campo in CAMPOS)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Outro processo pode ter criado a tabela enquanto esperávamos a trava
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cadastro ("
+                "id INTEGER PRIMARY KEY, cpf_norm TEXT NOT NULL, email_norm TEXT NOT NULL, "
+                f"{colunas})"
+            )
+            # Vazios não conflitam: o índice só cobre CPF/e-mail preenchidos
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS cadastro_cpf ON cadastro(cpf_norm) WHERE cpf_norm <> ''")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS cadastro_email ON cadastro(email_norm) WHERE email_norm <> ''")
+            vazio = conn.execute("SELECT COUNT(*) FROM cadastro").fetchone()[0] == 0
+            if vazio and os.path.exists(CADASTRO_CSV):
+                _importar_linhas(conn, _ler_csv(CADASTRO_CSV))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _colunas(conn):
+    return [linha[1] for linha in conn.execute("PRAGMA table_info(cadastro)")]
+
+
+def _garantir_colunas(conn, campos):
+    # Campos novos viram colunas, como o CSV ganhava colunas no cabeçalho
+    existentes = set(_colunas(conn))
+    for campo in campos:
+        if campo and campo not in existentes and campo not in _INTERNAS:
+            conn.execute(f"ALTER TABLE cadastro ADD COLUMN {_coluna(campo)} TEXT NOT NULL DEFAULT ''")
+            existentes.add(campo)
+
+
+def _valores(registro):
+    return {chave: "" if valor is None else str(valor) for chave, valor in registro.items() if chave not in _INTERNAS}
+
+
+def _inserir(conn, registro, ignorar_duplicado=False):
+    valores = _valores(registro)
+    _garantir_colunas(conn, valores.keys())
+    valores["cpf_norm"] = _normalizar_cpf(valores.get("cpf"))
+    valores["email_norm"] = _normalizar_email(valores.get("email"))
+    nomes = list(valores)
+    conn.execute(
+        f"INSERT {'OR IGNORE ' if ignorar_duplicado else ''}INTO cadastro ({', '.join(map(_coluna, nomes))}) "
+        f"VALUES ({', '.join('?' for _ in nomes)})",
+        [valores[nome] for nome in nomes],
+    )
+
+
+def _ler_csv(caminho):
+    with open(caminho, newline="", encoding="utf-8") as file:
+        return list(csv.DictReader(file))
+
+
+def _importar_linhas(conn, linhas):
+    # Repetidos ficam com a primeira ocorrência, como a busca linear no CSV fazia
+    antes = conn.execute("SELECT COUNT(*) FROM cadastro").fetchone()[0]
+    for linha in linhas:
+        _inserir(conn, {chave: valor for chave, valor in linha.items() if chave}, ignorar_duplicado=True)
+    return conn.execute("SELECT COUNT(*) FROM cadastro").fetchone()[0] - antes
+
+
+def _registro(linha):
+    if linha is None:
+        return None
+    return {chave: linha[chave] for chave in linha.keys() if chave not in _INTERNAS}
+
+
+# O "<> ''" repete o WHERE dos índices parciais para o SQLite poder usá-los
+_FILTRO = "(cpf_norm = ? AND cpf_norm <> '') OR (email_norm = ? AND email_norm <> '')"
+
+
+def _parametros(cpf, email):
+    return [_normalizar_cpf(cpf), _normalizar_email(email)]
+
+
+def existe(cpf, email):
+    parametros = _parametros(cpf, email)
+    return _conexao().execute(f"SELECT 1 FROM cadastro WHERE {_FILTRO} LIMIT 1", parametros).fetchone() is not None
+
+
+def buscar(cpf, email):
+    """Cadastro com o CPF ou o e-mail informados (o mais antigo, se forem dois)."""
+    parametros = _parametros(cpf, email)
+    linha = _conexao().execute(
+        f"SELECT * FROM cadastro WHERE {_FILTRO} ORDER BY id LIMIT 1", parametros
+    ).fetchone()
+    return _registro(linha)
+
+
+def buscar_nome_por_cpf(cpf):
+    cpf_norm = _normalizar_cpf(cpf)
+    if not cpf_norm:
+        return None
+    linha = _conexao().execute("SELECT nome FROM cadastro WHERE cpf_norm = ? AND cpf_norm <> ''", [cpf_norm]).fetchone()
+    return linha["nome"] if linha else None
+
+
+def inserir(registro):
+    """Grava um cadastro novo; False se o CPF ou o e-mail já estão cadastrados."""
+    conn = _conexao()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _inserir(conn, registro)
+    except sqlite3.IntegrityError:
+        conn.execute("ROLLBACK")
+        return False
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return True
+
+
+def atualizar(cpf, email, atualizacoes):
+    conn = _conexao()
+    valores = _valores(atualizacoes)
+    campos = list(valores)
+    if not campos:
+        return False
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _garantir_colunas(conn, campos)
+        cursor = conn.execute(
+            f"UPDATE cadastro SET {', '.join(f'{_coluna(campo)} = ?' for campo in campos)} "
+            f"WHERE id = (SELECT id FROM cadastro WHERE {_FILTRO} ORDER BY id LIMIT 1)",
+            [valores[campo] for campo in campos] + _parametros(cpf, email),
+        )
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return cursor.rowcount > 0
+
+
+def importar_csv(caminho=None):
+    """Acrescenta as linhas de um CSV no formato de cadastro.csv; devolve quantas entraram."""
+    conn = _conexao()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        inseridos = _importar_linhas(conn, _ler_csv(caminho or CADASTRO_CSV))
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return inseridos
+
+
+def exportar_csv(caminho=None):
+    caminho = caminho or CADASTRO_CSV
+    conn = _conexao()
+    campos = [coluna for coluna in _colunas(conn) if coluna not in _INTERNAS]
+    with arquivos.escrita_atomica(caminho, newline="", encoding="utf-8") as file:
+        escritor = csv.DictWriter(file, fieldnames=campos)
+        escritor.writeheader()
+        for linha in conn.execute("SELECT * FROM cadastro ORDER BY id"):
+            escritor.writerow(_registro(linha))
+    return caminho
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Cadastros ({CADASTRO_DB})")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_importar = sub.add_parser("importar", help="acrescenta as linhas de um CSV (repetidos são ignorados)")
+    p_importar.add_argument("--arquivo", default=CADASTRO_CSV)
+
+    p_exportar = sub.add_parser("exportar", help="grava todos os cadastros em CSV")
+    p_exportar.add_argument("--arquivo", default=CADASTRO_CSV)
+
+    args = parser.parse_args()
+    if args.comando == "importar":
+        print(f"{importar_csv(args.arquivo)} cadastro(s) importado(s) de {args.arquivo}")
+    elif args.comando == "exportar":
+        print(exportar_csv(args.arquivo))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
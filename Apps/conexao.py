@@ -0,0 +1,304 @@
+import functools
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# Pool de conexões compartilhado pelas threads do gunicorn. O SQL é escrito com "?"
+# como marcador; no MySQL ele vira "%s" (fora de literais). Cada consulta entra nas
+# métricas por texto.
+POOL_TAMANHO = int(os.environ.get("DADOS_POOL_TAMANHO", "5"))
+POOL_ESPERA_SEGUNDOS = float(os.environ.get("DADOS_POOL_ESPERA_SEGUNDOS", "10"))
+LOTE_PADRAO = 500
+
+
+class PoolEsgotado(RuntimeError):
+    pass
+
+
+def _texto_metrica(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+# Literais ('...', "...", `...`, com aspas dobradas ou \ de escape), comentários e marcadores
+_TRECHOS_SQL = re.compile(
+    r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`|--[^\n]*|/\*.*?\*/|\?""",
+    re.S,
+)
+
+
+@functools.lru_cache(maxsize=512)
+def _marcadores_mysql(sql):
+    """Troca os "?" do SQL por "%s", sem mexer nos que estão dentro de literais ou comentários.
+
+    O mysql.connector acha os "%s" por regex (não por formatação com %), então "%" sozinho
+    não precisa de escape; um "%s" escrito num literal, porém, seria trocado por parâmetro.
+    """
+
+    def trocar(trecho):
+        texto = trecho.group(0)
+        if texto == "?":
+            return "%s"
+        if "%s" in texto:
+            raise ValueError(f"literal com %s no SQL; passe o valor como parâmetro: {texto}")
+        return texto
+
+    return _TRECHOS_SQL.sub(trocar, sql)
+
+
+class Pool:
+    """Até `tamanho` conexões criadas sob demanda por `criar()`; quem chega com todas em
+    uso espera até `espera` segundos e recebe PoolEsgotado.
+
+    dialeto é "sqlite" ou "mysql". validar(conn) roda ao emprestar uma conexão que já
+    estava no pool e deve levantar exceção se ela não serve mais.
+    """
+
+    def __init__(self, criar, tamanho=POOL_TAMANHO, espera=POOL_ESPERA_SEGUNDOS, dialeto="sqlite", validar=None):
+        self._criar = criar
+        self._validar = validar
+        self.tamanho = max(int(tamanho), 1)
+        self.espera = espera
+        self.dialeto = dialeto
+        self._livres = queue.LifoQueue()
+        # Vagas por ordem de chegada: quem devolve não passa à frente de quem espera
+        self._vez = threading.Condition()
+        self._fila = deque()
+        self._em_uso = 0
+        self._lock = threading.Lock()
+        self._fechado = False
+        self._estatisticas = {"criadas": 0, "descartadas": 0, "emprestimos": 0, "esperas": 0, "espera_ms": 0.0, "esgotado": 0}
+        self._consultas = {}
+
+    # Conexões
+
+    def _emprestar(self):
+        inicio = time.perf_counter()
+        senha = object()
+        with self._vez:
+            self._fila.append(senha)
+            try:
+                livre = self._vez.wait_for(
+                    lambda: self._fila[0] is senha and self._em_uso < self.tamanho, timeout=self.espera
+                )
+                if livre:
+                    self._em_uso += 1
+            finally:
+                self._fila.remove(senha)
+                self._vez.notify_all()
+        if not livre:
+            with self._lock:
+                self._estatisticas["esgotado"] += 1
+            raise PoolEsgotado(f"nenhuma das {self.tamanho} conexões ficou livre em {self.espera:g} s")
+        esperou = (time.perf_counter() - inicio) * 1000
+        try:
+            conn = self._reaproveitar()
+            if conn is None:
+                conn = self._criar()
+                with self._lock:
+                    self._estatisticas["criadas"] += 1
+        except Exception:
+            self._liberar_vaga()
+            raise
+        with self._lock:
+            self._estatisticas["emprestimos"] += 1
+            if esperou >= 1:
+                self._estatisticas["esperas"] += 1
+                self._estatisticas["espera_ms"] += esperou
+        return conn
+
+    def _liberar_vaga(self):
+        with self._vez:
+            self._em_uso -= 1
+            self._vez.notify_all()
+
+    def _reaproveitar(self):
+        while True:
+            try:
+                conn = self._livres.get_nowait()
+            except queue.Empty:
+                return None
+            if self._validar is None:
+                return conn
+            try:
+                self._validar(conn)
+                return conn
+            except Exception:
+                self._descartar(conn)
+
+    def _descartar(self, conn):
+        with self._lock:
+            self._estatisticas["descartadas"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _devolver(self, conn, quebrada=False):
+        try:
+            if not quebrada:
+                try:
+                    # Nada de transação aberta voltando para o pool
+                    conn.rollback()
+                except Exception:
+                    quebrada = True
+            if quebrada or self._fechado:
+                self._descartar(conn)
+            else:
+                self._livres.put(conn)
+        finally:
+            self._liberar_vaga()
+
+    @contextmanager
+    def conexao(self):
+        conn = self._emprestar()
+        quebrada = False
+        try:
+            yield conn
+        except Exception as exc:
+            # Conexão caída (OSError, ou OperationalError/InterfaceError do mysql.connector)
+            # não volta para o pool
+            quebrada = isinstance(exc, OSError) or (
+                self.dialeto == "mysql" and type(exc).__name__ in ("OperationalError", "InterfaceError")
+            )
+            raise
+        finally:
+            self._devolver(conn, quebrada)
+
+    def fechar(self):
+        self._fechado = True
+        while True:
+            try:
+                self._descartar(self._livres.get_nowait())
+            except queue.Empty:
+                break
+
+    # Consultas
+
+    def sql(self, sql):
+        return sql if self.dialeto == "sqlite" else _marcadores_mysql(sql)
+
+    def cursor(self, conn):
+        # MySQL: prepared statement no servidor; SQLite: o cache de statements da conexão
+        if self.dialeto == "mysql":
+            return conn.cursor(prepared=True)
+        return conn.cursor()
+
+    def _registrar(self, sql, inicio, linhas):
+        duracao = (time.perf_counter() - inicio) * 1000
+        chave = _texto_metrica(sql)
+        with self._lock:
+            metrica = self._consultas.get(chave)
+            if metrica is None:
+                metrica = self._consultas[chave] = {"chamadas": 0, "total_ms": 0.0, "max_ms": 0.0, "linhas": 0}
+            metrica["chamadas"] += 1
+            metrica["total_ms"] += duracao
+            metrica["max_ms"] = max(metrica["max_ms"], duracao)
+            metrica["linhas"] += linhas
+
+    def consultar(self, sql, parametros=()):
+        """Lista de dicts (coluna -> valor). Para tabelas grandes, use iterar()."""
+        return list(self.iterar(sql, parametros))
+
+    def iterar(self, sql, parametros=(), lote=LOTE_PADRAO):
+        """Gera as linhas como dicts, buscando `lote` por vez com fetchmany.
+
+        A conexão fica emprestada até o gerador terminar (ou ser fechado).
+        """
+        inicio = time.perf_counter()
+        linhas = 0
+        with self.conexao() as conn:
+            cursor = self.cursor(conn)
+            try:
+                cursor.execute(self.sql(sql), tuple(parametros))
+                colunas = [descricao[0] for descricao in cursor.description]
+                while True:
+                    bloco = cursor.fetchmany(lote)
+                    if not bloco:
+                        break
+                    linhas += len(bloco)
+                    for linha in bloco:
+                        yield dict(zip(colunas, linha))
+            finally:
+                cursor.close()
+                self._registrar(sql, inicio, linhas)
+
+    def executar(self, comandos):
+        """Roda [(sql, parametros)] numa transação; parametros pode ser lista de tuplas
+        (executemany). Devolve o total de linhas afetadas.
+        """
+        afetadas = 0
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            try:
+                for sql, parametros in comandos:
+                    inicio = time.perf_counter()
+                    if parametros and isinstance(parametros, list):
+                        cursor.executemany(self.sql(sql), parametros)
+                    else:
+                        cursor.execute(self.sql(sql), tuple(parametros or ()))
+                    quantidade = max(cursor.rowcount, 0)
+                    afetadas += quantidade
+                    self._registrar(sql, inicio, quantidade)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        return afetadas
+
+    def metricas(self):
+        """Estado do pool e tempos por consulta (as mais demoradas no total primeiro)."""
+        with self._lock:
+            consultas = [
+                {"sql": sql, **metrica, "media_ms": metrica["total_ms"] / metrica["chamadas"]}
+                for sql, metrica in self._consultas.items()
+            ]
+            pool = dict(self._estatisticas)
+        pool.update(tamanho=self.tamanho, em_uso=self._em_uso, aguardando=len(self._fila), livres=self._livres.qsize())
+        consultas.sort(key=lambda item: item["total_ms"], reverse=True)
+        return {"pool": pool, "consultas": consultas}
+
+    def zerar_metricas(self):
+        with self._lock:
+            self._consultas = {}
+
+
+def pool_sqlite(caminho, tamanho=POOL_TAMANHO, espera=POOL_ESPERA_SEGUNDOS):
+    def criar():
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        # Cada conexão é usada por uma thread de cada vez (o pool garante)
+        conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    return Pool(criar, tamanho=tamanho, espera=espera, dialeto="sqlite")
+
+
+def pool_mysql(tamanho=POOL_TAMANHO, espera=POOL_ESPERA_SEGUNDOS, **parametros):
+    """Pool de conexões mysql.connector; os parâmetros padrão vêm de DADOS_MYSQL_*."""
+    # mysql-connector só é necessário quando o MySQL é usado
+    import mysql.connector
+
+    config = {
+        "host": os.environ.get("DADOS_MYSQL_HOST", "localhost"),
+        "port": int(os.environ.get("DADOS_MYSQL_PORT", "3306")),
+        "database": os.environ.get("DADOS_MYSQL_DATABASE", "genio"),
+        "user": os.environ.get("DADOS_MYSQL_USER", "root"),
+        "password": os.environ.get("DADOS_MYSQL_PASSWORD", ""),
+    }
+    config.update(parametros)
+
+    def criar():
+        return mysql.connector.connect(**config)
+
+    def validar(conn):
+        conn.ping(reconnect=True, attempts=1)
+
+    return Pool(criar, tamanho=tamanho, espera=espera, dialeto="mysql", validar=validar)
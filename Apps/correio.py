@@ -0,0 +1,357 @@
+import os
+import random
+import smtplib
+import sys
+import threading
+import time
+import uuid
+from email.message import EmailMessage
+
+try:
+    from . import conexao
+except ImportError:
+    import conexao
+
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CORREIO_DB = os.environ.get("CORREIO_DB", os.path.join(BASE_DIR, "csv", "correio.sqlite3"))
+
+TENTATIVAS_MAX = int(os.environ.get("CORREIO_TENTATIVAS", "8"))
+ESPERA_BASE_SEGUNDOS = float(os.environ.get("CORREIO_ESPERA_BASE_SEGUNDOS", "30"))
+ESPERA_MAX_SEGUNDOS = float(os.environ.get("CORREIO_ESPERA_MAX_SEGUNDOS", "3600"))
+# Sessão SMTP ociosa por mais que isso é fechada; a próxima mensagem reconecta
+SMTP_OCIOSO_SEGUNDOS = float(os.environ.get("CORREIO_SMTP_OCIOSO_SEGUNDOS", "60"))
+# Mensagem presa em "enviando" (processo morreu no meio) volta para a fila depois disso
+RESERVA_SEGUNDOS = 300
+RETENCAO_SEGUNDOS = 7 * 24 * 3600
+# Intervalo do worker entre verificações da fila; 0 desliga o worker (testes, ferramentas
+# ou um processo separado rodando "python Apps/correio.py drenar")
+WORKER_INTERVALO = float(os.environ.get("CORREIO_WORKER_SEGUNDOS", "5"))
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS mensagens ("
+    "id INTEGER PRIMARY KEY, destino TEXT NOT NULL, assunto TEXT NOT NULL, corpo TEXT NOT NULL, "
+    "html TEXT, status TEXT NOT NULL DEFAULT 'pendente', tentativas INTEGER NOT NULL DEFAULT 0, "
+    "proxima_tentativa REAL NOT NULL, criado_em REAL NOT NULL, reservado_em REAL, dono TEXT, "
+    "enviado_em REAL, duracao_ms REAL, erro TEXT)",
+    "CREATE INDEX IF NOT EXISTS mensagens_fila ON mensagens (status, proxima_tentativa)",
+]
+
+
+def _config_smtp():
+    smtp_user = os.environ.get("SMTP_USER")
+    smtp_pass = os.environ.get("SMTP_PASS")
+    if not smtp_user or not smtp_pass:
+        raise RuntimeError("SMTP_USER/SMTP_PASS nao configurados")
+    try:
+        smtp_port = int(os.environ.get("SMTP_PORT", "587"))
+    except ValueError:
+        raise RuntimeError("SMTP_PORT invalido")
+    return {
+        "host": os.environ.get("SMTP_HOST", "smtp.gmail.com"),
+        "porta": smtp_port,
+        "usuario": smtp_user,
+        "senha": smtp_pass,
+        "ssl": os.environ.get("SMTP_USE_SSL", "0").lower() in ["1", "true", "yes", "on"],
+        # Servidores locais de teste costumam não ter STARTTLS
+        "starttls": os.environ.get("SMTP_STARTTLS", "1").lower() in ["1", "true", "yes", "on"],
+    }
+
+
+_pool_lock = threading.Lock()
+_pools = {}
+
+
+def _pool():
+    with _pool_lock:
+        pool = _pools.get(CORREIO_DB)
+        if pool is None:
+            pool = conexao.pool_sqlite(CORREIO_DB, tamanho=2)
+            pool.executar([(comando, ()) for comando in _SCHEMA])
+            _pools[CORREIO_DB] = pool
+        return pool
+
+
+def enfileirar(destino, assunto, corpo, html=None):
+    """Grava a mensagem na fila e acorda o worker; devolve (id, destino).
+
+    Sem destino, a mensagem vai para o próprio SMTP_USER, como antes.
+    """
+    config = _config_smtp()
+    destino = (destino or "").strip() or config["usuario"]
+    agora = time.time()
+    with _pool().conexao() as conn:
+        cursor = conn.execute(
+            "INSERT INTO mensagens (destino, assunto, corpo, html, proxima_tentativa, criado_em) VALUES (?, ?, ?, ?, ?, ?)",
+            (destino, assunto, corpo, html, agora, agora),
+        )
+        conn.commit()
+        id_mensagem = cursor.lastrowid
+    # Sobe o worker na primeira mensagem deste processo, se ele estiver ligado
+    iniciar_worker()
+    _acordar.set()
+    return id_mensagem, destino
+
+
+def _montar_mensagem(linha, remetente):
+    msg = EmailMessage()
+    msg["Subject"] = linha["assunto"]
+    msg["From"] = remetente
+    msg["To"] = linha["destino"]
+    msg.set_content(linha["corpo"])
+    if linha["html"]:
+        msg.add_alternative(linha["html"], subtype="html")
+    return msg
+
+
+class SessaoSMTP:
+    """Uma conexão SMTP reaproveitada entre mensagens (STARTTLS e login uma vez só)."""
+
+    def __init__(self, config):
+        self.config = config
+        self._servidor = None
+        self._usado_em = 0.0
+        self.conexoes = 0
+
+    def _conectar(self):
+        config = self.config
+        if config["ssl"]:
+            servidor = smtplib.SMTP_SSL(config["host"], config["porta"], timeout=20)
+        else:
+            servidor = smtplib.SMTP(config["host"], config["porta"], timeout=20)
+        try:
+            if not config["ssl"] and config["starttls"]:
+                servidor.starttls()
+            servidor.ehlo_or_helo_if_needed()
+            # Sem TLS, só autentica se o servidor oferecer AUTH (servidor local de teste)
+            if config["ssl"] or config["starttls"] or servidor.has_extn("auth"):
+                servidor.login(config["usuario"], config["senha"])
+        except Exception:
+            servidor.close()
+            raise
+        self._servidor = servidor
+        self.conexoes += 1
+
+    def fechar(self):
+        if self._servidor is not None:
+            try:
+                self._servidor.quit()
+            except Exception:
+                self._servidor.close()
+            self._servidor = None
+
+    def fechar_se_ocioso(self):
+        if self._servidor is not None and time.time() - self._usado_em > SMTP_OCIOSO_SEGUNDOS:
+            self.fechar()
+
+    def enviar(self, msg):
+        # Conexão derrubada pelo servidor entre uma mensagem e outra: reconecta uma vez
+        for tentativa in range(2):
+            if self._servidor is None:
+                self._conectar()
+            try:
+                self._servidor.send_message(msg)
+                self._usado_em = time.time()
+                return
+            except OSError as exc:
+                # SMTPException também é OSError: recusa do servidor não é conexão caída
+                caiu = isinstance(exc, smtplib.SMTPServerDisconnected) or not isinstance(exc, smtplib.SMTPException)
+                if not caiu:
+                    raise
+                self._servidor.close()
+                self._servidor = None
+                if tentativa:
+                    raise
+
+
+def _erro_permanente(exc):
+    # 5xx do servidor (destinatário recusado, mensagem rejeitada): não adianta repetir
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(codigo >= 500 for codigo, _ in exc.recipients.values())
+    codigo = getattr(exc, "smtp_code", None)
+    return isinstance(codigo, int) and codigo >= 500 and not isinstance(exc, smtplib.SMTPAuthenticationError)
+
+
+def _espera(tentativas):
+    base = min(ESPERA_BASE_SEGUNDOS * (2 ** (tentativas - 1)), ESPERA_MAX_SEGUNDOS)
+    return base * random.uniform(0.9, 1.1)
+
+
+_DONO = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _reservar(pool, limite):
+    # Reserva atômica (BEGIN IMMEDIATE): vários processos podem drenar a mesma fila
+    agora = time.time()
+    with pool.conexao() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE mensagens SET status = 'pendente', dono = NULL WHERE status = 'enviando' AND reservado_em < ?",
+            (agora - RESERVA_SEGUNDOS,),
+        )
+        linhas = conn.execute(
+            "SELECT id, destino, assunto, corpo, html, tentativas FROM mensagens "
+            "WHERE status = 'pendente' AND proxima_tentativa <= ? ORDER BY proxima_tentativa, id LIMIT ?",
+            (agora, limite),
+        ).fetchall()
+        ids = [linha[0] for linha in linhas]
+        conn.executemany(
+            "UPDATE mensagens SET status = 'enviando', reservado_em = ?, dono = ? WHERE id = ?",
+            [(agora, _DONO, id_mensagem) for id_mensagem in ids],
+        )
+        conn.commit()
+    colunas = ["id", "destino", "assunto", "corpo", "html", "tentativas"]
+    return [dict(zip(colunas, linha)) for linha in linhas]
+
+
+def processar_fila(sessao=None, limite=50):
+    """Envia as mensagens vencidas; devolve (enviadas, falhas). Usado pelo worker e em testes."""
+    pool = _pool()
+    mensagens = _reservar(pool, limite)
+    if not mensagens:
+        return 0, 0
+    sessao = sessao or SessaoSMTP(_config_smtp())
+    enviadas = falhas = 0
+    for linha in mensagens:
+        inicio = time.perf_counter()
+        try:
+            sessao.enviar(_montar_mensagem(linha, sessao.config["usuario"]))
+        except Exception as exc:
+            falhas += 1
+            tentativas = linha["tentativas"] + 1
+            definitivo = _erro_permanente(exc) or tentativas >= TENTATIVAS_MAX
+            pool.executar([(
+                "UPDATE mensagens SET status = ?, tentativas = ?, proxima_tentativa = ?, erro = ?, dono = NULL WHERE id = ?",
+                (
+                    "falhou" if definitivo else "pendente",
+                    tentativas,
+                    time.time() + _espera(tentativas),
+                    f"{type(exc).__name__}: {exc}"[:500],
+                    linha["id"],
+                ),
+            )])
+            continue
+        enviadas += 1
+        pool.executar([(
+            "UPDATE mensagens SET status = 'enviado', tentativas = tentativas + 1, enviado_em = ?, duracao_ms = ?, "
+            "erro = NULL, dono = NULL WHERE id = ?",
+            (time.time(), (time.perf_counter() - inicio) * 1000, linha["id"]),
+        )])
+    return enviadas, falhas
+
+
+def _limpar_enviadas():
+    _pool().executar([(
+        "DELETE FROM mensagens WHERE status = 'enviado' AND enviado_em < ?",
+        (time.time() - RETENCAO_SEGUNDOS,),
+    )])
+
+
+def estatisticas(amostra=200):
+    """Profundidade da fila e latências (da entrada na fila ao envio, e do envio SMTP) das últimas mensagens."""
+    pool = _pool()
+    contagem = {linha["status"]: linha["n"] for linha in pool.consultar("SELECT status, COUNT(*) AS n FROM mensagens GROUP BY status")}
+    mais_antiga = pool.consultar("SELECT MIN(criado_em) AS criado_em FROM mensagens WHERE status IN ('pendente', 'enviando')")[0]["criado_em"]
+    recentes = pool.consultar(
+        "SELECT (enviado_em - criado_em) * 1000 AS fila_ms, duracao_ms FROM mensagens "
+        "WHERE status = 'enviado' ORDER BY enviado_em DESC LIMIT ?",
+        (amostra,),
+    )
+
+    def _percentis(valores):
+        if not valores:
+            return None
+        valores = sorted(valores)
+        return {
+            "p50_ms": valores[len(valores) // 2],
+            "p95_ms": valores[min(len(valores) - 1, int(len(valores) * 0.95))],
+            "max_ms": valores[-1],
+        }
+
+    return {
+        "pendentes": contagem.get("pendente", 0),
+        "enviando": contagem.get("enviando", 0),
+        "enviadas": contagem.get("enviado", 0),
+        "falhas": contagem.get("falhou", 0),
+        "mais_antiga_s": time.time() - mais_antiga if mais_antiga else 0,
+        "latencia_total": _percentis([linha["fila_ms"] for linha in recentes]),
+        "latencia_smtp": _percentis([linha["duracao_ms"] for linha in recentes]),
+        "worker_ativo": bool(_worker["thread"] is not None and _worker["thread"].is_alive()),
+    }
+
+
+# Worker em segundo plano: drena a fila com uma sessão SMTP reaproveitada
+_acordar = threading.Event()
+_worker_lock = threading.Lock()
+_worker = {"thread": None, "parar": None}
+
+
+def _loop_worker(intervalo, parar):
+    sessao = None
+    limpo_em = 0.0
+    while not parar.is_set():
+        try:
+            if sessao is None:
+                sessao = SessaoSMTP(_config_smtp())
+            enviadas, falhas = processar_fila(sessao)
+            if enviadas or falhas:
+                continue
+            sessao.fechar_se_ocioso()
+            if time.time() - limpo_em > 3600:
+                _limpar_enviadas()
+                limpo_em = time.time()
+        except Exception:
+            # SMTP não configurado ou banco indisponível: tenta de novo no próximo ciclo
+            sessao = None
+        _acordar.wait(intervalo)
+        _acordar.clear()
+    if sessao is not None:
+        sessao.fechar()
+
+
+def iniciar_worker(intervalo=None):
+    intervalo = WORKER_INTERVALO if intervalo is None else intervalo
+    if intervalo <= 0:
+        return None
+    with _worker_lock:
+        thread = _worker["thread"]
+        if thread is not None and thread.is_alive():
+            return thread
+        parar = threading.Event()
+        thread = threading.Thread(target=_loop_worker, args=(intervalo, parar), name="correio-worker", daemon=True)
+        _worker.update(thread=thread, parar=parar)
+        thread.start()
+        return thread
+
+
+def parar_worker():
+    with _worker_lock:
+        parar = _worker["parar"]
+        thread = _worker["thread"]
+        _worker.update(thread=None, parar=None)
+    if parar is not None:
+        parar.set()
+        _acordar.set()
+    if thread is not None:
+        thread.join(timeout=30)
+
+
+def main():
+    # Uso: python Apps/correio.py estado | drenar
+    comando = sys.argv[1] if len(sys.argv) > 1 else "estado"
+    if comando == "drenar":
+        total = [0, 0]
+        while True:
+            enviadas, falhas = processar_fila()
+            if not enviadas and not falhas:
+                break
+            total[0] += enviadas
+            total[1] += falhas
+        print(f"{total[0]} enviada(s), {total[1]} falha(s)")
+    else:
+        print(estatisticas())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,54 @@
+import argparse
 import os
 import shutil
 import csv
+import glob
+import hashlib
+import io
+import json
 import openpyxl
 import re
+import sys
+import tempfile
+import threading
+import time
 import unicodedata
-from decimal import Decimal, InvalidOperation
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
 
+import numpy as np
 import pandas as pd
+from openpyxl.cell.cell import ERROR_CODES
+
+try:
+    from . import arquivos, conexao
+except ImportError:
+    import arquivos
+    import conexao
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 XLSX_PATH = os.path.join(BASE_DIR, "Caixinha 2026.xlsx")
-XLSX_TMP = os.path.join(BASE_DIR, "Caixinha_2026_temp.xlsx")
 RELATORIO_XLSX = os.path.join(BASE_DIR, "Relatorio.xlsx")
-RELATORIO_TMP = os.path.join(BASE_DIR, "Relatorio_temp.xlsx")
 CSV_DIR = os.path.join(BASE_DIR, "csv")
 INFORMACOES_CSV = os.path.join(CSV_DIR, "informacoes.csv")
 EVOLUCAO_CSV = os.path.join(CSV_DIR, "evolucao_caixinha.csv")
 RELATORIO_CSV = os.path.join(CSV_DIR, "relatorio.csv")
-EXTRATO_CSV = os.path.join(CSV_DIR, "extrato.csv")
-EMPRESTIMOS_ATIVOS_CSV = os.path.join(CSV_DIR, "emprestimos_ativos.csv")
+EXPORTACOES_DIR = os.path.join(CSV_DIR, "exportacoes")
+CACHE_DIR = os.path.join(CSV_DIR, ".cache")
 SHEET_NAME = "participantes"
 SHEET_BASE = "Base"
 SHEET_EXTRATO = "Extrato"
 
+# Limite de memória do cache de abas (MB), compartilhado por todas as planilhas
+CACHE_LIMITE_BYTES = int(os.environ.get("DADOS_CACHE_MB", "64")) * 1024 * 1024
+
+_cache_lock = threading.RLock()
+_cache_abas = OrderedDict()
+_cache_bytes = 0
+_carga_locks = {}
+
 
 def _normalizar_texto(valor):
     texto = str(valor).strip().lower()
@@ -103,16 +129,6 @@ def _resolver_nome_aba_por_termos(xl, termos):
     return None
 
 
-def _carregar_caixinha_excel():
-    origem = XLSX_TMP if os.path.exists(XLSX_TMP) else XLSX_PATH
-    if not os.path.exists(origem):
-        return None
-    try:
-        return pd.ExcelFile(origem, engine="openpyxl")
-    except Exception:
-        return None
-
-
 def _normalizar_id(valor):
     texto = str(valor or "").strip()
     if not texto:
@@ -121,123 +137,534 @@ def _normalizar_id(valor):
     return numeros if numeros else texto.lower()
 
 
-def carregar_participantes_df():
-    if not os.path.exists(XLSX_PATH):
-        return None
-    try:
-        shutil.copy2(XLSX_PATH, XLSX_TMP)
-        xl = pd.ExcelFile(XLSX_TMP, engine="openpyxl")
-        aba = _resolver_nome_aba(xl)
-        if not aba:
+_versao_arquivo = arquivos.versao_arquivo
+_escrita_atomica = arquivos.escrita_atomica
+
+
+def _cache_remover(chave):
+    global _cache_bytes
+    item = _cache_abas.pop(chave, None)
+    if item is not None:
+        _cache_bytes -= item[2]
+
+
+def _cache_obter(chave, versao):
+    with _cache_lock:
+        item = _cache_abas.get(chave)
+        if item is None:
+            return None
+        if item[0] != versao:
+            _cache_remover(chave)
             return None
-        return pd.read_excel(xl, sheet_name=aba, dtype=str)
+        _cache_abas.move_to_end(chave)
+        return item[1]
+
+
+def _cache_guardar(chave, versao, valor, tamanho=0):
+    global _cache_bytes
+    with _cache_lock:
+        _cache_remover(chave)
+        _cache_abas[chave] = (versao, valor, tamanho)
+        _cache_bytes += tamanho
+        # Descarta as abas menos usadas até caber no limite (a recém-lida fica)
+        while _cache_bytes > CACHE_LIMITE_BYTES and len(_cache_abas) > 1:
+            antiga = next(iter(_cache_abas))
+            if antiga == chave:
+                break
+            _cache_remover(antiga)
+
+
+def limpar_cache():
+    global _cache_bytes
+    with _cache_lock:
+        _cache_abas.clear()
+        _cache_bytes = 0
+
+
+def _lock_carga(caminho):
+    with _cache_lock:
+        lock = _carga_locks.get(caminho)
+        if lock is None:
+            lock = _carga_locks[caminho] = threading.Lock()
+        return lock
+
+
+def _tamanho_df(df):
+    try:
+        return int(df.memory_usage(deep=True).sum())
     except Exception:
-        return None
+        return 0
+
+
+def _trava_derivado(destino, bloquear=True):
+    # Os arquivos .lock ficam em csv/.cache (CACHE_DIR)
+    return arquivos.trava_derivado(destino, bloquear, pasta=CACHE_DIR)
+
+
+def _ler_bytes_planilha(caminho):
+    # Lê o arquivo inteiro para a memória; a versão vem do mesmo descritor lido
+    try:
+        with open(caminho, "rb") as f:
+            info = os.fstat(f.fileno())
+            return f.read(), (info.st_mtime_ns, info.st_size)
+    except PermissionError:
+        pass
+
+    # Arquivo bloqueado (ex.: aberto no Excel): copia para um temporário exclusivo
+    fd, tmp = tempfile.mkstemp(prefix="planilha_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        shutil.copy2(caminho, tmp)
+        with open(tmp, "rb") as f:
+            info = os.fstat(f.fileno())
+            return f.read(), (info.st_mtime_ns, info.st_size)
     finally:
         try:
-            if os.path.exists(XLSX_TMP):
-                os.remove(XLSX_TMP)
-        except Exception:
+            os.remove(tmp)
+        except OSError:
             pass
 
 
-def _carregar_extrato_df():
-    if not os.path.exists(XLSX_PATH):
-        return None
+def _prefixo_cache_disco(caminho):
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    return re.sub(r"[^a-z0-9]+", "_", _normalizar_texto(nome)).strip("_")
 
-    xl = None
+
+def _caminho_cache_disco(caminho, hash_conteudo, aba, header=0):
+    # Ex.: csv/.cache/relatorio-<sha256[:16]>-base.pkl; aba None guarda a lista de abas
+    if aba is None:
+        sufixo = "_abas"
+    else:
+        sufixo = re.sub(r"[^a-z0-9]+", "_", _normalizar_texto(aba)).strip("_")
+        if header is None:
+            sufixo = f"{sufixo}-bruta"
+        elif header != 0:
+            sufixo = f"{sufixo}-h{header}"
+    return os.path.join(
+        CACHE_DIR,
+        f"{_prefixo_cache_disco(caminho)}-{hash_conteudo[:16]}-{sufixo}.pkl",
+    )
+
+
+def _cache_disco_ler(caminho, hash_conteudo, aba, header=0):
+    destino = _caminho_cache_disco(caminho, hash_conteudo, aba, header)
+    if not os.path.exists(destino):
+        return None
     try:
-        shutil.copy2(XLSX_PATH, XLSX_TMP)
-        xl = pd.ExcelFile(XLSX_TMP, engine="openpyxl")
-        aba = _resolver_nome_aba_extrato(xl)
-        if not aba:
-            return None
-        df = pd.read_excel(xl, sheet_name=aba, dtype=str)
-        if df is None or df.empty:
-            return None
-        return df
+        return pd.read_pickle(destino)
     except Exception:
         return None
-    finally:
-        try:
-            if xl is not None and hasattr(xl, "close"):
-                xl.close()
-        except Exception:
-            pass
+
+
+def _cache_disco_gravar(caminho, hash_conteudo, valor, aba, header=0):
+    destino = _caminho_cache_disco(caminho, hash_conteudo, aba, header)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Remove derivados de versões anteriores do mesmo arquivo
+        prefixo = _prefixo_cache_disco(caminho)
+        for antigo in glob.glob(os.path.join(CACHE_DIR, f"{prefixo}-*.pkl")):
+            if not os.path.basename(antigo).startswith(f"{prefixo}-{hash_conteudo[:16]}-"):
+                try:
+                    os.remove(antigo)
+                except OSError:
+                    pass
+        with _escrita_atomica(destino, "wb") as f:
+            pd.to_pickle(valor, f)
+    except Exception:
+        pass
+
+
+class _NomesAbas:
+    # Substitui o ExcelFile nos resolvedores de aba quando os nomes já estão em cache
+    def __init__(self, sheet_names):
+        self.sheet_names = sheet_names
+
+
+def _resolver_aba(resolvedor, xl):
+    if callable(resolvedor):
+        return resolvedor(xl)
+    return _resolver_nome_aba_por_termos(xl, resolvedor)
+
+
+def _abas_do_cache(caminho, versao, resolvedores, header, resultado):
+    # Preenche resultado com o que já está em memória e devolve as chaves pendentes
+    nomes = _cache_obter((caminho, None, None), versao)
+    if nomes is None:
+        return [chave for chave in resolvedores if resultado.get(chave) is None]
+    pendentes = []
+    for chave, resolvedor in resolvedores.items():
+        if resultado.get(chave) is not None:
+            continue
+        aba = _resolver_aba(resolvedor, _NomesAbas(nomes))
+        if not aba:
+            continue
+        df = _cache_obter((caminho, aba, header), versao)
+        if df is None:
+            pendentes.append(chave)
+        else:
+            resultado[chave] = df.copy()
+    return pendentes
+
+
+def carregar_abas(caminho, resolvedores, header=0):
+    """Lê várias abas de uma planilha com uma única abertura do arquivo.
+
+    resolvedores mapeia uma chave qualquer para um resolvedor de aba
+    (_resolver_nome_aba*) ou para uma lista de termos aceita por
+    _resolver_nome_aba_por_termos. Devolve um dict chave -> DataFrame (dtype=str),
+    com None para abas inexistentes ou ilegíveis.
+    """
+    resultado = {chave: None for chave in resolvedores}
+    versao = _versao_arquivo(caminho)
+    if versao is None:
+        return resultado
+    if not _abas_do_cache(caminho, versao, resolvedores, header, resultado):
+        return resultado
+
+    with _lock_carga(caminho):
+        # Outra thread pode ter carregado as abas enquanto esperávamos
+        versao = _versao_arquivo(caminho)
+        if versao is None:
+            return resultado
+        pendentes = _abas_do_cache(caminho, versao, resolvedores, header, resultado)
+        if not pendentes:
+            return resultado
+
+        xl = None
         try:
-            if os.path.exists(XLSX_TMP):
-                os.remove(XLSX_TMP)
+            conteudo, versao = _ler_bytes_planilha(caminho)
+            hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+
+            nomes = _cache_disco_ler(caminho, hash_conteudo, None)
+            if nomes is None:
+                xl = pd.ExcelFile(io.BytesIO(conteudo), engine="openpyxl")
+                nomes = list(xl.sheet_names)
+                _cache_disco_gravar(caminho, hash_conteudo, nomes, None)
+            _cache_guardar((caminho, None, None), versao, nomes)
+
+            faltando = {}
+            for chave in pendentes:
+                aba = _resolver_aba(resolvedores[chave], _NomesAbas(nomes))
+                if not aba:
+                    continue
+                df = _cache_disco_ler(caminho, hash_conteudo, aba, header)
+                if df is None:
+                    faltando.setdefault(aba, []).append(chave)
+                    continue
+                _cache_guardar((caminho, aba, header), versao, df, _tamanho_df(df))
+                resultado[chave] = df.copy()
+
+            if faltando:
+                if xl is None:
+                    xl = pd.ExcelFile(io.BytesIO(conteudo), engine="openpyxl")
+                lidas = pd.read_excel(xl, sheet_name=list(faltando), header=header, dtype=str)
+                for aba, df in lidas.items():
+                    _cache_guardar((caminho, aba, header), versao, df, _tamanho_df(df))
+                    _cache_disco_gravar(caminho, hash_conteudo, df, aba, header)
+                    for chave in faltando[aba]:
+                        resultado[chave] = df.copy()
         except Exception:
-            pass
+            return resultado
+        finally:
+            try:
+                if xl is not None and hasattr(xl, "close"):
+                    xl.close()
+            except Exception:
+                pass
+
+    return resultado
+
+
+def _ler_aba(caminho, resolvedor, header=0):
+    return carregar_abas(caminho, {"aba": resolvedor}, header=header)["aba"]
+
+
+def carregar_participantes_df():
+    return _ler_aba(XLSX_PATH, _resolver_nome_aba)
+
+
+def _carregar_extrato_df():
+    df = _ler_aba(XLSX_PATH, _resolver_nome_aba_extrato)
+    if df is None or df.empty:
+        return None
+    return df
 
 
 def carregar_base_df():
-    if not os.path.exists(RELATORIO_XLSX):
+    df = _ler_aba(RELATORIO_XLSX, _resolver_nome_aba_base)
+    if df is not None and not df.empty:
+        return df
+    return None
+
+
+def _carregar_base_bruta():
+    # Planilha Base como matriz crua (sem cabeçalho)
+    return _ler_aba(RELATORIO_XLSX, _resolver_nome_aba_base, header=None)
+
+
+# relatorio.csv é exportado em streaming (openpyxl read_only), sem montar o DataFrame da
+# Base. As conversões imitam o read_excel(header=None) + dropna(axis=1) usado antes.
+RELATORIO_LINHA_INICIAL = 3  # linha 4 da planilha (0-based)
+RELATORIO_ESTADO = os.path.join(CACHE_DIR, "relatorio.json")
+
+_TEXTOS_NA = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+_ERROS_EXCEL = frozenset(ERROR_CODES)
+
+
+def _valor_celula(valor):
+    # Vazio, erro e textos de NA viram None; float inteiro vira int (como o pandas faz)
+    if valor is None:
         return None
+    if isinstance(valor, str):
+        return None if valor in _TEXTOS_NA or valor in _ERROS_EXCEL else valor
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _tipo_coluna(atual, valor):
+    # "int" / "float" enquanto a coluna for só numérica; qualquer outro valor a torna "obj"
+    if atual == "obj" or isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        return "obj"
+    if atual == "float" or isinstance(valor, float):
+        return "float"
+    return "int"
+
+
+def _flutuante(tipo, tem_na):
+    # Coluna numérica com vazios (ou com decimais) vira float64 no pandas: 5 sai como 5.0
+    return tipo == "float" or (tipo == "int" and tem_na)
+
+
+def _linhas_base_relatorio(conteudo):
+    wb = openpyxl.load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True)
     try:
-        shutil.copy2(RELATORIO_XLSX, RELATORIO_TMP)
-        xl = pd.ExcelFile(RELATORIO_TMP, engine="openpyxl")
-        aba = _resolver_nome_aba_base(xl)
-        if not aba:
-            return None
-        df = pd.read_excel(xl, sheet_name=aba, dtype=str)
-        if df is not None and not df.empty:
-            return df
+        aba = _resolver_nome_aba_base(_NomesAbas(wb.sheetnames))
+        if aba is None:
+            return
+        ws = wb[aba]
+        ws.reset_dimensions()
+        for linha in ws.iter_rows(values_only=True):
+            yield [_valor_celula(v) for v in linha]
+    finally:
+        wb.close()
+
+
+def _coluna_indice(cabecalho, primeira):
+    # Coluna de controle "Índice" (sem título no cabeçalho; o rótulo está na 1ª linha de dados)
+    for c, valor in enumerate(primeira):
+        titulo = cabecalho[c] if c < len(cabecalho) else None
+        if titulo is None and isinstance(valor, str) and _normalizar_texto(valor) == "indice":
+            return c
+    return None
+
+
+def _perfil_relatorio(linhas):
+    """Primeira passada: última linha com dados, colunas não vazias e tipo de cada coluna."""
+    contagem = {}
+    contagem_fatia = {}
+    tipos = {}
+    ultima = -1
+    cabecalho = primeira = []
+    indice_coluna = indice = None
+    for r, linha in enumerate(linhas):
+        if r == RELATORIO_LINHA_INICIAL:
+            cabecalho = linha
+        elif r == RELATORIO_LINHA_INICIAL + 1:
+            primeira = linha
+            indice_coluna = _coluna_indice(cabecalho, primeira)
+        elif r == RELATORIO_LINHA_INICIAL + 2 and indice_coluna is not None and indice_coluna < len(linha):
+            indice = linha[indice_coluna]
+        for c, valor in enumerate(linha):
+            if valor is None:
+                continue
+            ultima = r
+            contagem[c] = contagem.get(c, 0) + 1
+            tipos[c] = _tipo_coluna(tipos.get(c), valor)
+            if r >= RELATORIO_LINHA_INICIAL:
+                contagem_fatia[c] = contagem_fatia.get(c, 0) + 1
+    colunas = sorted(c for c in contagem_fatia if c != indice_coluna)
+    return {
+        "ultima": ultima,
+        "colunas": colunas,
+        "tipos": [tipos[c] for c in colunas],
+        "na": [contagem[c] < ultima + 1 for c in colunas],
+        "indice_coluna": indice_coluna,
+        "indice": indice,
+    }
+
+
+def _formatar_linha_relatorio(linha, colunas, flutuantes):
+    valores = []
+    for c, flutuante in zip(colunas, flutuantes):
+        valor = linha[c] if c < len(linha) else None
+        valores.append(float(valor) if flutuante and valor is not None else valor)
+    return valores
+
+
+def _texto_linha_csv(valores):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(valores)
+    return buffer.getvalue()
+
+
+def _ler_estado_relatorio():
+    try:
+        with open(RELATORIO_ESTADO, "r", encoding="utf-8") as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
         return None
-    except Exception:
+    if _versao_arquivo(RELATORIO_CSV) != (estado.get("mtime_ns"), estado.get("tamanho")):
         return None
-    finally:
-        try:
-            if os.path.exists(RELATORIO_TMP):
-                os.remove(RELATORIO_TMP)
-        except Exception:
-            pass
+    return estado
 
 
-def gerar_relatorio_csv():
+def _gravar_estado_relatorio(estado):
+    versao = _versao_arquivo(RELATORIO_CSV)
+    estado = dict(estado, mtime_ns=versao[0], tamanho=versao[1])
+    with _escrita_atomica(RELATORIO_ESTADO, encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False)
+
+
+def _exportar_relatorio_completo(conteudo):
+    perfil = _perfil_relatorio(_linhas_base_relatorio(conteudo))
+    if perfil["ultima"] < RELATORIO_LINHA_INICIAL:
+        return None
+    colunas = perfil["colunas"]
+    flutuantes = [_flutuante(t, na) for t, na in zip(perfil["tipos"], perfil["na"])]
+
+    resumo = hashlib.sha256()
+    with _escrita_atomica(RELATORIO_CSV, newline="", encoding="utf-8") as f:
+        texto = None
+        for r, linha in enumerate(_linhas_base_relatorio(conteudo)):
+            if r > perfil["ultima"]:
+                break
+            if r >= RELATORIO_LINHA_INICIAL:
+                texto = _texto_linha_csv(_formatar_linha_relatorio(linha, colunas, flutuantes))
+                f.write(texto)
+                resumo.update(texto.encode("utf-8"))
+
+    _gravar_estado_relatorio({
+        "linhas": perfil["ultima"] - RELATORIO_LINHA_INICIAL + 1,
+        "colunas": colunas,
+        "tipos": perfil["tipos"],
+        "na": perfil["na"],
+        "indice_coluna": perfil["indice_coluna"],
+        "indice": perfil["indice"],
+        "ultima": texto,
+        "hash": resumo.hexdigest(),
+    })
+    return RELATORIO_CSV
+
+
+def _continuar_relatorio(conteudo, estado):
+    """Acrescenta ao relatorio.csv só as linhas novas da Base.
+
+    As linhas já exportadas são refeitas só para conferir o hash guardado no estado.
+    Devolve False quando não dá para continuar (alguma linha exportada mudou ou sumiu,
+    coluna nova, tipo de coluna mudou ou o Índice recuou) e a exportação precisa ser completa.
+    """
+    colunas = estado["colunas"]
+    tipos = list(estado["tipos"])
+    na = list(estado["na"])
+    flutuantes = [_flutuante(t, n) for t, n in zip(tipos, na)]
+    indice_coluna = estado["indice_coluna"]
+    fim_exportado = RELATORIO_LINHA_INICIAL + estado["linhas"] - 1
+    mantidas = set(colunas)
+
+    resumo = hashlib.sha256()
+    conferido = False
+    novas = []
+    pendentes = []
+    for r, linha in enumerate(_linhas_base_relatorio(conteudo)):
+        if r == RELATORIO_LINHA_INICIAL + 2 and indice_coluna is not None:
+            indice = linha[indice_coluna] if indice_coluna < len(linha) else None
+            if isinstance(indice, int) and isinstance(estado["indice"], int) and indice < estado["indice"]:
+                return False
+        if r < RELATORIO_LINHA_INICIAL:
+            continue
+        if r <= fim_exportado:
+            texto = _texto_linha_csv(_formatar_linha_relatorio(linha, colunas, flutuantes))
+            resumo.update(texto.encode("utf-8"))
+            if r == fim_exportado:
+                if texto != estado["ultima"] or resumo.hexdigest() != estado.get("hash"):
+                    return False
+                conferido = True
+            continue
+        preenchidas = [c for c, v in enumerate(linha) if v is not None and c != indice_coluna]
+        if any(c not in mantidas for c in preenchidas):
+            return False
+        if not preenchidas:
+            pendentes.append(linha)
+            continue
+        novas.extend(pendentes)
+        pendentes = []
+        novas.append(linha)
+
+    if not conferido:
+        return False
+    if not novas:
+        os.utime(RELATORIO_CSV)
+        _gravar_estado_relatorio(estado)
+        return True
+
+    for i, c in enumerate(colunas):
+        for linha in novas:
+            valor = linha[c] if c < len(linha) else None
+            if valor is None:
+                na[i] = True
+            else:
+                tipos[i] = _tipo_coluna(tipos[i], valor)
+    if [_flutuante(t, n) for t, n in zip(tipos, na)] != flutuantes:
+        return False
+    if any(t == "obj" and antes != "obj" for t, antes in zip(tipos, estado["tipos"])):
+        return False
+
+    with open(RELATORIO_CSV, "a", newline="", encoding="utf-8") as f:
+        for linha in novas:
+            texto = _texto_linha_csv(_formatar_linha_relatorio(linha, colunas, flutuantes))
+            f.write(texto)
+            resumo.update(texto.encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+    _gravar_estado_relatorio(dict(
+        estado,
+        linhas=estado["linhas"] + len(novas),
+        tipos=tipos,
+        na=na,
+        ultima=texto,
+        hash=resumo.hexdigest(),
+    ))
+    return True
+
+
+def gerar_relatorio_csv(completo=False):
+    """Exporta a Base de Relatorio.xlsx (a partir da linha 4) para relatorio.csv.
+
+    Se o CSV ainda é o da última exportação, só as linhas novas são acrescentadas;
+    senão (ou com completo=True) o arquivo é regerado num temporário e trocado de uma vez.
+    """
     if not os.path.exists(RELATORIO_XLSX):
         return None
     os.makedirs(CSV_DIR, exist_ok=True)
     try:
-        shutil.copy2(RELATORIO_XLSX, RELATORIO_TMP)
-        xl = pd.ExcelFile(RELATORIO_TMP, engine="openpyxl")
-        aba = _resolver_nome_aba_base(xl)
-        if not aba:
-            return None
-        df_raw = pd.read_excel(xl, sheet_name=aba, header=None, dtype=str)
-        if df_raw is None or df_raw.empty:
-            return None
-
-        start_idx = 3  # linha 4 (0-based)
-        df_slice = df_raw.iloc[start_idx:].copy()
-        df_slice = df_slice.dropna(axis=1, how="all")
-
-        with open(RELATORIO_CSV, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            for _, row in df_slice.iterrows():
-                writer.writerow([None if pd.isna(v) else v for v in row.tolist()])
-
-        return RELATORIO_CSV
+        with _trava_derivado(RELATORIO_CSV):
+            conteudo, _ = _ler_bytes_planilha(RELATORIO_XLSX)
+            estado = None if completo else _ler_estado_relatorio()
+            if estado is not None and _continuar_relatorio(conteudo, estado):
+                return RELATORIO_CSV
+            return _exportar_relatorio_completo(conteudo)
     except Exception:
         return None
-    finally:
-        try:
-            if os.path.exists(RELATORIO_TMP):
-                os.remove(RELATORIO_TMP)
-        except Exception:
-            pass
 
 
 def _carregar_base_com_header_dinamico():
-    if not os.path.exists(RELATORIO_XLSX):
-        return None
     try:
-        shutil.copy2(RELATORIO_XLSX, RELATORIO_TMP)
-        xl = pd.ExcelFile(RELATORIO_TMP, engine="openpyxl")
-        aba = _resolver_nome_aba_base(xl)
-        if not aba:
-            return None
-        bruto = pd.read_excel(xl, sheet_name=aba, header=None, dtype=str)
+        bruto = _carregar_base_bruta()
         if bruto is None or bruto.empty:
             return None
         header_idx = None
@@ -255,23 +682,97 @@ def _carregar_base_com_header_dinamico():
         return df
     except Exception:
         return None
-    finally:
-        try:
-            if os.path.exists(RELATORIO_TMP):
-                os.remove(RELATORIO_TMP)
-        except Exception:
-            pass
 
 
 def atualizar_informacoes_csv():
     df = carregar_participantes_df()
     if df is None:
         return None
-    os.makedirs(CSV_DIR, exist_ok=True)
-    df.to_csv(INFORMACOES_CSV, index=False, encoding="utf-8")
+    with _trava_derivado(INFORMACOES_CSV), _escrita_atomica(INFORMACOES_CSV, newline="", encoding="utf-8") as f:
+        df.to_csv(f, index=False)
     return df
 
 
+_indice_lock = threading.Lock()
+_indice_participantes = {"versao": None, "por_cpf": {}, "por_id": {}, "linhas": {}}
+
+
+def _carregar_informacoes_df():
+    # Planilha é a fonte; informacoes.csv só é usado se a planilha estiver indisponível
+    df = carregar_participantes_df()
+    if df is not None and not df.empty:
+        return df
+    if os.path.exists(INFORMACOES_CSV):
+        try:
+            return pd.read_csv(INFORMACOES_CSV, dtype=str, encoding="utf-8")
+        except Exception:
+            pass
+    return None
+
+
+def _montar_participante(valores, colunas):
+    cpf = _normalizar_cpf(valores.get(colunas["cpf"]))
+    if not cpf:
+        return None
+    nome = str(valores.get(colunas["nome"]) or "").strip() if colunas["nome"] else ""
+    return {
+        "cpf": cpf,
+        "id": str(valores.get(colunas["id"]) or "").strip() if colunas["id"] else "",
+        "id_norm": _normalizar_id(valores.get(colunas["id"])) if colunas["id"] else None,
+        "nome": nome or None,
+        "aplicado_centavos": _para_centavos(valores.get(colunas["aplicado"])) if colunas["aplicado"] else None,
+        "atual_centavos": _para_centavos(valores.get(colunas["atual"])) if colunas["atual"] else None,
+    }
+
+
+def indice_participantes():
+    """Índice dos participantes por CPF normalizado e por ID normalizado.
+
+    Reconstruído apenas quando a planilha (ou informacoes.csv) muda; linhas
+    idênticas às da versão anterior reaproveitam o registro já montado.
+    """
+    global _indice_participantes
+    versao_atual = (_versao_arquivo(XLSX_PATH), _versao_arquivo(INFORMACOES_CSV))
+    with _indice_lock:
+        if _indice_participantes["versao"] == versao_atual:
+            return _indice_participantes
+
+        df = _carregar_informacoes_df()
+        por_cpf = {}
+        por_id = {}
+        linhas = {}
+        if df is not None and not df.empty:
+            colunas = {
+                "cpf": _encontrar_coluna(df.columns, ["cpf"]),
+                "id": _encontrar_coluna(df.columns, ["id"]),
+                "nome": _encontrar_coluna(df.columns, ["nome"]),
+                "atual": _encontrar_coluna(df.columns, ["atual", "saldo atual", "saldo_atual", "saldo"]),
+                "aplicado": _encontrar_coluna(df.columns, ["aplicado"]),
+            }
+            if colunas["cpf"]:
+                anteriores = _indice_participantes["linhas"]
+                nomes_colunas = tuple(df.columns)
+                for valores in df.itertuples(index=False, name=None):
+                    chave = (nomes_colunas, valores)
+                    registro = anteriores.get(chave)
+                    if registro is None:
+                        registro = _montar_participante(dict(zip(nomes_colunas, valores)), colunas)
+                    linhas[chave] = registro
+                    if registro is None:
+                        continue
+                    # Mantém a primeira ocorrência, como a busca linear fazia
+                    por_cpf.setdefault(registro["cpf"], registro)
+                    if registro["id_norm"]:
+                        por_id.setdefault(registro["id_norm"], registro)
+
+        _indice_participantes = {"versao": versao_atual, "por_cpf": por_cpf, "por_id": por_id, "linhas": linhas}
+        return _indice_participantes
+
+
+def buscar_participante_por_cpf(cpf):
+    return repositorio().participante_por_cpf(cpf)
+
+
 EVOLUCAO_START_ROW = 190
 EVOLUCAO_VAL_COL = 4
 EVOLUCAO_DATE_COL = 20
@@ -306,34 +807,14 @@ def _gerar_evolucao_por_posicao(df_raw):
 
 def atualizar_evolucao_csv():
     # Lê a planilha Base como matriz crua e extrai por posição (E e U)
-    df_raw = None
-    try:
-        if os.path.exists(RELATORIO_XLSX):
-            shutil.copy2(RELATORIO_XLSX, RELATORIO_TMP)
-            xl = pd.ExcelFile(RELATORIO_TMP, engine="openpyxl")
-            aba = _resolver_nome_aba_base(xl)
-            if aba:
-                df_raw = pd.read_excel(xl, sheet_name=aba, header=None, dtype=str)
-    except Exception:
-        df_raw = None
-    finally:
-        try:
-            if os.path.exists(RELATORIO_TMP):
-                os.remove(RELATORIO_TMP)
-        except Exception:
-            pass
+    df_raw = _carregar_base_bruta()
 
     df_out = _gerar_evolucao_por_posicao(df_raw)
     if df_out is None or df_out.empty:
         return None
 
-    os.makedirs(CSV_DIR, exist_ok=True)
-    try:
-        if os.path.exists(EVOLUCAO_CSV):
-            os.remove(EVOLUCAO_CSV)
-    except Exception:
-        pass
-    df_out.to_csv(EVOLUCAO_CSV, index=False, encoding="utf-8")
+    with _trava_derivado(EVOLUCAO_CSV), _escrita_atomica(EVOLUCAO_CSV, newline="", encoding="utf-8") as f:
+        df_out.to_csv(f, index=False)
 
     return df_out
 
@@ -348,18 +829,6 @@ def _formatar_real(valor):
     return f"R$ {texto}"
 
 
-def _parse_saldo(valor):
-    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
-        return None
-    if isinstance(valor, (int, float, Decimal)):
-        return _formatar_real(valor)
-    texto = str(valor).strip()
-    if not texto:
-        return None
-    texto = texto.replace("R$", "").strip()
-    texto = texto.replace(".", "").replace(",", ".")
-    return _formatar_real(texto)
-
 def _parse_decimal(valor):
     if valor is None or (isinstance(valor, float) and pd.isna(valor)):
         return None
@@ -386,149 +855,460 @@ def _parse_decimal(valor):
         return None
 
 
-def _buscar_emprestimos_ativos():
-    xl = _carregar_caixinha_excel()
-    if xl is None:
-        return []
+_NUMERO_SIMPLES = r"^[+-]?(?:\d+\.?\d*|\.\d+)$"
 
-    try:
-        aba_parcelas = _resolver_nome_aba_por_termos(xl, ["parcelas", "parcela"])
-        aba_emprestimos = _resolver_nome_aba_por_termos(xl, ["emprestimos", "emprestimo"])
-        aba_participantes = _resolver_nome_aba_por_termos(xl, ["particip"])
-        if not aba_parcelas or not aba_emprestimos or not aba_participantes:
-            return []
-
-        parcelas = pd.read_excel(xl, sheet_name=aba_parcelas, dtype=str)
-        emprestimos = pd.read_excel(xl, sheet_name=aba_emprestimos, dtype=str)
-        participantes = pd.read_excel(xl, sheet_name=aba_participantes, dtype=str)
-        if parcelas is None or parcelas.empty:
-            return []
-        if emprestimos is None or emprestimos.empty:
-            return []
-        if participantes is None or participantes.empty:
-            return []
-
-        col_status_parc = _encontrar_coluna(parcelas.columns, ["status"])
-        col_id_emprest_parc = _encontrar_coluna(parcelas.columns, ["id_emprest", "id emprest"])
-        col_parcela = _encontrar_coluna(parcelas.columns, ["parcela"])
-        col_vencimento = _encontrar_coluna(parcelas.columns, ["venc"])
-        col_saldo_parcela = _encontrar_coluna(parcelas.columns, ["saldo"])
-        col_valor_parcela = _encontrar_coluna(parcelas.columns, ["valor"])
-
-        col_id_emprest = _encontrar_coluna(emprestimos.columns, ["id"])
-        col_id_part = _encontrar_coluna(emprestimos.columns, ["id_participante", "id participante"])
-        col_valor_final = _encontrar_coluna(emprestimos.columns, ["valor final", "valor_total", "valor total"])
-        col_valor = _encontrar_coluna(emprestimos.columns, ["valor"])
-
-        col_part_id = _encontrar_coluna(participantes.columns, ["id"])
-        col_part_cpf = _encontrar_coluna(participantes.columns, ["cpf"])
-
-        if (
-            not col_status_parc
-            or not col_id_emprest_parc
-            or not col_id_emprest
-            or not col_id_part
-            or not col_part_id
-            or not col_part_cpf
-        ):
-            return []
 
-        parcelas["_status_norm"] = parcelas[col_status_parc].fillna("").astype(str).str.strip().str.lower()
-        parcelas_abertas = parcelas[parcelas["_status_norm"] == "em aberto"].copy()
-        if parcelas_abertas.empty:
-            return []
+def _normalizar_numero_serie(serie):
+    # Mesma regra de _parse_decimal aplicada à coluna inteira com operações de string.
+    # Devolve (textos normalizados, máscara dos que são números simples); vazios viram NaN.
+    serie = pd.Series(serie, dtype=object)
+    texto = serie[serie.notna()].astype(str).str.strip()
+    texto = texto.str.replace("R$", "", regex=False).str.strip()
+    texto = texto[texto != ""]
 
-        parcelas_abertas["_id_emprest_norm"] = parcelas_abertas[col_id_emprest_parc].apply(_normalizar_id)
-        emprestimos["_id_emprest_norm"] = emprestimos[col_id_emprest].apply(_normalizar_id)
-        emprestimos["_id_part_norm"] = emprestimos[col_id_part].apply(_normalizar_id)
-        participantes["_id_part_norm"] = participantes[col_part_id].apply(_normalizar_id)
-        participantes["_cpf_norm"] = participantes[col_part_cpf].apply(_normalizar_cpf)
+    tem_virgula = texto.str.contains(",", regex=False)
+    tem_ponto = texto.str.contains(".", regex=False)
+    virgula_decimal = (tem_virgula & ~tem_ponto) | (
+        tem_virgula & tem_ponto & (texto.str.rfind(",") > texto.str.rfind("."))
+    )
+    texto = texto.where(
+        ~virgula_decimal,
+        texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+    )
+    texto = texto.where(virgula_decimal, texto.str.replace(",", "", regex=False))
+
+    normalizados = texto.reindex(serie.index).astype(object)
+    simples = normalizados.str.match(_NUMERO_SIMPLES, na=False).astype(bool)
+    return normalizados, simples
+
+
+def _decimais_serie(serie):
+    # Equivalente vetorizado de _parse_decimal: Series de Decimal (ou None)
+    serie = pd.Series(serie, dtype=object)
+    normalizados, simples = _normalizar_numero_serie(serie)
+    # Array de objetos: atribuir por máscara numa Series trocaria os None por NaN
+    resultado = np.full(len(serie), None, dtype=object)
+    resultado[simples.to_numpy()] = normalizados[simples].map(Decimal).to_numpy()
+    # Notação científica, "NaN" etc. seguem pelo caminho escalar
+    resto = normalizados.notna() & ~simples
+    if resto.any():
+        resultado[resto.to_numpy()] = serie[resto].map(_parse_decimal).to_numpy()
+    return pd.Series(resultado, index=serie.index, dtype=object)
+
+
+def _parse_decimal_serie(serie):
+    # Equivalente vetorizado de float(_parse_decimal(v)); None vira NaN
+    serie = pd.Series(serie, dtype=object)
+    normalizados, simples = _normalizar_numero_serie(serie)
+    resultado = pd.Series(np.nan, index=serie.index, dtype="float64")
+    resultado[simples] = normalizados[simples].astype("float64")
+    resto = normalizados.notna() & ~simples
+    if resto.any():
+        resultado[resto] = serie[resto].map(
+            lambda v: float(_parse_decimal(v)) if _parse_decimal(v) is not None else np.nan
+        )
+    return resultado
+
+
+def _formatar_real_serie(valores):
+    # Equivalente vetorizado de _formatar_real para números (float, int ou Decimal); NaN vira None
+    valores = pd.Series(valores, dtype=object)
+    # O pandas trata Decimal("NaN") como ausente; _formatar_real devolve "R$ NaN"
+    presentes = valores.notna() | valores.map(lambda valor: isinstance(valor, Decimal))
+    texto = valores[presentes].map("{:,.2f}".format)
+    texto = texto.str.replace(",", "X", regex=False).str.replace(".", ",", regex=False).str.replace("X", ".", regex=False)
+    resultado = np.full(len(valores), None, dtype=object)
+    resultado[presentes.to_numpy()] = ("R$ " + texto).to_numpy()
+    return pd.Series(resultado, index=valores.index, dtype=object)
+
+
+# Valores monetários circulam como centavos inteiros (int ou arrays int64), com o
+# arredondamento do ROUND(x; 2) da planilha: meio centavo para longe do zero.
+# Decimal e "R$" só aparecem na apresentação.
+_NUMERO_PARTES = r"^([+-]?)([0-9]*)\.?([0-9]*)$"
+
+
+def _para_centavos(valor):
+    numero = valor if isinstance(valor, Decimal) else _parse_decimal(valor)
+    if numero is None or not numero.is_finite():
+        return None
+    return int((numero * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
 
-        mapa_participante_cpf = participantes.set_index("_id_part_norm")["_cpf_norm"].to_dict()
-        mapa_emprestimos = emprestimos.set_index("_id_emprest_norm").to_dict(orient="index")
 
-        ativos = []
-        for id_emprest_norm, grupo in parcelas_abertas.groupby("_id_emprest_norm"):
-            if not id_emprest_norm:
-                continue
-            emprestimo = mapa_emprestimos.get(id_emprest_norm)
-            if not emprestimo:
-                continue
+def _centavos_serie(serie):
+    # Equivalente vetorizado de _para_centavos; devolve Series Int64 (NA sem número)
+    serie = pd.Series(serie, dtype=object)
+    normalizados, simples = _normalizar_numero_serie(serie)
+    resultado = pd.Series(pd.NA, index=serie.index, dtype="Int64")
 
-            id_participante = emprestimo.get("_id_part_norm")
-            cpf = mapa_participante_cpf.get(id_participante)
-            if not cpf:
-                continue
+    partes = normalizados[simples].str.extract(_NUMERO_PARTES)
+    # Até 15 dígitos inteiros o cálculo cabe em int64 sem risco
+    exatos = partes[1].notna() & (partes[1].str.len() <= 15)
+    partes = partes[exatos]
+    if not partes.empty:
+        fracao = partes[2].str.pad(3, side="right", fillchar="0")
+        centavos = (
+            partes[1].replace("", "0").astype("int64") * 100
+            + fracao.str[:2].astype("int64")
+            + (fracao.str[2] >= "5").astype("int64")
+        )
+        centavos = centavos.where(partes[0] != "-", -centavos)
+        resultado[partes.index] = centavos
 
-            saldo_devedor = Decimal("0")
-            detalhes = []
-            for _, linha in grupo.iterrows():
-                valor_parcela = _parse_decimal(linha.get(col_saldo_parcela)) if col_saldo_parcela else None
-                if valor_parcela is None and col_valor_parcela:
-                    valor_parcela = _parse_decimal(linha.get(col_valor_parcela))
-                if valor_parcela is None:
-                    valor_parcela = Decimal("0")
-                saldo_devedor += valor_parcela
-
-                vencimento_fmt = ""
-                dt = pd.to_datetime(linha.get(col_vencimento), errors="coerce") if col_vencimento else None
-                if dt is not None and not pd.isna(dt):
-                    vencimento_fmt = dt.strftime("%d/%m/%Y")
-                elif col_vencimento:
-                    vencimento_fmt = str(linha.get(col_vencimento) or "").strip()
-
-                detalhes.append(
-                    {
-                        "parcela": str(linha.get(col_parcela) or "").strip(),
-                        "vencimento": vencimento_fmt,
-                        "valor": _formatar_real(valor_parcela) or "R$ 0,00",
-                    }
-                )
+    resto = normalizados.notna()
+    resto[partes.index] = False
+    if resto.any():
+        # Direto para Int64: passando por float64, None + inteiros acima de 2**53 não convertem.
+        # Valores além do int64 (mais de R$ 92 quatrilhões) levantam OverflowError.
+        resultado[resto] = pd.array([_para_centavos(valor) for valor in serie[resto]], dtype="Int64")
+    return resultado
 
-            valor_total = _parse_decimal(emprestimo.get(col_valor_final)) if col_valor_final else None
-            if valor_total is None and col_valor:
-                valor_total = _parse_decimal(emprestimo.get(col_valor))
-            if valor_total is None:
-                valor_total = saldo_devedor
 
-            id_emprestimo_original = str(emprestimo.get(col_id_emprest) or id_emprest_norm).strip()
-            ativos.append(
-                {
-                    "cpf": cpf,
-                    "id_participante": str(id_participante or "").strip(),
-                    "id_emprestimo": id_emprestimo_original,
-                    "valor_total_num": valor_total,
-                    "valor_total": _formatar_real(valor_total) or "R$ 0,00",
-                    "saldo_devedor_num": saldo_devedor,
-                    "saldo_devedor": _formatar_real(saldo_devedor) or "R$ 0,00",
-                    "parcelas_abertas": len(detalhes),
-                    "parcelas_detalhes": sorted(
-                        detalhes,
-                        key=lambda item: (
-                            pd.to_datetime(item.get("vencimento"), errors="coerce", dayfirst=True)
-                            if item.get("vencimento")
-                            else pd.Timestamp.max
-                        ),
-                    ),
-                }
-            )
+def _multiplicar_centavos(centavos, fator):
+    return int((Decimal(int(centavos)) * Decimal(fator)).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def _centavos_para_decimal(centavos):
+    return Decimal(int(centavos)).scaleb(-2)
+
+
+def _formatar_centavos(centavos):
+    if centavos is None or pd.isna(centavos):
+        return None
+    centavos = int(centavos)
+    sinal = "-" if centavos < 0 else ""
+    reais, resto = divmod(abs(centavos), 100)
+    return f"R$ {sinal}{reais:,}".replace(",", ".") + f",{resto:02d}"
+
+
+def _formatar_centavos_serie(centavos):
+    # Pela lista, sem passar por float64 (None + inteiros acima de 2**53 perderiam precisão)
+    indice = centavos.index if isinstance(centavos, pd.Series) else None
+    centavos = pd.Series(pd.array(list(centavos), dtype="Int64"), index=indice)
+    presentes = centavos.notna()
+    valores = centavos[presentes].astype("int64")
+    absolutos = valores.abs()
+    reais = (absolutos // 100).map("{:,}".format).str.replace(",", ".", regex=False)
+    resto = (absolutos % 100).astype(str).str.zfill(2)
+    sinal = pd.Series(np.where(valores < 0, "-", ""), index=valores.index)
+    resultado = np.full(len(centavos), None, dtype=object)
+    resultado[presentes.to_numpy()] = ("R$ " + sinal + reais + "," + resto).to_numpy()
+    return pd.Series(resultado, index=centavos.index, dtype=object)
+
+
+def _falsos_serie(serie):
+    # Células que valem False em "valor or ...": None, 0, "" e False (NaN não)
+    serie = pd.Series(serie, dtype=object)
+    return pd.Series(np.equal(serie.to_numpy(dtype=object), None), index=serie.index) | serie.isin([0, ""])
+
+
+def _texto_celula_serie(serie):
+    # Equivalente vetorizado de str(valor or "").strip()
+    serie = pd.Series(serie, dtype=object)
+    texto = serie.astype(str).str.strip()
+    return texto.mask(_falsos_serie(serie), "")
+
+
+def _normalizar_id_serie(serie):
+    # Equivalente vetorizado de _normalizar_id
+    texto = _texto_celula_serie(serie)
+    numeros = texto.str.replace(r"\D", "", regex=True)
+    resultado = numeros.where(numeros != "", texto.str.lower())
+    return resultado.where(texto != "", None)
+
+
+def _centavos_por_valor(serie):
+    # _centavos_serie calculado uma vez por valor distinto (parcelas repetem muito os valores)
+    serie = pd.Series(serie, dtype=object)
+    codigos, unicos = pd.factorize(serie)
+    if len(unicos) == 0:
+        return pd.Series(pd.NA, index=serie.index, dtype="Int64")
+    convertidos = _centavos_serie(pd.Series(unicos, dtype=object)).array
+    resultado = pd.Series(convertidos.take(np.where(codigos >= 0, codigos, 0)), index=serie.index)
+    return resultado.mask(codigos < 0)
+
+
+# Como str(datetime) grava as datas que o read_excel(dtype=str) entrega, e as digitadas
+# com barras. Com dayfirst=True o pd.to_datetime lê "2026-02-01" como 2 de janeiro (dia
+# antes do mês), e os formatos acompanham; o que não casar é convertido como antes.
+_FORMATOS_DATA = {
+    False: ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%m/%d/%Y"),
+    True: ("%Y-%d-%m %H:%M:%S", "%Y-%d-%m", "%d/%m/%Y"),
+}
+
+
+def _datas_serie_por_valor(serie, **opcoes):
+    # pd.to_datetime(valor, errors="coerce") célula a célula: os valores distintos em texto
+    # são convertidos de uma vez pelos formatos conhecidos; só os que sobram vão um a um
+    serie = pd.Series(serie, dtype=object)
+    codigos, unicos = pd.factorize(serie)
+    if len(unicos) == 0:
+        return pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+    unicos = pd.Series(unicos, dtype=object)
+    convertidos = pd.Series(pd.NaT, index=unicos.index, dtype="datetime64[ns]")
+    textos = unicos.map(type) == str
+    for formato in _FORMATOS_DATA[bool(opcoes.get("dayfirst"))]:
+        faltando = textos & convertidos.isna()
+        if not faltando.any():
+            break
+        convertidos[faltando] = pd.to_datetime(unicos[faltando], format=formato, errors="coerce")
+    resto = convertidos.isna()
+    if resto.any():
+        convertidos[resto] = pd.DatetimeIndex([
+            # Datas vindas do openpyxl não precisam passar pela inferência de formato
+            pd.Timestamp(v) if isinstance(v, (pd.Timestamp, np.datetime64)) or hasattr(v, "toordinal")
+            else pd.to_datetime(v, errors="coerce", **opcoes)
+            for v in unicos[resto]
+        ])
+    resultado = pd.Series(convertidos.to_numpy().take(np.where(codigos >= 0, codigos, 0)), index=serie.index)
+    return resultado.where(codigos >= 0, pd.NaT)
+
+
+def _tabela_parcelas(parcelas):
+    # Uma linha por parcela, já normalizada: ID do empréstimo, parcela, vencimento exibido,
+    # _ordem (data do vencimento; sem data, Timestamp.max), _centavos (saldo, senão valor),
+    # _valor_centavos (valor, senão saldo) e _status
+    col_status_parc = _encontrar_coluna(parcelas.columns, ["status"])
+    col_id_emprest_parc = _encontrar_coluna(parcelas.columns, ["id_emprest", "id emprest"])
+    col_parcela = _encontrar_coluna(parcelas.columns, ["parcela"])
+    col_vencimento = _encontrar_coluna(parcelas.columns, ["venc"])
+    col_saldo_parcela = _encontrar_coluna(parcelas.columns, ["saldo"])
+    col_valor_parcela = _encontrar_coluna(parcelas.columns, ["valor"])
+    if not col_status_parc or not col_id_emprest_parc:
+        return None
+
+    status = parcelas[col_status_parc].fillna("").astype(str).str.strip().str.lower()
+
+    # Parcelas: cada coluna é convertida uma vez
+    sem_valor = pd.Series(pd.NA, index=parcelas.index, dtype="Int64")
+    saldo = _centavos_por_valor(parcelas[col_saldo_parcela]) if col_saldo_parcela else sem_valor
+    valor = _centavos_por_valor(parcelas[col_valor_parcela]) if col_valor_parcela else sem_valor
+    vencimento = ""
+    ordem = pd.Series(pd.Timestamp.max, index=parcelas.index)
+    if col_vencimento:
+        datas = _datas_serie_por_valor(parcelas[col_vencimento])
+        texto = _texto_celula_serie(parcelas[col_vencimento])
+        vencimento = datas.dt.strftime("%d/%m/%Y").where(datas.notna(), texto)
+        # Mesma ordem de antes: a data lida do texto exibido (dia primeiro); sem data, no fim
+        ordem = datas.dt.normalize()
+        sem_data = datas.isna()
+        if sem_data.any():
+            ordem[sem_data] = _datas_serie_por_valor(texto[sem_data], dayfirst=True)
+        ordem = ordem.where(ordem.notna() & (vencimento != ""), pd.Timestamp.max)
+    detalhes = pd.DataFrame({
+        "_id_emprest_norm": _normalizar_id_serie(parcelas[col_id_emprest_parc]),
+        "parcela": _texto_celula_serie(parcelas[col_parcela]) if col_parcela else "",
+        "vencimento": vencimento,
+        "_ordem": ordem,
+        "_centavos": saldo.fillna(valor).fillna(0).astype("int64"),
+        "_valor_centavos": valor.fillna(saldo).fillna(0).astype("int64"),
+        "_status": status,
+    })
+    return detalhes[detalhes["_id_emprest_norm"].notna()]
+
+
+def _tabela_emprestimos(emprestimos):
+    # Um empréstimo por ID normalizado (o último, se repetido), com o participante e o valor total
+    col_id_emprest = _encontrar_coluna(emprestimos.columns, ["id"])
+    col_id_part = _encontrar_coluna(emprestimos.columns, ["id_participante", "id participante"])
+    col_valor_final = _encontrar_coluna(emprestimos.columns, ["valor final", "valor_total", "valor total"])
+    col_valor = _encontrar_coluna(emprestimos.columns, ["valor"])
+    if not col_id_emprest or not col_id_part:
+        return None
+
+    valor_total = _centavos_serie(emprestimos[col_valor_final]) if col_valor_final else pd.Series(pd.NA, index=emprestimos.index, dtype="Int64")
+    if col_valor:
+        valor_total = valor_total.fillna(_centavos_serie(emprestimos[col_valor]))
+    id_emprest_norm = _normalizar_id_serie(emprestimos[col_id_emprest])
+    id_original = emprestimos[col_id_emprest].astype(object)
+    tabela = pd.DataFrame({
+        "_id_emprest_norm": id_emprest_norm,
+        "_id_part_norm": _normalizar_id_serie(emprestimos[col_id_part]),
+        "id_emprestimo": id_original.astype(str).mask(_falsos_serie(id_original), id_emprest_norm).str.strip(),
+        "_valor_total": valor_total,
+    })
+    tabela = tabela[tabela["_id_emprest_norm"].notna()]
+    return tabela.drop_duplicates("_id_emprest_norm", keep="last")
+
+
+def _ajustar_arredondamento(detalhes, tabela_emprestimos):
+    # Cada parcela é arredondada para centavos sozinha, e a soma pode não bater com o
+    # valor total do empréstimo. A diferença (até um centavo por parcela) vai para a
+    # última parcela em aberto, para que saldo devedor = valor total - pago.
+    valores = detalhes.groupby("_id_emprest_norm")["_valor_centavos"].agg(["sum", "size"])
+    totais = tabela_emprestimos.set_index("_id_emprest_norm")["_valor_total"].reindex(valores.index)
+    residuo = (totais - valores["sum"]).dropna()
+    residuo = residuo[(residuo != 0) & (residuo.abs() <= valores["size"][residuo.index])]
+    if residuo.empty:
+        return detalhes
+    abertas = detalhes[(detalhes["_status"] == "em aberto") & detalhes["_id_emprest_norm"].isin(residuo.index)]
+    ultimas = abertas.sort_values(["_id_emprest_norm", "_ordem"], kind="mergesort").drop_duplicates(
+        "_id_emprest_norm", keep="last"
+    )
+    detalhes = detalhes.copy()
+    detalhes.loc[ultimas.index, "_centavos"] += residuo[ultimas["_id_emprest_norm"]].to_numpy(dtype="int64")
+    return detalhes
+
+
+def agregar_emprestimos_ativos(parcelas, emprestimos, participantes):
+    """Empréstimos com parcelas em aberto, calculados por colunas (sem laço por linha do pandas).
+
+    parcelas e emprestimos são as abas da planilha; participantes é um DataFrame com as
+    colunas id_norm e cpf. Devolve a lista ordenada pelo ID do empréstimo.
+    """
+    if parcelas is None or parcelas.empty or emprestimos is None or emprestimos.empty:
+        return []
+
+    detalhes = _tabela_parcelas(parcelas)
+    tabela_emprestimos = _tabela_emprestimos(emprestimos)
+    if detalhes is None or tabela_emprestimos is None:
+        return []
+    detalhes = _ajustar_arredondamento(detalhes, tabela_emprestimos)
+    detalhes = detalhes[detalhes["_status"] == "em aberto"]
+    if detalhes.empty:
+        return []
+
+    participantes = participantes.rename(columns={"id_norm": "_id_part_norm"})
+    participantes = participantes[participantes["cpf"].fillna("").astype(bool)]
+
+    resumo = (
+        detalhes.groupby("_id_emprest_norm")
+        .agg(_saldo=("_centavos", "sum"), parcelas_abertas=("_centavos", "size"))
+        .reset_index()
+        .merge(tabela_emprestimos, on="_id_emprest_norm", how="inner")
+        .merge(participantes[["_id_part_norm", "cpf"]], on="_id_part_norm", how="inner")
+    )
+    if resumo.empty:
+        return []
+    resumo["_valor_total"] = resumo["_valor_total"].fillna(resumo["_saldo"]).astype("int64")
+    resumo["_ordem"] = _normalizar_id_serie(resumo["id_emprestimo"])
+    resumo = resumo.sort_values(["_ordem", "_id_emprest_norm"], kind="mergesort")
+
+    detalhes = detalhes[detalhes["_id_emprest_norm"].isin(resumo["_id_emprest_norm"])]
+    detalhes = detalhes.sort_values(["_id_emprest_norm", "_ordem"], kind="mergesort")
+    por_emprestimo = {}
+    for id_norm, parcela, venc, valor_fmt in zip(
+        detalhes["_id_emprest_norm"].tolist(),
+        detalhes["parcela"].tolist(),
+        detalhes["vencimento"].tolist(),
+        _formatar_centavos_serie(detalhes["_centavos"]).tolist(),
+    ):
+        por_emprestimo.setdefault(id_norm, []).append({"parcela": parcela, "vencimento": venc, "valor": valor_fmt})
+
+    saldos_fmt = _formatar_centavos_serie(resumo["_saldo"]).tolist()
+    totais_fmt = _formatar_centavos_serie(resumo["_valor_total"]).tolist()
+    return [
+        {
+            "cpf": cpf,
+            "id_participante": id_part,
+            "id_emprestimo": id_emprestimo,
+            "valor_total_centavos": total,
+            "valor_total": total_fmt,
+            "saldo_devedor_centavos": saldo,
+            "saldo_devedor": saldo_fmt,
+            "parcelas_abertas": quantidade,
+            "parcelas_detalhes": por_emprestimo[id_norm],
+        }
+        for id_norm, cpf, id_part, id_emprestimo, total, total_fmt, saldo, saldo_fmt, quantidade in zip(
+            resumo["_id_emprest_norm"].tolist(),
+            resumo["cpf"].tolist(),
+            resumo["_id_part_norm"].tolist(),
+            resumo["id_emprestimo"].tolist(),
+            resumo["_valor_total"].tolist(),
+            totais_fmt,
+            resumo["_saldo"].tolist(),
+            saldos_fmt,
+            resumo["parcelas_abertas"].tolist(),
+        )
+    ]
 
-        ativos = sorted(ativos, key=lambda item: _normalizar_id(item.get("id_emprestimo")))
-        return ativos
+
+def _buscar_emprestimos_ativos():
+    abas = carregar_abas(
+        XLSX_PATH,
+        {
+            "parcelas": ["parcelas", "parcela"],
+            "emprestimos": ["emprestimos", "emprestimo"],
+        },
+    )
+    por_id = indice_participantes()["por_id"]
+    participantes = pd.DataFrame(
+        {"id_norm": list(por_id), "cpf": [p["cpf"] for p in por_id.values()]},
+        columns=["id_norm", "cpf"],
+    )
+    try:
+        return agregar_emprestimos_ativos(abas["parcelas"], abas["emprestimos"], participantes)
     except Exception:
         return []
-    finally:
-        try:
-            if hasattr(xl, "close"):
-                xl.close()
-        except Exception:
-            pass
+
+
+def _chave_versao(*caminhos):
+    # Versão das fontes no nome dos arquivos exportados
+    versoes = tuple(_versao_arquivo(c) for c in caminhos)
+    return hashlib.sha1(repr(versoes).encode("utf-8")).hexdigest()[:16]
+
+
+def _exportar_versionado(nome, chave, escrever):
+    """Grava exportacoes/<nome>-<chave>.csv uma única vez por versão e devolve o caminho.
+
+    Depois que a versão nova está no lugar, as anteriores do mesmo nome são apagadas.
+    """
+    destino = os.path.join(EXPORTACOES_DIR, f"{nome}-{chave}.csv")
+    if os.path.exists(destino):
+        return destino
+    with _trava_derivado(os.path.join(EXPORTACOES_DIR, nome)):
+        if not os.path.exists(destino):
+            with _escrita_atomica(destino, newline="", encoding="utf-8") as f:
+                escrever(f)
+        for antigo in glob.glob(os.path.join(EXPORTACOES_DIR, f"{glob.escape(nome)}-*.csv")):
+            if antigo != destino:
+                try:
+                    os.remove(antigo)
+                except OSError:
+                    pass
+    return destino
+
+
+_emprestimos_lock = threading.Lock()
+_indice_emprestimos = {"versao": None, "ativos": [], "por_cpf": {}, "por_id": {}}
+
+
+def indice_emprestimos():
+    """Empréstimos em aberto indexados por CPF normalizado e por ID normalizado.
+
+    Calculado uma vez por versão da planilha (e de informacoes.csv); por_cpf já
+    traz o saldo devedor somado de cada participante.
+    """
+    global _indice_emprestimos
+    versao = (_versao_arquivo(XLSX_PATH), _versao_arquivo(INFORMACOES_CSV))
+    with _emprestimos_lock:
+        if _indice_emprestimos["versao"] == versao:
+            return _indice_emprestimos
+        ativos = _buscar_emprestimos_ativos()
+        agrupados = {}
+        por_id = {}
+        for item in ativos:
+            agrupados.setdefault(item["cpf"], []).append(item)
+            por_id.setdefault(_normalizar_id(item["id_emprestimo"]), item)
+        por_cpf = {}
+        for cpf, emprestimos in agrupados.items():
+            saldo_total = sum(item["saldo_devedor_centavos"] for item in emprestimos)
+            por_cpf[cpf] = {
+                "saldo_devedor_centavos": saldo_total,
+                "saldo_devedor": _formatar_centavos(saldo_total),
+                "emprestimos": emprestimos,
+            }
+        _indice_emprestimos = {"versao": versao, "ativos": ativos, "por_cpf": por_cpf, "por_id": por_id}
+        return _indice_emprestimos
+
+
+def emprestimos_ativos():
+    return indice_emprestimos()["ativos"]
 
 
 def atualizar_emprestimos_ativos_csv(ativos=None):
     if ativos is None:
-        ativos = _buscar_emprestimos_ativos()
-    os.makedirs(CSV_DIR, exist_ok=True)
+        ativos = emprestimos_ativos()
     linhas = []
     for item in ativos:
         for detalhe in item.get("parcelas_detalhes", []):
@@ -546,65 +1326,37 @@ def atualizar_emprestimos_ativos_csv(ativos=None):
                 }
             )
     try:
-        pd.DataFrame(linhas).to_csv(EMPRESTIMOS_ATIVOS_CSV, index=False, encoding="utf-8")
+        return _exportar_versionado(
+            "emprestimos_ativos",
+            _chave_versao(XLSX_PATH, INFORMACOES_CSV),
+            lambda f: pd.DataFrame(linhas).to_csv(f, index=False),
+        )
     except Exception:
         return None
-    return linhas
 
 
 def buscar_emprestimos_ativos_por_cpf(cpf):
-    cpf_norm = _normalizar_cpf(cpf)
-    if not cpf_norm:
-        return {"saldo_devedor_num": Decimal("0"), "saldo_devedor": "R$ 0,00", "emprestimos": []}
-
-    ativos = _buscar_emprestimos_ativos()
-    atualizar_emprestimos_ativos_csv(ativos=ativos)
-    emprestimos_usuario = [item for item in ativos if item.get("cpf") == cpf_norm]
-    saldo_total = sum((item.get("saldo_devedor_num", Decimal("0")) for item in emprestimos_usuario), Decimal("0"))
-    return {
-        "saldo_devedor_num": saldo_total,
-        "saldo_devedor": _formatar_real(saldo_total) or "R$ 0,00",
-        "emprestimos": emprestimos_usuario,
-    }
-
+    return repositorio().emprestimos_ativos_por_cpf(cpf)
 
-def buscar_saldos_por_cpf(cpf):
-    cpf_normalizado = _normalizar_cpf(cpf)
-    if not cpf_normalizado:
-        return None
 
-    df = None
-    if os.path.exists(INFORMACOES_CSV):
-        df = pd.read_csv(INFORMACOES_CSV, dtype=str, encoding="utf-8")
+def buscar_parcelas_abertas_por_cpf(cpf):
+    return repositorio().parcelas_abertas_por_cpf(cpf)
 
-    if df is None or df.empty:
-        df = atualizar_informacoes_csv()
 
-    if df is None or df.empty:
+def buscar_emprestimo_por_id(id_emprestimo):
+    id_norm = _normalizar_id(id_emprestimo)
+    if not id_norm:
         return None
+    return indice_emprestimos()["por_id"].get(id_norm)
 
-    coluna_cpf = _encontrar_coluna(df.columns, ["cpf"])
-    coluna_atual = _encontrar_coluna(df.columns, ["atual", "saldo atual", "saldo_atual", "saldo"])
-    coluna_aplicado = _encontrar_coluna(df.columns, ["aplicado"])
-
-    if not coluna_cpf or not coluna_atual:
-        df = atualizar_informacoes_csv()
-        if df is None or df.empty:
-            return None
-        coluna_cpf = _encontrar_coluna(df.columns, ["cpf"])
-        coluna_atual = _encontrar_coluna(df.columns, ["atual", "saldo atual", "saldo_atual", "saldo"])
-        coluna_aplicado = _encontrar_coluna(df.columns, ["aplicado"])
-        if not coluna_cpf or not coluna_atual:
-            return None
 
-    df["_cpf_norm"] = df[coluna_cpf].apply(_normalizar_cpf)
-    linha = df.loc[df["_cpf_norm"] == cpf_normalizado]
-    if linha.empty:
+def buscar_saldos_por_cpf(cpf):
+    participante = buscar_participante_por_cpf(cpf)
+    if not participante:
         return None
 
-    linha0 = linha.iloc[0]
-    saldo_atual = _parse_decimal(linha0[coluna_atual]) if coluna_atual else None
-    saldo_aplicado = _parse_decimal(linha0[coluna_aplicado]) if coluna_aplicado else None
+    saldo_atual = participante["atual_centavos"]
+    saldo_aplicado = participante["aplicado_centavos"]
 
     if saldo_atual is None:
         return None
@@ -614,13 +1366,22 @@ def buscar_saldos_por_cpf(cpf):
         variacao = saldo_atual - saldo_aplicado
 
     return {
-        "atual": _formatar_real(saldo_atual),
-        "aplicado": _formatar_real(saldo_aplicado) if saldo_aplicado is not None else None,
-        "variacao": _formatar_real(variacao) if variacao is not None else None,
-        "variacao_num": float(variacao) if variacao is not None else 0,
+        "atual": _formatar_centavos(saldo_atual),
+        "aplicado": _formatar_centavos(saldo_aplicado),
+        "variacao": _formatar_centavos(variacao),
+        "variacao_num": variacao / 100 if variacao is not None else 0,
     }
 
 
+def _somar_centavos(serie):
+    try:
+        centavos = _centavos_serie(serie).dropna().tolist()
+    except OverflowError:
+        # Algum valor não cabe em int64: essa célula conta como inválida
+        centavos = [c for c in map(_para_centavos, serie) if c is not None and -2**63 <= c < 2**63]
+    return sum(int(c) for c in centavos)
+
+
 def buscar_saldos_totais():
     df = None
     if os.path.exists(INFORMACOES_CSV):
@@ -640,57 +1401,29 @@ def buscar_saldos_totais():
     if not coluna_atual or not coluna_aplicado:
         return None
 
-    total_aplicado = Decimal("0")
-    total_atual = Decimal("0")
-
-    for valor in df[coluna_aplicado]:
-        numero = _parse_decimal(valor)
-        if numero is not None:
-            total_aplicado += numero
-
-    for valor in df[coluna_atual]:
-        numero = _parse_decimal(valor)
-        if numero is not None:
-            total_atual += numero
+    total_aplicado = _somar_centavos(df[coluna_aplicado])
+    total_atual = _somar_centavos(df[coluna_atual])
 
     variacao = total_atual - total_aplicado
 
     return {
-        "aplicado": _formatar_real(total_aplicado),
-        "atual": _formatar_real(total_atual),
-        "variacao": _formatar_real(variacao),
-        "variacao_num": float(variacao),
+        "aplicado": _formatar_centavos(total_aplicado),
+        "atual": _formatar_centavos(total_atual),
+        "variacao": _formatar_centavos(variacao),
+        "variacao_num": variacao / 100,
     }
 
 
-def buscar_extrato_por_cpf(cpf):
-    cpf_normalizado = _normalizar_cpf(cpf)
-    if not cpf_normalizado:
-        return []
-
-    participantes = carregar_participantes_df()
-    if participantes is None or participantes.empty:
-        return []
-
-    coluna_cpf = _encontrar_coluna(participantes.columns, ["cpf"])
-    coluna_id = _encontrar_coluna(participantes.columns, ["id"])
-    if not coluna_cpf or not coluna_id:
-        return []
+_extrato_lock = threading.Lock()
+_extrato_por_participante = {"versao": None, "grupos": {}, "chaves": {}}
+EXTRATO_COLUNAS = ["data", "categoria", "tipo", "transacao", "valor", "valor_classe"]
 
-    participantes["_cpf_norm"] = participantes[coluna_cpf].apply(_normalizar_cpf)
-    participantes["_id_norm"] = participantes[coluna_id].apply(_normalizar_id)
-    linha = participantes.loc[participantes["_cpf_norm"] == cpf_normalizado]
-    if linha.empty:
-        return []
-
-    id_participante = linha.iloc[0].get("_id_norm")
-    if not id_participante:
-        return []
-
-    extrato = _carregar_extrato_df()
-    if extrato is None or extrato.empty:
-        return []
 
+def _montar_extrato(extrato):
+    # Agrupa as transações por participante, já ordenadas (data desc, nº da transação,
+    # linha na planilha) e formatadas. Devolve (grupos, chaves); chaves[id] é a lista
+    # crescente de (-AAAAMMDDhhmmss, transacao, linha), única por transação, usada na
+    # paginação por cursor.
     coluna_id_extrato = _encontrar_coluna(extrato.columns, ["id"])
     coluna_categoria = _encontrar_coluna(extrato.columns, ["categoria"])
     coluna_tipo = _encontrar_coluna(extrato.columns, ["tipo"])
@@ -702,100 +1435,369 @@ def buscar_extrato_por_cpf(cpf):
     )
 
     if not coluna_id_extrato or not coluna_data or not coluna_valor or not coluna_transacao:
-        return []
-
-    extrato["_id_norm"] = extrato[coluna_id_extrato].apply(_normalizar_id)
-    filtrado = extrato.loc[extrato["_id_norm"] == id_participante].copy()
-    if filtrado.empty:
-        return []
-
-    saida = pd.DataFrame()
-    saida["data"] = filtrado[coluna_data].fillna("").astype(str).str.strip()
-    saida["categoria"] = filtrado[coluna_categoria].fillna("").astype(str).str.strip() if coluna_categoria else ""
-    saida["tipo"] = filtrado[coluna_tipo].fillna("").astype(str).str.strip() if coluna_tipo else ""
-    saida["transacao"] = filtrado[coluna_transacao].fillna("").astype(str).str.strip()
-    saida["valor_bruto"] = filtrado[coluna_valor].fillna("").astype(str).str.strip()
+        return {}, {}
+
+    def _texto(coluna):
+        if not coluna:
+            return pd.Series("", index=extrato.index)
+        return extrato[coluna].fillna("").astype(str).str.strip()
+
+    saida = pd.DataFrame(index=extrato.index)
+    saida["_id_norm"] = extrato[coluna_id_extrato].apply(_normalizar_id)
+    # Desempate único: duas transações no mesmo dia podem ter o mesmo nº (ou nenhum)
+    saida["_linha"] = np.arange(len(extrato))
+    saida["data"] = _texto(coluna_data)
+    saida["categoria"] = _texto(coluna_categoria)
+    saida["tipo"] = _texto(coluna_tipo)
+    saida["transacao"] = _texto(coluna_transacao)
+    saida["valor_bruto"] = _texto(coluna_valor)
+    saida = saida[saida["_id_norm"].notna()]
+    if saida.empty:
+        return {}, {}
 
     datas = pd.to_datetime(saida["data"], errors="coerce")
     saida["_data_sort"] = datas
-    saida = saida.sort_values(by="_data_sort", ascending=False).drop(columns=["_data_sort"])
-
-    valores_fmt = []
-    classes = []
-    for _, row in saida.iterrows():
-        valor = row.get("valor_bruto")
-        tipo = _normalizar_texto(row.get("tipo"))
-        numero = _parse_decimal(valor)
-        if numero is None:
-            valores_fmt.append(str(valor or ""))
-            classes.append("valor-neutro")
-            continue
-
-        sinal = ""
-        classe = "valor-neutro"
-        if "entrada" in tipo:
-            sinal = "+"
-            classe = "valor-entrada"
-        elif "saida" in tipo or "saída" in tipo:
-            sinal = "-"
-            classe = "valor-saida"
-
-        valores_fmt.append(f"{sinal} {_formatar_real(numero)}".strip())
-        classes.append(classe)
-
-    saida["valor"] = valores_fmt
-    saida["valor_classe"] = classes
-    saida = saida.drop(columns=["valor_bruto"])
-
-    datas_fmt = []
-    for valor in saida["data"]:
-        dt = pd.to_datetime(valor, errors="coerce")
-        if pd.isna(dt):
-            datas_fmt.append(valor)
-        else:
-            datas_fmt.append(dt.strftime("%d/%m/%Y"))
+    # Sem data fica com 0, depois de todas as datas válidas na ordem decrescente
+    saida["_ordem_data"] = -(saida["_data_sort"].dt.strftime("%Y%m%d%H%M%S").fillna("0").astype("int64"))
+    # Ordena exatamente pela chave do cursor
+    saida = saida.sort_values(by=["_ordem_data", "transacao", "_linha"], kind="stable")
+
+    numeros = _decimais_serie(saida["valor_bruto"])
+    # "is not None", como no escalar: Decimal("NaN") também é número ("R$ NaN")
+    com_numero = pd.Series(np.not_equal(numeros.to_numpy(dtype=object), None), index=numeros.index)
+    tipo_norm = (
+        saida["tipo"].str.lower().str.normalize("NFKD").str.replace(r"[\u0300-\u036f]", "", regex=True)
+    )
+    entrada = com_numero & tipo_norm.str.contains("entrada", regex=False)
+    saida_ = com_numero & ~entrada & tipo_norm.str.contains("saida", regex=False)
+    formatado = _formatar_real_serie(numeros)
+    saida["valor"] = saida["valor_bruto"].where(~com_numero, formatado)
+    saida.loc[entrada, "valor"] = "+ " + formatado[entrada]
+    saida.loc[saida_, "valor"] = "- " + formatado[saida_]
+    saida["valor_classe"] = np.select([entrada, saida_], ["valor-entrada", "valor-saida"], "valor-neutro")
+
+    datas_fmt = saida["_data_sort"].dt.strftime("%d/%m/%Y")
+    sem_data = saida["_data_sort"].isna()
+    if sem_data.any():
+        # Datas fora do formato dominante: tenta uma a uma, como antes
+        datas_fmt = datas_fmt.astype(object)
+        for idx in saida.index[sem_data]:
+            texto = saida.at[idx, "data"]
+            dt = pd.to_datetime(texto, errors="coerce")
+            datas_fmt.at[idx] = texto if pd.isna(dt) else dt.strftime("%d/%m/%Y")
     saida["data"] = datas_fmt
 
-    os.makedirs(CSV_DIR, exist_ok=True)
-    saida.to_csv(EXTRATO_CSV, index=False, encoding="utf-8")
+    grupos = {}
+    chaves = {}
+    for id_norm, grupo in saida.groupby("_id_norm", sort=False):
+        grupos[id_norm] = grupo[EXTRATO_COLUNAS].to_dict(orient="records")
+        chaves[id_norm] = list(zip(grupo["_ordem_data"].tolist(), grupo["transacao"].tolist(), grupo["_linha"].tolist()))
+    return grupos, chaves
 
-    try:
-        df_csv = pd.read_csv(EXTRATO_CSV, dtype=str, encoding="utf-8")
-    except Exception:
-        return []
 
-    if df_csv is None or df_csv.empty:
-        return []
+def _carregar_extrato_indexado():
+    global _extrato_por_participante
+    versao_atual = _versao_arquivo(XLSX_PATH)
+    with _extrato_lock:
+        if versao_atual is not None and _extrato_por_participante["versao"] == versao_atual:
+            return _extrato_por_participante
+        extrato = _carregar_extrato_df()
+        grupos, chaves = _montar_extrato(extrato) if extrato is not None else ({}, {})
+        _extrato_por_participante = {"versao": versao_atual, "grupos": grupos, "chaves": chaves}
+        return _extrato_por_participante
 
-    df_csv = df_csv.fillna("")
-    return df_csv.to_dict(orient="records")
 
+def extrato_por_participante():
+    """Transações agrupadas por ID de participante, montadas uma vez por versão da planilha."""
+    return _carregar_extrato_indexado()["grupos"]
 
-def buscar_evolucao_caixinha(limite=60):
-    # Prioriza relatorio.csv (com cabeçalho)
-    if os.path.exists(RELATORIO_CSV):
-        try:
-            df = pd.read_csv(RELATORIO_CSV, dtype=str, encoding="utf-8")
-        except Exception:
-            df = None
-        if df is not None and not df.empty:
-            coluna_valor = _encontrar_coluna(df.columns, ["caixinha 2026", "caixinha2026", "caixinha"])
-            coluna_data = _encontrar_coluna(df.columns, ["data"])
-            if coluna_valor:
-                dados = []
-                if isinstance(limite, int):
-                    df = df.tail(limite)
-                for _, row in df.iterrows():
-                    valor_num = _parse_decimal(row.get(coluna_valor))
-                    if valor_num is None:
-                        continue
-                    dados.append({
-                        "data": str(row.get(coluna_data, "")).strip() if coluna_data else "",
-                        "valor": float(valor_num),
-                    })
-                return dados
 
-    # Fallback: tenta evolucao_caixinha.csv
+def buscar_extrato_por_cpf(cpf):
+    return list(iterar_extrato(cpf))
+
+
+def _codificar_cursor_extrato(chave):
+    ordem_data, transacao, linha = chave
+    return f"{-ordem_data}_{linha}_{transacao}"
+
+
+def _decodificar_cursor_extrato(cursor):
+    # <AAAAMMDDhhmmss>_<linha>_<transacao>; a transação vai por último porque pode ter "_"
+    partes = str(cursor or "").split("_", 2)
+    if len(partes) != 3 or not partes[0].isdigit() or not partes[1].isdigit():
+        return None
+    return (-int(partes[0]), partes[2], int(partes[1]))
+
+
+def buscar_extrato_paginado(cpf, cursor=None, limite=50):
+    """Página do extrato em ordem decrescente de data, por cursor (keyset).
+
+    O cursor é o da última transação da página anterior; proximo_cursor vem None
+    quando não há mais transações.
+    """
+    return repositorio().extrato_paginado(cpf, cursor=cursor, limite=limite)
+
+
+def iterar_extrato(cpf):
+    yield from repositorio().extrato_por_cpf(cpf)
+
+
+def iterar_extrato_csv(cpf):
+    # Gera o CSV linha a linha, sem montar o arquivo inteiro em memória
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXTRATO_COLUNAS)
+    for item in iterar_extrato(cpf):
+        writer.writerow([item.get(coluna, "") for coluna in EXTRATO_COLUNAS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def exportar_extrato_csv(cpf, caminho=None):
+    # Sem caminho: exportacoes/extrato-<id>-<versão>.csv, gravado uma vez por versão da planilha
+    if caminho is None:
+        participante = buscar_participante_por_cpf(cpf)
+        id_participante = participante.get("id_norm") if participante else None
+        if not id_participante:
+            return None
+        return _exportar_versionado(
+            f"extrato-{id_participante}",
+            _chave_versao(XLSX_PATH, INFORMACOES_CSV),
+            lambda f: f.writelines(iterar_extrato_csv(cpf)),
+        )
+    with _trava_derivado(caminho), _escrita_atomica(caminho, newline="", encoding="utf-8") as f:
+        f.writelines(iterar_extrato_csv(cpf))
+    return caminho
+
+
+def _pontos_evolucao(df, coluna_data, coluna_valor):
+    valores = _parse_decimal_serie(df[coluna_valor])
+    if coluna_data:
+        datas = df[coluna_data].astype(str).str.strip()
+    else:
+        datas = pd.Series("", index=df.index)
+    validos = valores.notna()
+    return [
+        {"data": data, "valor": valor}
+        for data, valor in zip(datas[validos].tolist(), valores[validos].tolist())
+    ]
+
+
+# Série de evolução mantida só com acréscimos: a cada mudança de relatorio.csv lê apenas os
+# bytes novos. Se o arquivo foi trocado (outro inode: a exportação completa grava um novo e
+# faz os.replace) ou o começo mudou (cabeçalho ou última linha já lida), a série é refeita
+# e a geração avança, para os clientes com since= saberem que precisam recomeçar.
+_serie_lock = threading.Lock()
+
+
+def _serie_nova(geracao):
+    return {
+        "geracao": geracao,
+        "versao": None,
+        "inode": None,
+        "cabecalho": b"",
+        "lido": 0,
+        "ultima": b"",
+        "coluna_data": None,
+        "coluna_valor": None,
+        "coluna_mes": None,
+        "coluna_ano": None,
+        "pontos": [],
+        "valores": np.empty(0, dtype="float64"),
+        "dias": np.empty(0, dtype="float64"),
+        "periodos": {"semana": [], "mes": []},
+        "reducoes": {},
+        "total": 0,
+    }
+
+
+_serie_evolucao = _serie_nova(0)
+
+
+def _bloco_novo_relatorio(f, serie):
+    # Bytes depois do que já foi lido; None quando o prefixo conhecido não confere mais
+    cabecalho = serie["cabecalho"]
+    lido = serie["lido"]
+    info = os.fstat(f.fileno())
+    if not cabecalho or info.st_ino != serie["inode"] or info.st_size < lido:
+        return None
+    if f.read(len(cabecalho)) != cabecalho:
+        return None
+    ultima = serie["ultima"]
+    if ultima:
+        f.seek(lido - len(ultima))
+        if f.read(len(ultima)) != ultima:
+            return None
+    f.seek(lido)
+    return f.read()
+
+
+def _ler_cabecalho_serie(serie, bloco):
+    fim = bloco.find(b"\n") + 1
+    if not fim:
+        return b""
+    serie["cabecalho"] = bloco[:fim]
+    serie["lido"] = fim
+    colunas = next(csv.reader([bloco[:fim].decode("utf-8-sig", errors="replace")]), [])
+    colunas = [c.strip() for c in colunas]
+    coluna_valor = _encontrar_coluna(colunas, ["caixinha 2026", "caixinha2026", "caixinha"])
+    coluna_data = _encontrar_coluna(colunas, ["data"])
+    serie["coluna_valor"] = colunas.index(coluna_valor) if coluna_valor else None
+    serie["coluna_data"] = colunas.index(coluna_data) if coluna_data else None
+    # Mês/Ano exatos: "Investido Mês" também contém "mes"
+    normalizadas = [_normalizar_texto(c) for c in colunas]
+    serie["coluna_mes"] = normalizadas.index("mes") if "mes" in normalizadas else None
+    serie["coluna_ano"] = normalizadas.index("ano") if "ano" in normalizadas else None
+    return bloco[fim:]
+
+
+def _crescer_array(buffer, inicio, novos):
+    # Acrescenta em buffer com folga (dobra a capacidade), sem copiar a série a cada linha
+    total = inicio + len(novos)
+    if total > len(buffer):
+        maior = np.empty(max(total, 2 * len(buffer), 64), dtype=buffer.dtype)
+        maior[:inicio] = buffer[:inicio]
+        buffer = maior
+    buffer[inicio:total] = novos
+    return buffer
+
+
+MESES = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
+    "julho": 7, "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+}
+
+
+def _datas_serie(datas):
+    # Aceita "2026-02-04 00:00:00" e "04/02/2026", como o gráfico do dashboard
+    datas = pd.Series(datas, dtype=object)
+    iso = pd.to_datetime(datas, format="ISO8601", errors="coerce")
+    br = pd.to_datetime(datas, format="%d/%m/%Y", errors="coerce")
+    return iso.fillna(br)
+
+
+def _chaves_periodo(datas, meses=None, anos=None):
+    # Semana ISO pela data; mês pelas colunas Mês/Ano do relatório (ou pela data, sem elas)
+    convertidas = _datas_serie(datas)
+    semanas = []
+    chaves_mes = []
+    for i, d in enumerate(convertidas):
+        conhecida = not pd.isna(d)
+        if conhecida:
+            ano_iso, semana, _ = d.isocalendar()
+            semanas.append(f"{ano_iso}-S{semana:02d}")
+        else:
+            semanas.append(None)
+        mes = MESES.get(_normalizar_texto(meses[i])) if meses else None
+        ano = str(anos[i]).strip() if anos else ""
+        if mes and ano.isdigit():
+            chaves_mes.append(f"{ano}-{mes:02d}")
+        elif conhecida:
+            chaves_mes.append(f"{d.year}-{d.month:02d}")
+        else:
+            chaves_mes.append(None)
+    dias = (convertidas - pd.Timestamp("1970-01-01")) / pd.Timedelta(days=1)
+    return {"semana": semanas, "mes": chaves_mes}, dias.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _acumular_periodos(periodos, pontos, chaves):
+    # Fechamento (último valor), mínimo e máximo por período, atualizados só com os pontos novos
+    for tipo, lista in periodos.items():
+        for ponto, chave in zip(pontos, chaves[tipo]):
+            if chave is None:
+                continue
+            valor = ponto["valor"]
+            if lista and lista[-1]["periodo"] == chave:
+                atual = lista[-1]
+                atual.update(data=ponto["data"], valor=valor, pontos=atual["pontos"] + 1)
+                atual["minimo"] = min(atual["minimo"], valor)
+                atual["maximo"] = max(atual["maximo"], valor)
+            else:
+                lista.append({
+                    "periodo": chave,
+                    "data": ponto["data"],
+                    "valor": valor,
+                    "minimo": valor,
+                    "maximo": valor,
+                    "pontos": 1,
+                })
+
+
+def _anexar_linhas_serie(serie, bloco):
+    # Só linhas completas; uma linha ainda sendo escrita fica para a próxima leitura
+    fim = bloco.rfind(b"\n") + 1
+    if not fim:
+        return
+    completas = bloco[:fim]
+    serie["lido"] += fim
+    serie["ultima"] = completas[completas.rfind(b"\n", 0, fim - 1) + 1:]
+
+    indice_valor = serie["coluna_valor"]
+    if indice_valor is None:
+        return
+    indice_data = serie["coluna_data"]
+    linhas = [l for l in csv.reader(io.StringIO(completas.decode("utf-8", errors="replace"))) if l]
+    brutos = [(l[indice_valor] if indice_valor < len(l) else "") or None for l in linhas]
+    valores = _parse_decimal_serie(brutos).to_numpy()
+    validos = ~np.isnan(valores)
+    if not validos.any():
+        return
+
+    def coluna(indice):
+        if indice is None:
+            return None
+        return [l[indice].strip() if indice < len(l) else "" for l, ok in zip(linhas, validos) if ok]
+
+    datas = coluna(indice_data) or [""] * int(validos.sum())
+    pontos = [{"data": d, "valor": v} for d, v in zip(datas, valores[validos].tolist())]
+    chaves, dias = _chaves_periodo(datas, coluna(serie["coluna_mes"]), coluna(serie["coluna_ano"]))
+
+    inicio = serie["total"]
+    serie["valores"] = _crescer_array(serie["valores"], inicio, valores[validos])
+    serie["dias"] = _crescer_array(serie["dias"], inicio, dias)
+    serie["pontos"].extend(pontos)
+    _acumular_periodos(serie["periodos"], pontos, chaves)
+    serie["reducoes"] = {}
+    serie["total"] = inicio + len(pontos)
+
+
+def serie_evolucao():
+    """Série de evolução de relatorio.csv, atualizada só com as linhas acrescentadas.
+
+    Devolve o estado interno (pontos, valores em ndarray, total, geração); leia-o
+    sob _serie_lock e não o altere.
+    """
+    global _serie_evolucao
+    versao = _versao_arquivo(RELATORIO_CSV)
+    with _serie_lock:
+        serie = _serie_evolucao
+        if serie["versao"] == versao:
+            return serie
+        if versao is None:
+            serie = _serie_nova(serie["geracao"] + 1)
+        else:
+            try:
+                with open(RELATORIO_CSV, "rb") as f:
+                    bloco = _bloco_novo_relatorio(f, serie)
+                    if bloco is None:
+                        f.seek(0)
+                        bloco = f.read()
+                        serie = _serie_nova(serie["geracao"] + 1)
+                        serie["inode"] = os.fstat(f.fileno()).st_ino
+                        bloco = _ler_cabecalho_serie(serie, bloco)
+            except OSError:
+                return serie
+            _anexar_linhas_serie(serie, bloco)
+        serie["versao"] = versao
+        _serie_evolucao = serie
+        return serie
+
+
+def _evolucao_alternativa(limite):
+    # Sem relatorio.csv utilizável: tenta evolucao_caixinha.csv
     df = atualizar_evolucao_csv()
     if df is None or df.empty:
         if os.path.exists(EVOLUCAO_CSV):
@@ -811,13 +1813,816 @@ def buscar_evolucao_caixinha(limite=60):
 
     if isinstance(limite, int):
         df = df.tail(limite)
-    dados = []
-    for _, row in df.iterrows():
-        valor_num = _parse_decimal(row.get("valor"))
-        if valor_num is None:
-            continue
-        dados.append({
-            "data": str(row.get("data", "")).strip(),
-            "valor": float(valor_num)
-        })
-    return dados
+    return _pontos_evolucao(df, "data" if "data" in df.columns else None, "valor")
+
+
+def buscar_evolucao_caixinha(limite=60):
+    # Prioriza relatorio.csv (com cabeçalho)
+    serie = serie_evolucao()
+    with _serie_lock:
+        if serie["coluna_valor"] is not None and serie["total"]:
+            inicio = max(serie["total"] - limite, 0) if isinstance(limite, int) else 0
+            return serie["pontos"][inicio:serie["total"]]
+    return _evolucao_alternativa(limite)
+
+
+def buscar_evolucao_desde(desde=0, geracao=None, pontos=None):
+    """Pontos da evolução a partir do índice desde (o total que o cliente já tem).
+
+    Se a geração informada não for a atual, ou desde passar do total, devolve a
+    série inteira com reset=True (reduzida por LTTB a no máximo pontos, se informado).
+    """
+    serie = serie_evolucao()
+    with _serie_lock:
+        if serie["coluna_valor"] is not None and serie["total"]:
+            lista = serie["pontos"]
+            total = serie["total"]
+            atual = serie["geracao"]
+        else:
+            serie = None
+            lista = _evolucao_alternativa(None)
+            total = len(lista)
+            atual = None
+        reset = (geracao is not None and geracao != atual) or not 0 <= desde <= total
+        inicio = 0 if reset else desde
+        if reset and pontos:
+            lista = _reduzir_serie(serie, pontos, 0) if serie is not None else _reduzir_lista(lista, pontos)
+        else:
+            lista = lista[inicio:total]
+    return {
+        "pontos": lista,
+        "desde": inicio,
+        "total": total,
+        "geracao": atual,
+        "reset": reset,
+    }
+
+
+def _indices_lttb(x, y, n):
+    """Índices escolhidos pelo largest-triangle-three-buckets para n pontos.
+
+    Mantém o primeiro e o último ponto; em cada balde fica o ponto que forma o maior
+    triângulo com o escolhido no balde anterior e a média do balde seguinte.
+    """
+    total = len(y)
+    if n >= total:
+        return np.arange(total)
+    n = max(n, 3)
+    limites = np.linspace(1, total - 1, n - 1).astype(np.int64)
+    indices = np.empty(n, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = total - 1
+    anterior = 0
+    for i in range(n - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        prox_fim = limites[i + 2] if i + 2 < len(limites) else total
+        media_x = x[fim:prox_fim].mean()
+        media_y = y[fim:prox_fim].mean()
+        area = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(area.argmax())
+        indices[i + 1] = anterior
+    return indices
+
+
+def _reduzir_serie(serie, pontos, inicio):
+    # Chamada sob _serie_lock; os índices ficam guardados até a série mudar
+    total = serie["total"]
+    chave = (pontos, inicio)
+    indices = serie["reducoes"].get(chave)
+    if indices is None:
+        y = serie["valores"][inicio:total]
+        x = serie["dias"][inicio:total]
+        if np.isnan(x).any():
+            x = np.arange(len(y), dtype="float64")
+        indices = _indices_lttb(x, y, pontos) + inicio
+        serie["reducoes"][chave] = indices
+    lista = serie["pontos"]
+    return [lista[i] for i in indices.tolist()]
+
+
+def _reduzir_lista(lista, pontos):
+    y = np.array([p["valor"] for p in lista], dtype="float64")
+    return [lista[i] for i in _indices_lttb(np.arange(len(y), dtype="float64"), y, pontos).tolist()]
+
+
+def buscar_evolucao_reduzida(pontos, limite=None):
+    """Evolução reduzida a no máximo pontos (LTTB), preservando picos e vales.
+
+    O eixo x é a data (em dias) quando todas as datas são conhecidas; senão, a posição.
+    """
+    serie = serie_evolucao()
+    with _serie_lock:
+        if serie["coluna_valor"] is not None and serie["total"]:
+            inicio = max(serie["total"] - limite, 0) if isinstance(limite, int) else 0
+            return _reduzir_serie(serie, pontos, inicio)
+    return _reduzir_lista(_evolucao_alternativa(limite), pontos)
+
+
+def buscar_evolucao_agrupada(periodo, limite=None):
+    """Fechamento, mínimo e máximo da evolução por "semana" (ISO) ou "mes" (colunas Mês/Ano)."""
+    if periodo not in ("semana", "mes"):
+        return []
+    serie = serie_evolucao()
+    with _serie_lock:
+        if serie["coluna_valor"] is not None and serie["total"]:
+            lista = [dict(item) for item in serie["periodos"][periodo]]
+        else:
+            lista = None
+    if lista is None:
+        pontos = _evolucao_alternativa(None)
+        periodos = {"semana": [], "mes": []}
+        chaves, _ = _chaves_periodo([p["data"] for p in pontos])
+        _acumular_periodos(periodos, pontos, chaves)
+        lista = periodos[periodo]
+    inicio = max(len(lista) - limite, 0) if isinstance(limite, int) else 0
+    return lista[inicio:]
+
+
+# Acima disso o dashboard recebe a série reduzida por LTTB
+EVOLUCAO_PONTOS_DASHBOARD = 500
+
+_dashboard_lock = threading.Lock()
+_dashboard_global = {"versao": None, "dados": None}
+
+
+# Repositórios: as consultas por participante respondidas pelas planilhas (padrão) ou por
+# um banco SQL carregado com importar_planilhas(). DADOS_BACKEND=excel|sqlite|mysql;
+# as conexões SQL vêm de um conexao.Pool. Com banco SQL, o atualizador reimporta quando
+# as planilhas mudam (com DADOS_ATUALIZADOR_SEGUNDOS=0, rode "dados.py importar").
+DADOS_BACKEND = os.environ.get("DADOS_BACKEND", "excel").strip().lower()
+DADOS_SQLITE = os.environ.get("DADOS_SQLITE", os.path.join(CSV_DIR, "genio.sqlite3"))
+
+
+class RepositorioExcel:
+    """Planilhas + índices em memória deste módulo (reconstruídos a cada versão)."""
+
+    def participante_por_cpf(self, cpf):
+        cpf_normalizado = _normalizar_cpf(cpf)
+        if not cpf_normalizado:
+            return None
+        return indice_participantes()["por_cpf"].get(cpf_normalizado)
+
+    def emprestimos_ativos_por_cpf(self, cpf):
+        cpf_norm = _normalizar_cpf(cpf)
+        resumo = indice_emprestimos()["por_cpf"].get(cpf_norm) if cpf_norm else None
+        if resumo is None:
+            return {"saldo_devedor_centavos": 0, "saldo_devedor": "R$ 0,00", "emprestimos": []}
+        return resumo
+
+    def parcelas_abertas_por_cpf(self, cpf):
+        return [
+            {"id_emprestimo": item["id_emprestimo"], **detalhe}
+            for item in self.emprestimos_ativos_por_cpf(cpf)["emprestimos"]
+            for detalhe in item["parcelas_detalhes"]
+        ]
+
+    def extrato_por_cpf(self, cpf):
+        participante = self.participante_por_cpf(cpf)
+        id_participante = participante.get("id_norm") if participante else None
+        if not id_participante:
+            return
+        for item in extrato_por_participante().get(id_participante, []):
+            yield dict(item)
+
+    def extrato_paginado(self, cpf, cursor=None, limite=50):
+        vazio = {"transacoes": [], "proximo_cursor": None}
+        participante = self.participante_por_cpf(cpf)
+        id_participante = participante.get("id_norm") if participante else None
+        if not id_participante:
+            return vazio
+
+        indexado = _carregar_extrato_indexado()
+        transacoes = indexado["grupos"].get(id_participante, [])
+        chaves = indexado["chaves"].get(id_participante, [])
+
+        inicio = 0
+        if cursor:
+            chave_cursor = _decodificar_cursor_extrato(cursor)
+            if chave_cursor is None:
+                return vazio
+            inicio = bisect_right(chaves, chave_cursor)
+
+        fim = inicio + max(int(limite), 1)
+        pagina = [dict(item) for item in transacoes[inicio:fim]]
+        proximo = _codificar_cursor_extrato(chaves[fim - 1]) if fim < len(transacoes) else None
+        return {"transacoes": pagina, "proximo_cursor": proximo}
+
+    def relatorio(self, limite=60):
+        return buscar_evolucao_caixinha(limite)
+
+
+# Tabelas do banco: (colunas, índices). Os tipos servem ao SQLite e ao MySQL.
+# ESQUEMA_SQL sobe quando elas mudam; banco com esquema antigo é recriado na importação.
+ESQUEMA_SQL = 3
+_TABELAS_SQL = {
+    "participantes": (
+        [
+            "cpf VARCHAR(14) NOT NULL PRIMARY KEY",
+            "id VARCHAR(64) NOT NULL",
+            "id_norm VARCHAR(64)",
+            "nome VARCHAR(255)",
+            "aplicado_centavos BIGINT",
+            "atual_centavos BIGINT",
+        ],
+        [("participantes_id", "id_norm")],
+    ),
+    "emprestimos": (
+        [
+            "id_norm VARCHAR(64) NOT NULL PRIMARY KEY",
+            "id_emprestimo VARCHAR(64) NOT NULL",
+            "ordem VARCHAR(64) NOT NULL",
+            "id_participante VARCHAR(64)",
+            "cpf VARCHAR(14)",
+            "valor_total_centavos BIGINT",
+        ],
+        [("emprestimos_cpf", "cpf")],
+    ),
+    "parcelas": (
+        [
+            "linha INTEGER NOT NULL PRIMARY KEY",
+            "id_emprestimo VARCHAR(64) NOT NULL",
+            "parcela VARCHAR(64) NOT NULL",
+            "vencimento VARCHAR(64) NOT NULL",
+            "ordem_vencimento VARCHAR(19) NOT NULL",
+            "valor_centavos BIGINT NOT NULL",
+            "status VARCHAR(32) NOT NULL",
+        ],
+        [("parcelas_emprestimo_status", "id_emprestimo, status")],
+    ),
+    "transacoes": (
+        [
+            "id_participante VARCHAR(64) NOT NULL",
+            "posicao INTEGER NOT NULL",
+            "ordem_data BIGINT NOT NULL",
+            "transacao VARCHAR(64) NOT NULL",
+            "linha INTEGER NOT NULL",
+            "data VARCHAR(32) NOT NULL",
+            "categoria VARCHAR(255) NOT NULL",
+            "tipo VARCHAR(64) NOT NULL",
+            "valor VARCHAR(64) NOT NULL",
+            "valor_classe VARCHAR(32) NOT NULL",
+            "PRIMARY KEY (id_participante, posicao)",
+        ],
+        [("transacoes_cursor", "id_participante, ordem_data, transacao, linha")],
+    ),
+    "importacao": (
+        ["chave VARCHAR(64) NOT NULL PRIMARY KEY", "valor VARCHAR(255) NOT NULL"],
+        [],
+    ),
+}
+
+
+class RepositorioSQL:
+    """As mesmas consultas do RepositorioExcel, como SQL indexado sobre as tabelas importadas.
+
+    pool é um conexao.Pool (SQLite ou MySQL); o dialeto dele muda só a DDL.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.dialeto = pool.dialeto
+
+    def _consultar(self, sql, parametros=()):
+        return self.pool.consultar(sql, parametros)
+
+    def criar_tabelas(self):
+        comandos = []
+        if self.versao_importada() is not None and self._valor_importacao("esquema") != str(ESQUEMA_SQL):
+            # Banco importado com tabelas de outra versão: recria tudo (a importação repõe os dados)
+            comandos.extend((f"DROP TABLE IF EXISTS {tabela}", ()) for tabela in _TABELAS_SQL)
+            # A evolução (global) saiu do banco: é lida de relatorio.csv, como o resto do dashboard
+            comandos.append(("DROP TABLE IF EXISTS evolucao", ()))
+        for tabela, (colunas, indices) in _TABELAS_SQL.items():
+            if self.dialeto == "mysql":
+                definicoes = colunas + [f"KEY {nome} ({campos})" for nome, campos in indices]
+                # Comparação binária, como a do Python, para o cursor do extrato
+                comandos.append((
+                    f"CREATE TABLE IF NOT EXISTS {tabela} ({', '.join(definicoes)}) "
+                    "DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin",
+                    (),
+                ))
+            else:
+                comandos.append((f"CREATE TABLE IF NOT EXISTS {tabela} ({', '.join(colunas)})", ()))
+                comandos.extend(
+                    (f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({campos})", ()) for nome, campos in indices
+                )
+        self.pool.executar(comandos)
+
+    def _valor_importacao(self, chave):
+        try:
+            linhas = self._consultar("SELECT valor FROM importacao WHERE chave = ?", (chave,))
+        except Exception:
+            return None
+        return linhas[0]["valor"] if linhas else None
+
+    def versao_importada(self):
+        return self._valor_importacao("versao")
+
+    def substituir(self, linhas_por_tabela, versao):
+        """Troca o conteúdo das tabelas numa transação só (leitores veem o antes ou o depois)."""
+        comandos = []
+        for tabela, linhas in linhas_por_tabela.items():
+            comandos.append((f"DELETE FROM {tabela}", ()))
+            if linhas:
+                colunas = list(linhas[0])
+                comandos.append((
+                    f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)})",
+                    [tuple(linha[coluna] for coluna in colunas) for linha in linhas],
+                ))
+        comandos.append(("DELETE FROM importacao WHERE chave IN ('versao', 'esquema')", ()))
+        comandos.append((
+            "INSERT INTO importacao (chave, valor) VALUES ('versao', ?), ('esquema', ?)", (versao, str(ESQUEMA_SQL))
+        ))
+        self.pool.executar(comandos)
+
+    def participante_por_cpf(self, cpf):
+        cpf_normalizado = _normalizar_cpf(cpf)
+        if not cpf_normalizado:
+            return None
+        linhas = self._consultar(
+            "SELECT cpf, id, id_norm, nome, aplicado_centavos, atual_centavos FROM participantes WHERE cpf = ?",
+            (cpf_normalizado,),
+        )
+        return linhas[0] if linhas else None
+
+    def _parcelas_abertas(self, cpf_norm):
+        return self._consultar(
+            "SELECT e.id_norm, e.id_emprestimo, e.id_participante, e.valor_total_centavos, "
+            "p.parcela, p.vencimento, p.valor_centavos "
+            "FROM emprestimos e JOIN parcelas p ON p.id_emprestimo = e.id_norm "
+            "WHERE e.cpf = ? AND p.status = 'em aberto' "
+            "ORDER BY e.ordem, e.id_norm, p.ordem_vencimento, p.linha",
+            (cpf_norm,),
+        )
+
+    def emprestimos_ativos_por_cpf(self, cpf):
+        cpf_norm = _normalizar_cpf(cpf)
+        emprestimos = []
+        por_id = {}
+        for linha in self._parcelas_abertas(cpf_norm) if cpf_norm else []:
+            item = por_id.get(linha["id_norm"])
+            if item is None:
+                item = por_id[linha["id_norm"]] = {
+                    "cpf": cpf_norm,
+                    "id_participante": linha["id_participante"] or "",
+                    "id_emprestimo": linha["id_emprestimo"],
+                    "valor_total_centavos": linha["valor_total_centavos"],
+                    "saldo_devedor_centavos": 0,
+                    "parcelas_detalhes": [],
+                }
+                emprestimos.append(item)
+            item["saldo_devedor_centavos"] += int(linha["valor_centavos"])
+            item["parcelas_detalhes"].append({
+                "parcela": linha["parcela"],
+                "vencimento": linha["vencimento"],
+                "valor": _formatar_centavos(int(linha["valor_centavos"])),
+            })
+        for item in emprestimos:
+            if item["valor_total_centavos"] is None:
+                item["valor_total_centavos"] = item["saldo_devedor_centavos"]
+            item["valor_total_centavos"] = int(item["valor_total_centavos"])
+            item["valor_total"] = _formatar_centavos(item["valor_total_centavos"])
+            item["saldo_devedor"] = _formatar_centavos(item["saldo_devedor_centavos"])
+            item["parcelas_abertas"] = len(item["parcelas_detalhes"])
+        saldo_total = sum(item["saldo_devedor_centavos"] for item in emprestimos)
+        return {
+            "saldo_devedor_centavos": saldo_total,
+            "saldo_devedor": _formatar_centavos(saldo_total),
+            "emprestimos": emprestimos,
+        }
+
+    def parcelas_abertas_por_cpf(self, cpf):
+        cpf_norm = _normalizar_cpf(cpf)
+        return [
+            {
+                "id_emprestimo": linha["id_emprestimo"],
+                "parcela": linha["parcela"],
+                "vencimento": linha["vencimento"],
+                "valor": _formatar_centavos(int(linha["valor_centavos"])),
+            }
+            for linha in (self._parcelas_abertas(cpf_norm) if cpf_norm else [])
+        ]
+
+    def _id_participante(self, cpf):
+        participante = self.participante_por_cpf(cpf)
+        return participante.get("id_norm") if participante else None
+
+    def extrato_por_cpf(self, cpf):
+        id_participante = self._id_participante(cpf)
+        if not id_participante:
+            return
+        # Em lotes (fetchmany): o extrato inteiro não precisa caber na memória
+        yield from self.pool.iterar(
+            f"SELECT {', '.join(EXTRATO_COLUNAS)} FROM transacoes WHERE id_participante = ? ORDER BY posicao",
+            (id_participante,),
+        )
+
+    def extrato_paginado(self, cpf, cursor=None, limite=50):
+        vazio = {"transacoes": [], "proximo_cursor": None}
+        id_participante = self._id_participante(cpf)
+        if not id_participante:
+            return vazio
+
+        filtro = ""
+        parametros = [id_participante]
+        if cursor:
+            chave_cursor = _decodificar_cursor_extrato(cursor)
+            if chave_cursor is None:
+                return vazio
+            # Keyset: o primeiro depois do cursor, como o bisect_right na versão em memória
+            ordem_data, transacao, linha = chave_cursor
+            filtro = (
+                " AND (ordem_data > ? OR (ordem_data = ? AND (transacao > ? OR (transacao = ? AND linha > ?))))"
+            )
+            parametros += [ordem_data, ordem_data, transacao, transacao, linha]
+        limite = max(int(limite), 1)
+        linhas = self._consultar(
+            f"SELECT ordem_data, linha, {', '.join(EXTRATO_COLUNAS)} FROM transacoes "
+            f"WHERE id_participante = ?{filtro} ORDER BY ordem_data, transacao, linha LIMIT ?",
+            parametros + [limite + 1],
+        )
+        pagina = linhas[:limite]
+        proximo = None
+        if len(linhas) > limite:
+            ultima = pagina[-1]
+            proximo = _codificar_cursor_extrato((ultima["ordem_data"], ultima["transacao"], ultima["linha"]))
+        return {
+            "transacoes": [{coluna: linha[coluna] for coluna in EXTRATO_COLUNAS} for linha in pagina],
+            "proximo_cursor": proximo,
+        }
+
+    def relatorio(self, limite=60):
+        # O relatório é global (não é por participante) e é servido de relatorio.csv, com
+        # a leitura incremental, a redução por LTTB e a geração que o SSE usa. Uma cópia no
+        # banco seria uma segunda fonte a manter em dia, sem consulta indexada a ganhar.
+        return buscar_evolucao_caixinha(limite)
+
+
+def repositorio_sqlite(caminho=None):
+    return RepositorioSQL(conexao.pool_sqlite(caminho or DADOS_SQLITE))
+
+
+_repositorio_lock = threading.Lock()
+_repositorio = {"backend": None, "instancia": None}
+
+
+def repositorio():
+    """Repositório escolhido por DADOS_BACKEND (excel, sqlite ou mysql)."""
+    with _repositorio_lock:
+        if _repositorio["backend"] != DADOS_BACKEND:
+            if DADOS_BACKEND == "excel":
+                instancia = RepositorioExcel()
+            elif DADOS_BACKEND == "sqlite":
+                instancia = repositorio_sqlite()
+            elif DADOS_BACKEND == "mysql":
+                instancia = RepositorioSQL(conexao.pool_mysql())
+            else:
+                raise ValueError(f"DADOS_BACKEND inválido: {DADOS_BACKEND!r} (use excel, sqlite ou mysql)")
+            _repositorio.update(backend=DADOS_BACKEND, instancia=instancia)
+        return _repositorio["instancia"]
+
+
+def _linhas_importacao():
+    # Conteúdo das tabelas SQL montado com o mesmo código que responde pelas planilhas
+    por_id = indice_participantes()["por_id"]
+    participantes = [
+        {
+            "cpf": registro["cpf"],
+            "id": registro["id"],
+            "id_norm": registro["id_norm"],
+            "nome": registro["nome"],
+            "aplicado_centavos": registro["aplicado_centavos"],
+            "atual_centavos": registro["atual_centavos"],
+        }
+        for registro in indice_participantes()["por_cpf"].values()
+    ]
+
+    abas = carregar_abas(
+        XLSX_PATH,
+        {
+            "parcelas": ["parcelas", "parcela"],
+            "emprestimos": ["emprestimos", "emprestimo"],
+        },
+    )
+    emprestimos = []
+    tabela = _tabela_emprestimos(abas["emprestimos"]) if abas["emprestimos"] is not None else None
+    if tabela is not None:
+        ordem = _normalizar_id_serie(tabela["id_emprestimo"])
+        for id_norm, id_emprestimo, id_part, valor_total, chave in zip(
+            tabela["_id_emprest_norm"].tolist(),
+            tabela["id_emprestimo"].tolist(),
+            tabela["_id_part_norm"].tolist(),
+            tabela["_valor_total"].tolist(),
+            ordem.tolist(),
+        ):
+            participante = por_id.get(id_part)
+            emprestimos.append({
+                "id_norm": id_norm,
+                "id_emprestimo": id_emprestimo,
+                "ordem": chave or "",
+                "id_participante": id_part,
+                "cpf": (participante or {}).get("cpf") or None,
+                "valor_total_centavos": None if pd.isna(valor_total) else int(valor_total),
+            })
+
+    parcelas = []
+    detalhes = _tabela_parcelas(abas["parcelas"]) if abas["parcelas"] is not None else None
+    if detalhes is not None:
+        if tabela is not None:
+            detalhes = _ajustar_arredondamento(detalhes, tabela)
+        for linha, (id_emprest, parcela, vencimento, ordem_venc, centavos, status) in enumerate(zip(
+            detalhes["_id_emprest_norm"].tolist(),
+            detalhes["parcela"].tolist(),
+            detalhes["vencimento"].tolist(),
+            detalhes["_ordem"].dt.strftime("%Y-%m-%d %H:%M:%S").tolist(),
+            detalhes["_centavos"].tolist(),
+            detalhes["_status"].tolist(),
+        )):
+            parcelas.append({
+                "linha": linha,
+                "id_emprestimo": id_emprest,
+                "parcela": parcela,
+                "vencimento": vencimento,
+                "ordem_vencimento": ordem_venc,
+                "valor_centavos": int(centavos),
+                "status": status,
+            })
+
+    transacoes = []
+    indexado = _carregar_extrato_indexado()
+    for id_participante, grupo in indexado["grupos"].items():
+        for posicao, (item, (ordem_data, _, linha)) in enumerate(zip(grupo, indexado["chaves"][id_participante])):
+            transacoes.append({
+                "id_participante": id_participante,
+                "posicao": posicao,
+                "ordem_data": int(ordem_data),
+                "linha": int(linha),
+                **{coluna: item[coluna] for coluna in EXTRATO_COLUNAS},
+            })
+
+    return {
+        "participantes": participantes,
+        "emprestimos": emprestimos,
+        "parcelas": parcelas,
+        "transacoes": transacoes,
+    }
+
+
+def importar_planilhas(destino=None, forcar=False):
+    """Carrega as planilhas no banco de destino, substituindo o conteúdo.
+
+    Sem forcar, não faz nada se o banco já tem esta versão dos arquivos. Devolve
+    {tabela: nº de linhas} ou None quando não houve importação.
+    """
+    destino = destino or repositorio()
+    if not isinstance(destino, RepositorioSQL):
+        raise ValueError("importar_planilhas precisa de um RepositorioSQL")
+    _garantir_derivados()
+    versao = _chave_versao(XLSX_PATH, INFORMACOES_CSV)
+    destino.criar_tabelas()
+    if not forcar and destino.versao_importada() == versao:
+        return None
+    linhas = _linhas_importacao()
+    destino.substituir(linhas, versao)
+    return {tabela: len(registros) for tabela, registros in linhas.items()}
+
+
+def _desatualizado(origem, destino):
+    versao_origem = _versao_arquivo(origem)
+    if versao_origem is None:
+        return False
+    versao_destino = _versao_arquivo(destino)
+    return versao_destino is None or versao_destino[0] < versao_origem[0]
+
+
+def _regerar_se_desatualizado(origem, destino, gerar):
+    if not _desatualizado(origem, destino):
+        return
+    # Só um processo regera; os outros seguem com a versão anterior em vez de esperar
+    # (sem versão anterior, esperam a que está sendo gerada)
+    with _trava_derivado(destino, bloquear=not os.path.exists(destino)) as obtida:
+        if obtida and _desatualizado(origem, destino):
+            gerar()
+
+
+def _garantir_derivados():
+    # Regera os CSVs derivados só quando a planilha de origem é mais nova que eles
+    _regerar_se_desatualizado(XLSX_PATH, INFORMACOES_CSV, atualizar_informacoes_csv)
+    _regerar_se_desatualizado(RELATORIO_XLSX, RELATORIO_CSV, gerar_relatorio_csv)
+
+
+def versao_dados():
+    return tuple(_versao_arquivo(c) for c in (XLSX_PATH, RELATORIO_XLSX, INFORMACOES_CSV, RELATORIO_CSV))
+
+
+def etag_dados(*extras):
+    # ETag derivado da versão das planilhas/CSVs; extras distinguem representações
+    base = repr((versao_dados(),) + extras).encode("utf-8")
+    return hashlib.sha1(base).hexdigest()[:20]
+
+
+def dados_globais_dashboard():
+    """Partes do dashboard que não dependem do participante (totais e evolução).
+
+    Calculadas uma vez por versão das planilhas/CSVs derivados.
+    """
+    global _dashboard_global
+    _garantir_derivados()
+    versao = versao_dados()
+    with _dashboard_lock:
+        if _dashboard_global["versao"] == versao:
+            return _dashboard_global["dados"]
+        evolucao = buscar_evolucao_desde(0)
+        pontos = evolucao["pontos"]
+        if evolucao["total"] > EVOLUCAO_PONTOS_DASHBOARD:
+            pontos = buscar_evolucao_reduzida(EVOLUCAO_PONTOS_DASHBOARD)
+        globais = {
+            "saldos_totais": buscar_saldos_totais(),
+            "evolucao": pontos,
+            "evolucao_total": evolucao["total"],
+            "evolucao_geracao": evolucao["geracao"],
+        }
+        _dashboard_global = {"versao": versao, "dados": globais}
+        return globais
+
+
+def montar_dashboard(cpf):
+    globais = dados_globais_dashboard()
+    return {
+        "saldos": buscar_saldos_por_cpf(cpf),
+        "saldos_totais": globais["saldos_totais"],
+        "evolucao": globais["evolucao"],
+        "evolucao_total": globais["evolucao_total"],
+        "evolucao_geracao": globais["evolucao_geracao"],
+    }
+
+
+# Atualizador em segundo plano: observa as planilhas e regera os derivados só quando mudam
+ATUALIZADOR_INTERVALO = float(os.environ.get("DADOS_ATUALIZADOR_SEGUNDOS", "5"))
+
+_atualizador_lock = threading.Lock()
+_atualizador = {"thread": None, "parar": None, "versao": None, "verificado_em": None, "evolucao": None}
+
+# Eventos de mudança para o canal SSE: seq cresce a cada nova versão dos dados
+_eventos = threading.Condition()
+_evento_atual = {"seq": 0}
+
+
+def _partes_alteradas(anterior, atual):
+    # versao_dados(): (caixinha xlsx, relatorio xlsx, informacoes.csv, relatorio.csv)
+    partes = []
+    if anterior[0] != atual[0] or anterior[2] != atual[2]:
+        partes.append("informacoes")
+    if anterior[1] != atual[1] or anterior[3] != atual[3]:
+        partes.extend(["relatorio", "evolucao"])
+    return partes
+
+
+def _delta_evolucao(anterior):
+    # Só os pontos acrescentados desde a última rodada (ou a série inteira, se ela foi refeita)
+    geracao, total = anterior or (None, 0)
+    delta = buscar_evolucao_desde(total, geracao, pontos=EVOLUCAO_PONTOS_DASHBOARD)
+    return {"pontos": delta["pontos"], "reset": delta["reset"], "total": delta["total"], "geracao": delta["geracao"]}
+
+
+def _publicar_evento(partes, evolucao_delta):
+    global _evento_atual
+    with _eventos:
+        _evento_atual = {
+            "seq": _evento_atual["seq"] + 1,
+            "mudancas": partes,
+            "evolucao": evolucao_delta,
+        }
+        _eventos.notify_all()
+
+
+def sequencia_eventos():
+    return _evento_atual["seq"]
+
+
+def aguardar_evento(seq, timeout=None):
+    # Bloqueia até existir evento mais novo que seq; None se o tempo esgotar
+    with _eventos:
+        _eventos.wait_for(lambda: _evento_atual["seq"] > seq, timeout=timeout)
+        if _evento_atual["seq"] > seq:
+            return _evento_atual
+    return None
+
+
+def atualizar_derivados():
+    # Uma rodada do atualizador: regera CSVs desatualizados e, se algo mudou, aquece os
+    # caches e publica o evento para os dashboards conectados
+    _garantir_derivados()
+    versao = versao_dados()
+    anterior = _atualizador["versao"]
+    if versao != anterior:
+        indice_participantes()
+        extrato_por_participante()
+        # A exportação da carteira só acontece aqui, quando a planilha mudou
+        atualizar_emprestimos_ativos_csv()
+        if DADOS_BACKEND != "excel":
+            # Banco SQL em dia antes do evento: extrato e empréstimos batem com os totais.
+            # Outro worker pode já ter importado esta versão; aí não faz nada.
+            importar_planilhas()
+        globais = dados_globais_dashboard()
+        if anterior is not None:
+            partes = _partes_alteradas(anterior, versao)
+            delta = _delta_evolucao(_atualizador["evolucao"]) if "evolucao" in partes else None
+            _publicar_evento(partes, delta)
+        _atualizador["versao"] = versao
+        _atualizador["evolucao"] = (globais["evolucao_geracao"], globais["evolucao_total"])
+    _atualizador["verificado_em"] = time.time()
+    return versao
+
+
+def _loop_atualizador(intervalo, parar):
+    while True:
+        try:
+            atualizar_derivados()
+        except Exception:
+            pass
+        if parar.wait(intervalo):
+            return
+
+
+def iniciar_atualizador(intervalo=None):
+    intervalo = ATUALIZADOR_INTERVALO if intervalo is None else intervalo
+    if intervalo <= 0:
+        return None
+    with _atualizador_lock:
+        thread = _atualizador["thread"]
+        if thread is not None and thread.is_alive():
+            return thread
+        parar = threading.Event()
+        thread = threading.Thread(
+            target=_loop_atualizador, args=(intervalo, parar), name="dados-atualizador", daemon=True
+        )
+        _atualizador.update(thread=thread, parar=parar)
+        thread.start()
+        return thread
+
+
+def parar_atualizador():
+    with _atualizador_lock:
+        parar = _atualizador["parar"]
+        thread = _atualizador["thread"]
+        _atualizador.update(thread=None, parar=None)
+    if parar is not None:
+        parar.set()
+    if thread is not None:
+        thread.join(timeout=5)
+
+
+def estado_derivados():
+    # Leitura barata (só stat) do frescor de informacoes.csv e relatorio.csv
+    thread = _atualizador["thread"]
+    return {
+        "informacoes": os.path.exists(INFORMACOES_CSV) and not _desatualizado(XLSX_PATH, INFORMACOES_CSV),
+        "relatorio": os.path.exists(RELATORIO_CSV) and not _desatualizado(RELATORIO_XLSX, RELATORIO_CSV),
+        "verificado_em": _atualizador["verificado_em"],
+        "atualizador_ativo": bool(thread is not None and thread.is_alive()),
+    }
+
+
+def main():
+    # Uso em cron: python Apps/dados.py relatorio (ou emprestimos)
+    parser = argparse.ArgumentParser(description="Regera os CSVs derivados das planilhas")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_relatorio = sub.add_parser("relatorio", help="exporta a Base de Relatorio.xlsx para csv/relatorio.csv")
+    p_relatorio.add_argument("--completo", action="store_true", help="regera o arquivo inteiro em vez de só acrescentar")
+
+    sub.add_parser("emprestimos", help="exporta os empréstimos em aberto para csv/exportacoes")
+
+    p_importar = sub.add_parser("importar", help="carrega as planilhas no banco SQL (DADOS_BACKEND ou --sqlite)")
+    p_importar.add_argument("--sqlite", help="caminho do banco SQLite de destino")
+    p_importar.add_argument("--forcar", action="store_true", help="importa mesmo se o banco já tem esta versão")
+
+    args = parser.parse_args()
+    if args.comando == "importar":
+        destino = repositorio_sqlite(args.sqlite) if args.sqlite else repositorio()
+        if not isinstance(destino, RepositorioSQL):
+            print("DADOS_BACKEND=excel: informe --sqlite ou configure DADOS_BACKEND=sqlite/mysql", file=sys.stderr)
+            return 1
+        contagem = importar_planilhas(destino, forcar=args.forcar)
+        print("banco já está nesta versão" if contagem is None else contagem)
+    elif args.comando == "emprestimos":
+        caminho = atualizar_emprestimos_ativos_csv()
+        if caminho is None:
+            print("Não foi possível exportar os empréstimos ativos", file=sys.stderr)
+            return 1
+        print(caminho)
+    elif args.comando == "relatorio":
+        caminho = gerar_relatorio_csv(completo=args.completo)
+        if caminho is None:
+            print("Não foi possível gerar relatorio.csv", file=sys.stderr)
+            return 1
+        print(caminho)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+# Lido pelo gunicorn a partir da pasta Apps (o --chdir Apps do render.yaml vem antes da
+# busca pelo gunicorn.conf.py padrão).
+
+
+def post_fork(server, worker):
+    # As threads de segundo plano nascem em cada worker: criadas no mestre (--preload)
+    # não sobreviveriam ao fork
+    import app
+
+    app.iniciar_servicos()
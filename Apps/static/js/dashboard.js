@@ -26,6 +26,11 @@ if (profileButton && closeButton && overlay) {
 
 const dataScript = document.getElementById("evolucaoData");
 let evolucaoData = [];
+let evolucaoGeracao = null;
+// Total de pontos no servidor; o gráfico pode ter menos quando a série vem reduzida
+let evolucaoTotal = 0;
+// Limite de pontos do gráfico: quando a série é refeita (reset), ela já vem reduzida
+let evolucaoPontos = 0;
 let refreshEvolucaoChart = null;
 
 if (dataScript) {
@@ -34,6 +39,11 @@ if (dataScript) {
     } catch (err) {
         evolucaoData = [];
     }
+    if (dataScript.dataset.geracao) {
+        evolucaoGeracao = Number(dataScript.dataset.geracao);
+    }
+    evolucaoTotal = Number(dataScript.dataset.total) || (Array.isArray(evolucaoData) ? evolucaoData.length : 0);
+    evolucaoPontos = Number(dataScript.dataset.pontos) || 0;
 }
 
 const canvas = document.getElementById("evolucaoChart");
@@ -643,18 +653,37 @@ if (canvas) {
     };
 }
 
+const etags = {};
+
+// GET condicional: envia o último ETag e deixa o 304 passar sem usar o cache do navegador
+const fetchCondicional = async (url) => {
+    const headers = etags[url] ? { "If-None-Match": etags[url] } : {};
+    const response = await fetch(url, { method: "GET", cache: "no-store", headers });
+    const etag = response.headers.get("ETag");
+    if (etag && response.ok) {
+        etags[url] = etag;
+    }
+    return response;
+};
+
 const atualizarRelatorio = async () => {
     try {
-        await fetch("/relatorio/atualizar", { method: "GET" });
-        await fetch("/informacoes/atualizar", { method: "GET" });
-        const response = await fetch("/evolucao/dados");
+        await fetchCondicional("/relatorio/atualizar");
+        await fetchCondicional("/informacoes/atualizar");
+        // Pede só os pontos depois dos que já estão no gráfico
+        let url = `/evolucao/dados?since=${evolucaoTotal}`;
+        if (evolucaoGeracao !== null) {
+            url += `&geracao=${evolucaoGeracao}`;
+        }
+        if (evolucaoPontos) {
+            url += `&pontos=${evolucaoPontos}`;
+        }
+        const response = await fetchCondicional(url);
+        if (response.status === 304) {
+            return;
+        }
         if (response.ok) {
-            const data = await response.json();
-            if (refreshEvolucaoChart) {
-                refreshEvolucaoChart(data);
-            } else {
-                evolucaoData = data;
-            }
+            anexarEvolucao(await response.json());
         } else if (response.status === 401) {
             window.location.href = "/?msg=sessao_expirada";
         }
@@ -663,8 +692,60 @@ const atualizarRelatorio = async () => {
     }
 };
 
-atualizarRelatorio();
-setInterval(atualizarRelatorio, 40000);
+const anexarEvolucao = (delta) => {
+    if (!delta || !Array.isArray(delta.pontos)) return;
+    if (delta.geracao !== undefined) {
+        evolucaoGeracao = delta.geracao;
+    }
+    if (typeof delta.total === "number") {
+        evolucaoTotal = delta.total;
+    }
+    if (!delta.reset && delta.pontos.length === 0) return;
+    const base = delta.reset || !Array.isArray(evolucaoData) ? [] : evolucaoData;
+    const data = base.concat(delta.pontos);
+    if (refreshEvolucaoChart) {
+        refreshEvolucaoChart(data);
+    } else {
+        evolucaoData = data;
+    }
+};
+
+const aplicarEventoDados = (evento) => {
+    const delta = evento && evento.evolucao;
+    if (!delta || !Array.isArray(delta.pontos)) return;
+    if (!delta.reset && evolucaoTotal + delta.pontos.length !== delta.total) {
+        // Evento perdido (reconexão, aba suspensa): busca o que falta pelo since
+        atualizarRelatorio();
+        return;
+    }
+    anexarEvolucao(delta);
+};
+
+// Dashboards recebem as mudanças por SSE; sem EventSource, volta ao polling de 40s
+let pollingId = null;
+const iniciarPolling = () => {
+    if (pollingId !== null) return;
+    atualizarRelatorio();
+    pollingId = setInterval(atualizarRelatorio, 40000);
+};
+
+if (canvas && "EventSource" in window) {
+    const fonte = new EventSource("/eventos");
+    fonte.addEventListener("dados", (event) => {
+        try {
+            aplicarEventoDados(JSON.parse(event.data));
+        } catch (err) {
+            // silencioso
+        }
+    });
+    fonte.addEventListener("error", () => {
+        if (fonte.readyState === EventSource.CLOSED) {
+            iniciarPolling();
+        }
+    });
+} else if (canvas) {
+    iniciarPolling();
+}
 
 let lastActivityPing = 0;
 const pingSession = async () => {
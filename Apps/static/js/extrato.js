@@ -0,0 +1,64 @@
+const extratoBody = document.getElementById("extratoBody");
+const extratoMais = document.getElementById("extratoMais");
+let carregandoExtrato = false;
+
+const criarCelula = (texto, classe) => {
+    const td = document.createElement("td");
+    td.textContent = texto;
+    if (classe) td.className = classe;
+    return td;
+};
+
+const adicionarTransacoes = (transacoes) => {
+    transacoes.forEach(item => {
+        const tr = document.createElement("tr");
+        tr.appendChild(criarCelula(item.data || ""));
+        tr.appendChild(criarCelula(item.categoria || "Sem categoria"));
+        tr.appendChild(criarCelula(item.transacao || ""));
+        tr.appendChild(criarCelula(item.valor || "", item.valor_classe || "valor-neutro"));
+        extratoBody.appendChild(tr);
+    });
+};
+
+const carregarMaisExtrato = async () => {
+    const cursor = extratoMais?.dataset.cursor;
+    if (carregandoExtrato || !cursor) return;
+    carregandoExtrato = true;
+    try {
+        const response = await fetch(`/extrato/dados?cursor=${encodeURIComponent(cursor)}`);
+        if (response.status === 401) {
+            window.location.href = "/?msg=sessao_expirada";
+            return;
+        }
+        if (!response.ok) return;
+        const pagina = await response.json();
+        adicionarTransacoes(Array.isArray(pagina.transacoes) ? pagina.transacoes : []);
+        extratoMais.dataset.cursor = pagina.proximo_cursor || "";
+        if (!pagina.proximo_cursor) {
+            extratoMais.hidden = true;
+            observerExtrato?.disconnect();
+        }
+    } catch (err) {
+        // silencioso
+    } finally {
+        carregandoExtrato = false;
+    }
+};
+
+const observerExtrato = extratoBody && extratoMais && "IntersectionObserver" in window
+    ? new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            carregarMaisExtrato();
+        }
+    })
+    : null;
+
+if (observerExtrato && extratoMais.dataset.cursor) {
+    observerExtrato.observe(extratoMais);
+} else if (extratoMais && extratoMais.dataset.cursor) {
+    window.addEventListener("scroll", () => {
+        if (window.innerHeight + window.scrollY >= document.body.offsetHeight - 200) {
+            carregarMaisExtrato();
+        }
+    }, { passive: true });
+}
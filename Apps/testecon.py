@@ -1,33 +1,36 @@
-import mysql.connector
-from mysql.connector import Error
+import argparse
+import sys
 
-def conectar_e_consultar():
-    conn = None
+import conexao
 
+
+def conectar_e_consultar(pool, tabela="extrato"):
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            database="genio",
-            user="root",
-            password="root"
-        )
-        if conn.is_connected:
-            print("Conectado com sucesso!")
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM extrato")
-            registros = cursor.fetchall()
-            print("\n dados da tabela usuários")
-            for row in registros:
-                print(row)
-            
-            cursor.close()
-
-    except Error as e:
+        print(f"\n dados da tabela {tabela}")
+        # Em lotes com fetchmany: a tabela não precisa caber na memória
+        for row in pool.iterar(f"SELECT * FROM {tabela}"):
+            print(row)
+    except Exception as e:
         print(f"Erro de conexão {e}")
-
+        return 1
     finally:
-        if conn and conn.is_connected():
-            conn.close()
-            print("Conexão fechada")
+        pool.fechar()
+
+    metricas = pool.metricas()
+    for consulta in metricas["consultas"]:
+        print(f"{consulta['chamadas']}x {consulta['media_ms']:.1f} ms  {consulta['linhas']} linhas  {consulta['sql']}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Testa a conexão com o banco e lista uma tabela")
+    parser.add_argument("--sqlite", help="usa este arquivo SQLite em vez do MySQL (DADOS_MYSQL_*)")
+    parser.add_argument("--tabela", default="extrato")
+    args = parser.parse_args()
+
+    pool = conexao.pool_sqlite(args.sqlite, tamanho=1) if args.sqlite else conexao.pool_mysql(tamanho=1)
+    return conectar_e_consultar(pool, args.tabela)
+
 
-conectar_e_consultar()
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import argparse
+import base64
+import csv
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+import threading
+
+try:
+    from . import arquivos
+except ImportError:
+    import arquivos
+
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+USER_CSV = os.path.join(BASE_DIR, "csv", "usuarios.csv")
+
+# Custo do scrypt: n dobra o tempo e a memória (128 * r * n bytes) de cada login.
+# Escolha o valor com "python Apps/benchmark.py login": com 1 CPU e 8 logins simultâneos,
+# 2**12 deu p99 de ~320 ms (2**13: ~590 ms; 2**14: ~1,2 s) para a meta de 500 ms.
+SCRYPT_N = int(os.environ.get("USUARIOS_SCRYPT_N", str(2 ** 12)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERACOES = int(os.environ.get("USUARIOS_PBKDF2_ITERACOES", "600000"))
+
+
+def _b64(dados_binarios):
+    return base64.b64encode(dados_binarios).decode("ascii")
+
+
+def _scrypt(senha, sal, n, r, p):
+    # Limite de memória pelos parâmetros do próprio hash (o OpenSSL usa ~128 * r * (n + p)),
+    # com folga: um hash gravado com p ou r maiores também confere
+    return hashlib.scrypt(
+        senha.encode("utf-8"), salt=sal, n=n, r=r, p=p, maxmem=128 * r * n * (p + 1) + 2 ** 20, dklen=32
+    )
+
+
+def gerar_hash(senha, n=None):
+    """Hash no formato scrypt$n$r$p$sal$hash (sal e hash em base64)."""
+    n = SCRYPT_N if n is None else n
+    sal = secrets.token_bytes(16)
+    return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64(sal)}${_b64(_scrypt(senha, sal, n, SCRYPT_R, SCRYPT_P))}"
+
+
+def gerar_hash_pbkdf2(senha, iteracoes=None):
+    """Alternativa sem scrypt no OpenSSL: pbkdf2_sha256$iteracoes$sal$hash."""
+    iteracoes = PBKDF2_ITERACOES if iteracoes is None else iteracoes
+    sal = secrets.token_bytes(16)
+    chave = hashlib.pbkdf2_hmac("sha256", senha.encode("utf-8"), sal, iteracoes)
+    return f"pbkdf2_sha256${iteracoes}${_b64(sal)}${_b64(chave)}"
+
+
+def eh_hash(valor):
+    return str(valor or "").startswith(("scrypt$", "pbkdf2_sha256$"))
+
+
+def verificar_senha(senha, armazenado):
+    partes = str(armazenado or "").split("$")
+    try:
+        if partes[0] == "scrypt" and len(partes) == 6:
+            n, r, p = int(partes[1]), int(partes[2]), int(partes[3])
+            calculado = _scrypt(senha, base64.b64decode(partes[4]), n, r, p)
+            return hmac.compare_digest(calculado, base64.b64decode(partes[5]))
+        if partes[0] == "pbkdf2_sha256" and len(partes) == 4:
+            calculado = hashlib.pbkdf2_hmac(
+                "sha256", senha.encode("utf-8"), base64.b64decode(partes[2]), int(partes[1])
+            )
+            return hmac.compare_digest(calculado, base64.b64decode(partes[3]))
+    except (ValueError, TypeError, OverflowError, MemoryError):
+        # Hash malformado ou com parâmetros fora do alcance: login recusado, não erro 500
+        return False
+    # Linha ainda não migrada (senha em texto puro)
+    return not eh_hash(armazenado) and hmac.compare_digest(
+        str(senha).encode("utf-8"), str(armazenado or "").encode("utf-8")
+    )
+
+
+# Usado quando o usuário não existe, para a resposta levar o mesmo tempo
+_HASH_FICTICIO = None
+
+_credenciais_lock = threading.Lock()
+_credenciais = {"versao": None, "por_usuario": {}}
+
+
+def _ler_credenciais():
+    por_usuario = {}
+    if not os.path.exists(USER_CSV):
+        return por_usuario
+    with open(USER_CSV, newline="", encoding="utf-8") as file:
+        for linha in csv.DictReader(file):
+            usuario = (linha.get("usuario") or "").strip()
+            if usuario:
+                por_usuario.setdefault(usuario, linha.get("senha") or "")
+    return por_usuario
+
+
+def credenciais():
+    """usuario -> senha armazenada; relido só quando usuarios.csv muda."""
+    global _credenciais
+    versao = arquivos.versao_arquivo(USER_CSV)
+    with _credenciais_lock:
+        if _credenciais["versao"] != versao:
+            _credenciais = {"versao": versao, "por_usuario": _ler_credenciais()}
+        return _credenciais["por_usuario"]
+
+
+def validar_login(usuario, senha):
+    global _HASH_FICTICIO
+    armazenado = credenciais().get(usuario)
+    if armazenado is None:
+        if _HASH_FICTICIO is None:
+            _HASH_FICTICIO = gerar_hash(secrets.token_hex(8))
+        verificar_senha(senha, _HASH_FICTICIO)
+        return False
+    if not verificar_senha(senha, armazenado):
+        return False
+    if not eh_hash(armazenado):
+        # Linha ainda em texto puro: grava o hash agora que a senha foi conferida
+        try:
+            _reescrever_senhas(USER_CSV, lambda linha: (
+                gerar_hash(senha)
+                if (linha.get("usuario") or "").strip() == usuario and linha.get("senha") == armazenado
+                else None
+            ))
+        except OSError:
+            pass
+    return True
+
+
+def _reescrever_senhas(caminho, converter):
+    # converter(linha) devolve a nova senha armazenada, ou None para manter a linha
+    with arquivos.trava_derivado(caminho):
+        with open(caminho, newline="", encoding="utf-8") as file:
+            leitor = csv.DictReader(file)
+            campos = leitor.fieldnames or ["usuario", "senha"]
+            linhas = list(leitor)
+        convertidas = 0
+        for linha in linhas:
+            nova = converter(linha)
+            if nova is not None:
+                linha["senha"] = nova
+                convertidas += 1
+        if convertidas:
+            with arquivos.escrita_atomica(caminho, newline="", encoding="utf-8") as file:
+                escritor = csv.DictWriter(file, fieldnames=campos)
+                escritor.writeheader()
+                escritor.writerows(linhas)
+    return convertidas
+
+
+def migrar_senhas(caminho=None, n=None):
+    """Troca as senhas em texto puro por hashes; linhas já migradas ficam como estão.
+
+    Devolve quantas linhas foram convertidas.
+    """
+    return _reescrever_senhas(
+        caminho or USER_CSV,
+        lambda linha: None if eh_hash(linha.get("senha")) else gerar_hash(linha.get("senha") or "", n=n),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Credenciais de acesso (csv/usuarios.csv)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_migrar = sub.add_parser("migrar", help="converte as senhas em texto puro para hash scrypt")
+    p_migrar.add_argument("--arquivo", default=USER_CSV)
+    p_migrar.add_argument("--n", type=int, default=None, help=f"custo do scrypt (padrão {SCRYPT_N})")
+
+    p_hash = sub.add_parser("hash", help="imprime o hash de uma senha, para incluir um usuário à mão")
+    p_hash.add_argument("senha")
+
+    args = parser.parse_args()
+    if args.comando == "migrar":
+        print(f"{migrar_senhas(args.arquivo, n=args.n)} senha(s) convertida(s) em {args.arquivo}")
+    elif args.comando == "hash":
+        print(gerar_hash(args.senha))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos de Apps/ se importam pelo nome (python Apps/app.py, gunicorn --chdir Apps)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Apps"))
+
+
+@pytest.fixture
+def dados_isolado(tmp_path, monkeypatch):
+    """Aponta o módulo dados para uma pasta temporária, com o cache vazio."""
+    import dados
+
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    cache_dir = csv_dir / ".cache"
+    caminhos = {
+        "XLSX_PATH": tmp_path / "Caixinha 2026.xlsx",
+        "RELATORIO_XLSX": tmp_path / "Relatorio.xlsx",
+        "CSV_DIR": csv_dir,
+        "CACHE_DIR": cache_dir,
+        "INFORMACOES_CSV": csv_dir / "informacoes.csv",
+        "EVOLUCAO_CSV": csv_dir / "evolucao_caixinha.csv",
+        "RELATORIO_CSV": csv_dir / "relatorio.csv",
+        "EXPORTACOES_DIR": csv_dir / "exportacoes",
+        "RELATORIO_ESTADO": cache_dir / "relatorio.json",
+    }
+    for nome, caminho in caminhos.items():
+        monkeypatch.setattr(dados, nome, str(caminho))
+    dados.limpar_cache()
+    yield dados
+    dados.limpar_cache()
+
+
+@pytest.fixture
+def caixinha(dados_isolado):
+    """Planilha pequena com participantes, extrato, empréstimos e parcelas."""
+    import datetime
+
+    import openpyxl
+
+    wb = openpyxl.Workbook()
+    aba = wb.active
+    aba.title = "Participantes"
+    aba.append(["ID", "Nome", "CPF", "Endereço", "E-mail", "Telefone", "Vencimento", "Mensal", "Aplicado", "Projetado", "Atual"])
+    for i in range(1, 4):
+        aba.append([i, f"Participante {i}", f"{i:011d}", i, f"p{i}@exemplo.com", "", 6, 50, 100 + i, 1.5, 2.0])
+
+    # Várias linhas com a mesma data e o mesmo nº de transação
+    aba = wb.create_sheet("Extrato")
+    aba.append(["ID", "Categoria", "Tipo", "Data", "Valor", "Transação"])
+    for i in range(30):
+        data = datetime.datetime(2026, 3, 1 + i % 3, 10, 0) if i % 5 else "sem data"
+        aba.append([1 + i % 2, "Aplicação", "Entrada" if i % 3 else "Saída", data, f"{10 + i},50", "t1" if i % 4 else ""])
+
+    aba = wb.create_sheet("Empréstimos")
+    aba.append(["ID", "id_participante", "Data emprestimo", "Valor", "Juros", "Parcelas", "Valor final", "Saldo", "Status"])
+    aba.append([1, 1, datetime.datetime(2026, 1, 10), 260, 0.0408, 3, 270.608, None, "Em aberto"])
+    aba.append([2, 2, datetime.datetime(2026, 2, 5), 100, 0.0408, 2, 104.08, None, "Em aberto"])
+    aba = wb.create_sheet("Parcelas")
+    aba.append(["ID", "Id_Empréstimo", "Parcela", "Vencimento", "Valor", "Saldo", "Status"])
+    for parcela in range(1, 4):
+        aba.append([parcela, 1, parcela, datetime.datetime(2026, 1 + parcela, 10), 90.203, 90.203, "Em aberto"])
+    aba.append([4, 2, 1, "05/03/2026", 52.04, None, "Pago"])
+    aba.append([5, 2, 2, datetime.datetime(2026, 4, 5), 52.04, 52.04, "Em aberto"])
+    wb.save(dados_isolado.XLSX_PATH)
+    return dados_isolado
@@ -0,0 +1,63 @@
+import collections
+import socketserver
+import threading
+import time
+
+
+class _SessaoSMTPFalsa(socketserver.StreamRequestHandler):
+    # SMTP mínimo (sem TLS nem AUTH) no lugar do servidor real; atraso simula a rede
+    def handle(self):
+        servidor = self.server
+        with servidor.lock:
+            servidor.conexoes += 1
+        self.wfile.write(b"220 teste\r\n")
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            comando = linha[:4].upper()
+            if comando == b"QUIT":
+                self.wfile.write(b"221 tchau\r\n")
+                return
+            if comando == b"RCPT":
+                with servidor.lock:
+                    recusa = servidor.recusas.popleft() if servidor.recusas else None
+                if recusa is not None:
+                    codigo, texto = recusa
+                    self.wfile.write(f"{codigo} {texto}\r\n".encode())
+                    continue
+                self.wfile.write(b"250 ok\r\n")
+            elif comando == b"DATA":
+                self.wfile.write(b"354 fim com .\r\n")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                time.sleep(servidor.atraso)
+                with servidor.lock:
+                    servidor.mensagens += 1
+                    derrubar, servidor.derrubar = servidor.derrubar, False
+                self.wfile.write(b"250 ok\r\n")
+                if derrubar:
+                    # Fecha a sessão sem avisar, como um servidor que derruba conexões ociosas
+                    return
+            else:
+                if comando in (b"EHLO", b"HELO"):
+                    time.sleep(servidor.atraso)
+                self.wfile.write(b"250 ok\r\n")
+
+
+def servidor_smtp(atraso=0.0):
+    """Servidor SMTP local numa porta livre, rodando numa thread.
+
+    recusas: (código, texto) respondidos aos próximos RCPT, um por mensagem.
+    derrubar: fecha a sessão logo depois da próxima mensagem aceita.
+    """
+    servidor = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SessaoSMTPFalsa)
+    servidor.daemon_threads = True
+    servidor.atraso = atraso
+    servidor.lock = threading.Lock()
+    servidor.conexoes = 0
+    servidor.mensagens = 0
+    servidor.recusas = collections.deque()
+    servidor.derrubar = False
+    threading.Thread(target=servidor.serve_forever, args=(0.05,), daemon=True).start()
+    return servidor
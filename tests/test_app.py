@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+import app as aplicacao
+import dados
+
+
+@pytest.fixture
+def cliente(dados_isolado, monkeypatch):
+    # As rotas de atualização sobem o atualizador se ele não está rodando
+    monkeypatch.setattr(dados, "iniciar_atualizador", lambda intervalo=None: None)
+    aplicacao.app.config["TESTING"] = True
+    cliente = aplicacao.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao["usuario"] = "00000000001"
+        sessao["last_activity"] = int(time.time())
+    return cliente
+
+
+def test_evolucao_responde_304_para_o_mesmo_etag(cliente):
+    primeira = cliente.get("/evolucao/dados?since=0")
+    assert primeira.status_code == 200
+    etag = primeira.headers["ETag"]
+
+    repetida = cliente.get("/evolucao/dados?since=0", headers={"If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert repetida.data == b""
+
+
+def test_etag_muda_com_a_versao_dos_dados(cliente, dados_isolado):
+    etag = cliente.get("/informacoes/atualizar").headers["ETag"]
+    with open(dados_isolado.INFORMACOES_CSV, "w", encoding="utf-8") as f:
+        f.write("Nome,Aplicado,Atual\nA,10,11\n")
+
+    resposta = cliente.get("/informacoes/atualizar", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert resposta.headers["ETag"] != etag
+
+
+def test_eventos_entrega_o_evento_publicado(cliente):
+    livres = aplicacao._eventos_vagas._value
+    resposta = cliente.get("/eventos", buffered=False)
+    assert resposta.status_code == 200
+    assert aplicacao._eventos_vagas._value == livres - 1
+
+    partes = iter(resposta.response)
+    assert next(partes).startswith(b"retry:")
+    threading.Timer(0.1, dados._publicar_evento, (["informacoes"], None)).start()
+    evento = next(partes).decode("utf-8")
+    assert evento.startswith("event: dados\n")
+    assert f"id: {dados.sequencia_eventos()}\n" in evento
+    assert '"mudancas": ["informacoes"]' in evento
+
+    resposta.close()
+    assert aplicacao._eventos_vagas._value == livres
+
+
+def test_eventos_libera_a_vaga_ao_fechar(cliente, monkeypatch):
+    monkeypatch.setattr(aplicacao, "_eventos_vagas", threading.BoundedSemaphore(1))
+    aberta = cliente.get("/eventos", buffered=False)
+    assert aberta.status_code == 200
+    assert cliente.get("/eventos", buffered=False).status_code == 503
+
+    # Fechada antes de o gerador começar: a vaga volta do mesmo jeito
+    aberta.close()
+    outra = cliente.get("/eventos", buffered=False)
+    assert outra.status_code == 200
+    outra.close()
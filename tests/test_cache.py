@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+
+import openpyxl
+import pandas as pd
+
+import dados
+
+
+def _gravar_planilha(caminho, linhas):
+    wb = openpyxl.Workbook()
+    aba = wb.active
+    aba.title = "Participantes"
+    aba.append(["ID", "Nome"])
+    for linha in linhas:
+        aba.append(linha)
+    wb.save(caminho)
+
+
+def test_cache_descarta_versao_antiga(dados_isolado):
+    dados_isolado._cache_guardar("chave", (1, 10), "valor", 5)
+    assert dados_isolado._cache_obter("chave", (1, 10)) == "valor"
+    # mtime ou tamanho diferente invalida a entrada e libera os bytes
+    assert dados_isolado._cache_obter("chave", (2, 10)) is None
+    assert dados_isolado._cache_obter("chave", (1, 10)) is None
+    assert dados_isolado._cache_bytes == 0
+
+
+def test_carregar_abas_rele_planilha_alterada(dados_isolado):
+    caminho = dados_isolado.XLSX_PATH
+    _gravar_planilha(caminho, [[1, "Ana"]])
+    df = dados_isolado.carregar_abas(caminho, {"p": ["participantes"]})["p"]
+    assert list(df["Nome"]) == ["Ana"]
+
+    _gravar_planilha(caminho, [[1, "Ana"], [2, "Bruno"]])
+    versao = os.stat(caminho)
+    os.utime(caminho, ns=(versao.st_atime_ns, versao.st_mtime_ns + 10**9))
+    df = dados_isolado.carregar_abas(caminho, {"p": ["participantes"]})["p"]
+    assert list(df["Nome"]) == ["Ana", "Bruno"]
+
+
+def test_cache_lru_respeita_limite(dados_isolado, monkeypatch):
+    monkeypatch.setattr(dados_isolado, "CACHE_LIMITE_BYTES", 100)
+    dados_isolado._cache_guardar("a", 1, "A", 60)
+    dados_isolado._cache_guardar("b", 1, "B", 30)
+    assert dados_isolado._cache_obter("a", 1) == "A"
+
+    # "b" é a menos usada: sai para "c" caber
+    dados_isolado._cache_guardar("c", 1, "C", 30)
+    assert dados_isolado._cache_obter("b", 1) is None
+    assert dados_isolado._cache_obter("a", 1) == "A"
+    assert dados_isolado._cache_obter("c", 1) == "C"
+    assert dados_isolado._cache_bytes == 90
+
+    # Uma entrada maior que o limite sozinha continua guardada
+    dados_isolado._cache_guardar("d", 1, "D", 150)
+    assert list(dados_isolado._cache_abas) == ["d"]
+    assert dados_isolado._cache_bytes == 150
+
+
+def test_carga_unica_com_threads_concorrentes(dados_isolado, monkeypatch):
+    caminho = dados_isolado.XLSX_PATH
+    _gravar_planilha(caminho, [[i, f"Nome {i}"] for i in range(50)])
+
+    leituras = []
+    original = pd.read_excel
+
+    def read_excel_contado(*args, **kwargs):
+        leituras.append(1)
+        time.sleep(0.2)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(pd, "read_excel", read_excel_contado)
+
+    inicio = threading.Barrier(8)
+    resultados = []
+
+    def carregar():
+        inicio.wait()
+        resultados.append(dados_isolado.carregar_abas(caminho, {"p": ["participantes"]})["p"])
+
+    threads = [threading.Thread(target=carregar) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(leituras) == 1
+    assert len(resultados) == 8
+    for df in resultados:
+        pd.testing.assert_frame_equal(df, resultados[0])
@@ -0,0 +1,86 @@
+import csv
+import threading
+
+import pytest
+
+import cadastros
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    monkeypatch.setattr(cadastros, "CADASTRO_DB", str(tmp_path / "cadastro.sqlite3"))
+    monkeypatch.setattr(cadastros, "CADASTRO_CSV", str(tmp_path / "cadastro.csv"))
+    yield tmp_path
+    _fechar_conexoes()
+
+
+def _fechar_conexoes():
+    for conn in getattr(cadastros._local, "conexoes", {}).values():
+        conn.close()
+    cadastros._local.conexoes = {}
+
+
+def _em_paralelo(funcao, argumentos):
+    inicio = threading.Barrier(len(argumentos))
+    resultados = [None] * len(argumentos)
+
+    def rodar(i):
+        inicio.wait()
+        resultados[i] = funcao(*argumentos[i])
+        _fechar_conexoes()
+
+    threads = [threading.Thread(target=rodar, args=(i,)) for i in range(len(argumentos))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resultados
+
+
+def test_cpf_e_email_unicos_com_insercoes_simultaneas(banco):
+    cadastros.existe("", "")  # cria o banco antes das threads
+    mesmo_cpf = [({"nome": f"N{i}", "cpf": "123.456.789-01" if i % 2 else "12345678901", "email": f"p{i}@x.com"},)
+                 for i in range(8)]
+    assert sum(_em_paralelo(cadastros.inserir, mesmo_cpf)) == 1
+
+    mesmo_email = [({"nome": f"E{i}", "cpf": f"{i:011d}", "email": " Ana@X.com " if i % 2 else "ana@x.com"},)
+                   for i in range(8)]
+    assert sum(_em_paralelo(cadastros.inserir, mesmo_email)) == 1
+
+    # CPF e e-mail vazios não conflitam entre si
+    assert cadastros.inserir({"nome": "Sem CPF 1", "cpf": "", "email": ""})
+    assert cadastros.inserir({"nome": "Sem CPF 2", "cpf": "", "email": ""})
+    assert cadastros.existe("12345678901", "")
+    assert cadastros.existe("", "ANA@x.com")
+
+
+def test_primeiro_uso_importa_o_csv(banco):
+    with open(cadastros.CADASTRO_CSV, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["nome", "cpf", "email", "status"])
+        escritor.writerow(["Ana", "123.456.789-01", "ana@x.com", "ativo"])
+        escritor.writerow(["Ana repetida", "12345678901", "outra@x.com", "ativo"])
+        escritor.writerow(["Bruno", "98765432100", "Bruno@X.com", "pendente"])
+
+    assert cadastros.buscar("12345678901", "")["nome"] == "Ana"
+    assert cadastros.buscar("", "bruno@x.com")["status"] == "pendente"
+    assert cadastros.buscar_nome_por_cpf("987.654.321-00") == "Bruno"
+    assert not cadastros.existe("", "outra@x.com")
+
+
+def test_exportar_e_importar_de_volta(banco, monkeypatch):
+    assert cadastros.inserir({"nome": "Ana", "cpf": "12345678901", "email": "ana@x.com", "status": "ativo"})
+    assert cadastros.inserir({"nome": "Bruno", "cpf": "98765432100", "email": "bruno@x.com", "origem": "site"})
+    assert cadastros.atualizar("12345678901", "", {"email_verificado": "sim"})
+    exportado = str(banco / "exportado.csv")
+    cadastros.exportar_csv(exportado)
+
+    monkeypatch.setattr(cadastros, "CADASTRO_DB", str(banco / "outro.sqlite3"))
+    assert cadastros.importar_csv(exportado) == 2
+    assert cadastros.importar_csv(exportado) == 0
+    reexportado = str(banco / "reexportado.csv")
+    cadastros.exportar_csv(reexportado)
+    with open(exportado, encoding="utf-8") as a, open(reexportado, encoding="utf-8") as b:
+        assert a.read() == b.read()
+    assert cadastros.buscar("", "bruno@x.com")["origem"] == "site"
+    assert cadastros.buscar("12345678901", "")["email_verificado"] == "sim"
@@ -0,0 +1,144 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import conexao
+
+
+class _CursorContado(sqlite3.Cursor):
+    lotes = []
+
+    def fetchmany(self, size=None):
+        bloco = super().fetchmany(size)
+        _CursorContado.lotes.append((size, len(bloco)))
+        return bloco
+
+
+class _ConexaoContada(sqlite3.Connection):
+    def cursor(self, factory=_CursorContado):
+        return super().cursor(factory)
+
+
+def _pool_memoria(tamanho=1, espera=1, validar=None, linhas=7):
+    def criar():
+        conn = sqlite3.connect(":memory:", check_same_thread=False, factory=_ConexaoContada)
+        conn.execute("CREATE TABLE numeros (n INTEGER)")
+        conn.executemany("INSERT INTO numeros VALUES (?)", [(n,) for n in range(linhas)])
+        conn.commit()
+        return conn
+
+    return conexao.Pool(criar, tamanho=tamanho, espera=espera, validar=validar)
+
+
+def _aguardar(condicao, limite=5):
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, "tempo esgotado"
+        time.sleep(0.005)
+
+
+def test_pool_esgotado_depois_da_espera():
+    pool = _pool_memoria(tamanho=1, espera=0.05)
+    with pool.conexao():
+        inicio = time.perf_counter()
+        with pytest.raises(conexao.PoolEsgotado):
+            with pool.conexao():
+                pass
+        assert time.perf_counter() - inicio >= 0.05
+    metricas = pool.metricas()["pool"]
+    assert metricas["esgotado"] == 1
+    assert metricas["em_uso"] == 0 and metricas["aguardando"] == 0
+    with pool.conexao():
+        pass
+    assert pool.metricas()["pool"]["criadas"] == 1
+
+
+def test_pool_atende_por_ordem_de_chegada():
+    pool = _pool_memoria(tamanho=1, espera=5)
+    ordem = []
+
+    def usar(nome):
+        with pool.conexao():
+            ordem.append(nome)
+
+    threads = []
+    with pool.conexao():
+        for indice, nome in enumerate("abc"):
+            thread = threading.Thread(target=usar, args=(nome,))
+            thread.start()
+            threads.append(thread)
+            _aguardar(lambda: pool.metricas()["pool"]["aguardando"] == indice + 1)
+    # Quem acabou de devolver não passa à frente de quem já esperava
+    usar("dono")
+    for thread in threads:
+        thread.join(5)
+    assert ordem == ["a", "b", "c", "dono"]
+
+
+def test_conexao_quebrada_e_descartada():
+    pool = _pool_memoria(tamanho=1)
+    with pytest.raises(OSError):
+        with pool.conexao():
+            raise OSError("conexão caiu")
+    assert pool.metricas()["pool"]["descartadas"] == 1
+    assert pool.metricas()["pool"]["livres"] == 0
+
+    # Erro da aplicação não condena a conexão
+    with pytest.raises(ValueError):
+        with pool.conexao() as conn:
+            primeira = conn
+            raise ValueError("regra de negócio")
+    with pool.conexao() as conn:
+        assert conn is primeira
+    assert pool.metricas()["pool"]["criadas"] == 2
+
+
+def test_conexao_que_falha_na_validacao_e_trocada():
+    ruins = set()
+
+    def validar(conn):
+        if id(conn) in ruins:
+            raise OSError("ping falhou")
+
+    pool = _pool_memoria(tamanho=1, validar=validar)
+    with pool.conexao() as conn:
+        ruins.add(id(conn))
+    with pool.conexao() as conn:
+        assert id(conn) not in ruins
+    metricas = pool.metricas()["pool"]
+    assert metricas["criadas"] == 2 and metricas["descartadas"] == 1
+
+
+def test_iterar_busca_em_lotes_e_segura_a_conexao_ate_o_fim():
+    _CursorContado.lotes = []
+    pool = _pool_memoria(tamanho=1, linhas=7)
+    linhas = pool.iterar("SELECT n FROM numeros ORDER BY n", lote=3)
+    assert next(linhas) == {"n": 0}
+    assert _CursorContado.lotes == [(3, 3)]
+    assert pool.metricas()["pool"]["em_uso"] == 1
+    assert [linha["n"] for linha in linhas] == list(range(1, 7))
+    assert _CursorContado.lotes == [(3, 3), (3, 3), (3, 1), (3, 0)]
+    assert pool.metricas()["pool"]["em_uso"] == 0
+    consulta = pool.metricas()["consultas"][0]
+    assert consulta["sql"] == "SELECT n FROM numeros ORDER BY n"
+    assert consulta["chamadas"] == 1 and consulta["linhas"] == 7
+
+    # Gerador abandonado no meio devolve a conexão ao ser fechado
+    linhas = pool.iterar("SELECT n FROM numeros", lote=2)
+    next(linhas)
+    linhas.close()
+    assert pool.metricas()["pool"]["em_uso"] == 0
+    assert pool.consultar("SELECT COUNT(*) AS total FROM numeros") == [{"total": 7}]
+
+
+def test_marcadores_do_mysql_respeitam_literais():
+    pool = conexao.Pool(lambda: None, dialeto="mysql")
+    sql = "SELECT '?', `c?` FROM t WHERE a = ? AND b LIKE 'a%' AND c = 'it''s ?' AND d = ? -- e?"
+    assert pool.sql(sql) == (
+        "SELECT '?', `c?` FROM t WHERE a = %s AND b LIKE 'a%' AND c = 'it''s ?' AND d = %s -- e?"
+    )
+    with pytest.raises(ValueError):
+        pool.sql("SELECT 1 FROM t WHERE nome = '%s' AND id = ?")
+    assert conexao.Pool(lambda: None).sql(sql) == sql
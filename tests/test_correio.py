@@ -0,0 +1,215 @@
+import threading
+import time
+
+import pytest
+
+import conexao
+import correio
+import smtp_falso
+
+
+@pytest.fixture
+def fila(tmp_path, monkeypatch):
+    """Fila de e-mail num SQLite temporário, com um servidor SMTP local e o worker desligado."""
+    servidor = smtp_falso.servidor_smtp()
+    for nome, valor in {
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(servidor.server_address[1]),
+        "SMTP_USER": "teste@example.com",
+        "SMTP_PASS": "teste",
+        "SMTP_USE_SSL": "0",
+        "SMTP_STARTTLS": "0",
+    }.items():
+        monkeypatch.setenv(nome, valor)
+    monkeypatch.setattr(correio, "CORREIO_DB", str(tmp_path / "correio.sqlite3"))
+    monkeypatch.setattr(correio, "WORKER_INTERVALO", 0)
+    monkeypatch.setattr(correio, "ESPERA_BASE_SEGUNDOS", 10)
+    monkeypatch.setattr(correio, "TENTATIVAS_MAX", 3)
+    yield servidor
+    correio.parar_worker()
+    pool = correio._pools.pop(correio.CORREIO_DB, None)
+    if pool is not None:
+        pool.fechar()
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _mensagem(id_mensagem):
+    return correio._pool().consultar("SELECT * FROM mensagens WHERE id = ?", (id_mensagem,))[0]
+
+
+def _vencer(id_mensagem):
+    # Adianta o relógio da mensagem em vez de esperar o backoff
+    correio._pool().executar([("UPDATE mensagens SET proxima_tentativa = 0 WHERE id = ?", (id_mensagem,))])
+
+
+def _sessao():
+    return correio.SessaoSMTP(correio._config_smtp())
+
+
+def test_enfileirar_grava_pendente_sem_enviar(fila):
+    id_mensagem, destino = correio.enfileirar("", "Código", "123456", html="<b>123456</b>")
+    assert destino == "teste@example.com"
+    linha = _mensagem(id_mensagem)
+    assert linha["status"] == "pendente" and linha["tentativas"] == 0
+    assert linha["html"] == "<b>123456</b>"
+    assert correio._worker["thread"] is None
+    assert fila.conexoes == 0
+
+    sessao = _sessao()
+    assert correio.processar_fila(sessao) == (1, 0)
+    sessao.fechar()
+    linha = _mensagem(id_mensagem)
+    assert linha["status"] == "enviado" and linha["tentativas"] == 1 and linha["erro"] is None
+    assert fila.mensagens == 1
+
+
+def test_enfileirar_acorda_o_worker(fila, monkeypatch):
+    monkeypatch.setattr(correio, "WORKER_INTERVALO", 0.05)
+    id_mensagem, _ = correio.enfileirar("destino@example.com", "Assunto", "Corpo")
+    fim = time.monotonic() + 5
+    while _mensagem(id_mensagem)["status"] != "enviado":
+        assert time.monotonic() < fim, "worker não enviou"
+        time.sleep(0.02)
+    assert correio.estatisticas()["worker_ativo"]
+    correio.parar_worker()
+    assert not correio.estatisticas()["worker_ativo"]
+
+
+def test_falha_temporaria_espera_e_tenta_de_novo(fila, monkeypatch):
+    monkeypatch.setattr(correio.random, "uniform", lambda a, b: 1.0)
+    id_mensagem, _ = correio.enfileirar("destino@example.com", "Assunto", "Corpo")
+    fila.recusas.append((450, "caixa ocupada"))
+    sessao = _sessao()
+
+    antes = time.time()
+    assert correio.processar_fila(sessao) == (0, 1)
+    linha = _mensagem(id_mensagem)
+    assert linha["status"] == "pendente" and linha["tentativas"] == 1
+    assert "SMTPRecipientsRefused" in linha["erro"]
+    assert linha["proxima_tentativa"] >= antes + 10
+    # Ainda dentro da espera: nada sai
+    assert correio.processar_fila(sessao) == (0, 0)
+
+    _vencer(id_mensagem)
+    assert correio.processar_fila(sessao) == (1, 0)
+    sessao.fechar()
+    linha = _mensagem(id_mensagem)
+    assert linha["status"] == "enviado" and linha["tentativas"] == 2 and linha["erro"] is None
+    assert fila.mensagens == 1
+
+
+def test_espera_dobra_ate_o_teto(fila, monkeypatch):
+    monkeypatch.setattr(correio.random, "uniform", lambda a, b: 1.0)
+    monkeypatch.setattr(correio, "ESPERA_MAX_SEGUNDOS", 50)
+    assert [correio._espera(tentativas) for tentativas in range(1, 5)] == [10, 20, 40, 50]
+
+
+def test_desiste_depois_de_tentativas_max(fila):
+    id_mensagem, _ = correio.enfileirar("destino@example.com", "Assunto", "Corpo")
+    fila.recusas.extend([(451, "tente depois")] * 3)
+    sessao = _sessao()
+    for _ in range(3):
+        _vencer(id_mensagem)
+        assert correio.processar_fila(sessao) == (0, 1)
+    sessao.fechar()
+    linha = _mensagem(id_mensagem)
+    assert linha["status"] == "falhou" and linha["tentativas"] == 3
+    _vencer(id_mensagem)
+    assert correio.processar_fila() == (0, 0)
+
+
+def test_erro_5xx_e_definitivo(fila):
+    id_mensagem, _ = correio.enfileirar("ninguem@example.com", "Assunto", "Corpo")
+    fila.recusas.append((550, "usuário não existe"))
+    sessao = _sessao()
+    assert correio.processar_fila(sessao) == (0, 1)
+    sessao.fechar()
+    linha = _mensagem(id_mensagem)
+    assert linha["status"] == "falhou" and linha["tentativas"] == 1
+    assert "550" in linha["erro"]
+    _vencer(id_mensagem)
+    assert correio.processar_fila() == (0, 0)
+
+
+def test_reconecta_quando_o_servidor_derruba_a_sessao(fila):
+    primeira, _ = correio.enfileirar("destino@example.com", "Primeira", "Corpo")
+    fila.derrubar = True
+    sessao = _sessao()
+    assert correio.processar_fila(sessao) == (1, 0)
+    assert sessao.conexoes == 1
+
+    segunda, _ = correio.enfileirar("destino@example.com", "Segunda", "Corpo")
+    assert correio.processar_fila(sessao) == (1, 0)
+    sessao.fechar()
+    assert sessao.conexoes == 2 and fila.conexoes == 2
+    assert _mensagem(primeira)["status"] == _mensagem(segunda)["status"] == "enviado"
+    assert fila.mensagens == 2
+
+
+def test_sessao_reaproveitada_entre_mensagens(fila):
+    for indice in range(5):
+        correio.enfileirar("destino@example.com", f"Mensagem {indice}", "Corpo")
+    sessao = _sessao()
+    assert correio.processar_fila(sessao) == (5, 0)
+    sessao.fechar()
+    assert fila.conexoes == 1 and fila.mensagens == 5
+
+
+def test_reservar_nao_entrega_a_mesma_mensagem_a_dois_workers(fila):
+    ids = {correio.enfileirar("destino@example.com", f"Mensagem {indice}", "Corpo")[0] for indice in range(20)}
+    # Um pool por worker, como dois processos drenando o mesmo arquivo
+    pools = [conexao.pool_sqlite(correio.CORREIO_DB, tamanho=1) for _ in range(2)]
+    largada = threading.Barrier(2)
+    reservas = [[], []]
+
+    def drenar(indice):
+        largada.wait()
+        while True:
+            lote = correio._reservar(pools[indice], 3)
+            if not lote:
+                return
+            reservas[indice].extend(linha["id"] for linha in lote)
+
+    threads = [threading.Thread(target=drenar, args=(indice,)) for indice in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    for pool in pools:
+        pool.fechar()
+    primeiro, segundo = reservas
+    assert not set(primeiro) & set(segundo)
+    assert sorted(primeiro + segundo) == sorted(ids)
+    assert correio.estatisticas()["enviando"] == 20
+
+
+def test_reserva_vencida_volta_para_a_fila(fila, monkeypatch):
+    id_mensagem, _ = correio.enfileirar("destino@example.com", "Assunto", "Corpo")
+    assert [linha["id"] for linha in correio._reservar(correio._pool(), 10)] == [id_mensagem]
+    assert correio._reservar(correio._pool(), 10) == []
+    monkeypatch.setattr(correio, "RESERVA_SEGUNDOS", -1)
+    assert [linha["id"] for linha in correio._reservar(correio._pool(), 10)] == [id_mensagem]
+
+
+def test_estatisticas(fila):
+    vazia = correio.estatisticas()
+    assert vazia["pendentes"] == vazia["enviadas"] == vazia["falhas"] == 0
+    assert vazia["latencia_total"] is None and vazia["latencia_smtp"] is None
+    assert vazia["mais_antiga_s"] == 0 and not vazia["worker_ativo"]
+
+    for indice in range(3):
+        correio.enfileirar("destino@example.com", f"Mensagem {indice}", "Corpo")
+    fila.recusas.append((550, "recusada"))
+    sessao = _sessao()
+    assert correio.processar_fila(sessao) == (2, 1)
+    sessao.fechar()
+    correio.enfileirar("destino@example.com", "Depois", "Corpo")
+
+    estado = correio.estatisticas()
+    assert (estado["pendentes"], estado["enviando"], estado["enviadas"], estado["falhas"]) == (1, 0, 2, 1)
+    assert estado["mais_antiga_s"] >= 0
+    for chave in ("latencia_total", "latencia_smtp"):
+        latencia = estado[chave]
+        assert 0 <= latencia["p50_ms"] <= latencia["p95_ms"] <= latencia["max_ms"]
+    assert estado["latencia_total"]["max_ms"] >= estado["latencia_smtp"]["max_ms"]
@@ -0,0 +1,159 @@
+import math
+import random
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+import dados
+
+
+# As versões vetorizadas (_*_serie) têm de dar exatamente o resultado das escalares
+# célula a célula, inclusive nos casos estranhos das planilhas.
+CASOS_FIXOS = [
+    None, float("nan"), "", "   ", "R$", "abc", "NaN", "nan", "inf", "-Infinity",
+    "1.234", "1,5", "1.234,56", "1,234.56", "R$ 1.234,56", " R$-10,00 ", "+3", "-0,005",
+    ".5", "5.", ",5", "5,", "1.2.3", "1,2,3", "1.234.567,89", "1,234,567.89", "--1", "1e3",
+    "1.5E-2", "-2,5e2", "0,005", "0,015", "-0,015", "9" * 18 + ",995", "12 345", 0, 7, -3,
+    0.1, 2.675, -1.005, 1e20, Decimal("1.005"), Decimal("-0.125"),
+]
+
+
+def _texto_aleatorio(rnd):
+    sinal = rnd.choice(["", "", "-", "+"])
+    inteiro = str(rnd.randint(0, 10 ** rnd.randint(0, 16)))
+    decimais = "".join(rnd.choice("0123456789") for _ in range(rnd.randint(0, 4)))
+    estilo = rnd.choice(["br", "en", "simples", "virgula", "cientifico"])
+    if estilo in ("br", "en"):
+        milhar, decimal = (".", ",") if estilo == "br" else (",", ".")
+        grupos = f"{int(inteiro):,}".replace(",", milhar)
+        texto = grupos + (decimal + decimais if decimais else "")
+    elif estilo == "simples":
+        texto = inteiro + ("." + decimais if decimais else "")
+    elif estilo == "virgula":
+        texto = inteiro + ("," + decimais if decimais else "")
+    else:
+        texto = f"{inteiro}{'.' + decimais if decimais else ''}e{rnd.randint(-5, 5)}"
+    prefixo = rnd.choice(["", "", "R$ ", "R$", " "])
+    return prefixo + sinal + texto + rnd.choice(["", "", " "])
+
+
+def _valor_aleatorio(rnd):
+    tipo = rnd.random()
+    if tipo < 0.7:
+        return _texto_aleatorio(rnd)
+    if tipo < 0.8:
+        return rnd.randint(-10 ** 9, 10 ** 9)
+    if tipo < 0.9:
+        return round(rnd.uniform(-1e6, 1e6), rnd.randint(0, 4))
+    if tipo < 0.95:
+        return Decimal(rnd.randint(-10 ** 8, 10 ** 8)).scaleb(-rnd.randint(0, 4))
+    return rnd.choice(CASOS_FIXOS)
+
+
+def _amostra(semente, tamanho=2000):
+    rnd = random.Random(semente)
+    return CASOS_FIXOS + [_valor_aleatorio(rnd) for _ in range(tamanho)]
+
+
+def _centavos_cabem(valores):
+    # Centavos acima do int64 (mais de R$ 92 quatrilhões) não cabem na Series Int64
+    limite = 2 ** 63 - 1
+    return [valor for valor in valores if abs(dados._para_centavos(valor) or 0) <= limite]
+
+
+def _mesmo_decimal(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    if a.is_nan() or b.is_nan():
+        return a.is_nan() and b.is_nan()
+    return a == b
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_decimais_serie_igual_parse_decimal(semente):
+    valores = _amostra(semente)
+    vetorizado = dados._decimais_serie(valores).tolist()
+    for valor, obtido in zip(valores, vetorizado):
+        assert _mesmo_decimal(obtido, dados._parse_decimal(valor)), valor
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_parse_decimal_serie_igual_float_do_escalar(semente):
+    valores = _amostra(semente)
+    vetorizado = dados._parse_decimal_serie(valores).tolist()
+    for valor, obtido in zip(valores, vetorizado):
+        esperado = dados._parse_decimal(valor)
+        esperado = math.nan if esperado is None else float(esperado)
+        assert obtido == esperado or (math.isnan(obtido) and math.isnan(esperado)), valor
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_centavos_serie_igual_para_centavos(semente):
+    valores = _centavos_cabem(_amostra(semente))
+    vetorizado = dados._centavos_serie(valores).tolist()
+    for valor, obtido in zip(valores, vetorizado):
+        esperado = dados._para_centavos(valor)
+        assert (None if obtido is pd.NA else obtido) == esperado, valor
+
+
+def test_centavos_serie_acima_do_int64_levanta_erro():
+    with pytest.raises(OverflowError):
+        dados._centavos_serie(["1,00", "1e20"])
+
+
+def test_saldos_totais_ignora_valor_acima_do_int64(dados_isolado):
+    with open(dados_isolado.INFORMACOES_CSV, "w", encoding="utf-8") as f:
+        f.write('Nome,Aplicado,Atual\nA,"1.000,00","1.100,50"\nB,1e20,"200,00"\nC,abc,\n')
+    totais = dados_isolado.buscar_saldos_totais()
+    assert totais["aplicado"] == "R$ 1.000,00"
+    assert totais["atual"] == "R$ 1.300,50"
+    assert totais["variacao"] == "R$ 300,50"
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_formatar_real_serie_igual_formatar_real(semente):
+    numeros = [numero for numero in dados._decimais_serie(_amostra(semente)).tolist() if numero is not None] + [None]
+    vetorizado = dados._formatar_real_serie(numeros).tolist()
+    for numero, obtido in zip(numeros, vetorizado):
+        assert obtido == dados._formatar_real(numero), numero
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_formatar_centavos_serie_igual_formatar_centavos(semente):
+    amostra = _centavos_cabem(_amostra(semente))
+    centavos = [c for c in dados._centavos_serie(amostra).tolist() if c is not pd.NA] + [None]
+    vetorizado = dados._formatar_centavos_serie(centavos).tolist()
+    for valor, obtido in zip(centavos, vetorizado):
+        assert obtido == dados._formatar_centavos(valor), valor
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("270,605", 27061), ("-0,005", -1), ("0,004", 0), ("1.234,56", 123456), ("R$ 10", 1000),
+    (2.675, 268), (Decimal("1.005"), 101), ("abc", None), (None, None), ("NaN", None), ("inf", None),
+])
+def test_para_centavos_arredonda_como_a_planilha(valor, esperado):
+    assert dados._para_centavos(valor) == esperado
+
+
+@pytest.mark.parametrize("centavos, fator, esperado", [
+    (10000, Decimal("1.0408"), 10408), (12345, Decimal("1.2"), 14814), (333, Decimal("0.5"), 167),
+    (-333, Decimal("0.5"), -167), (1, "0.5", 1), (0, Decimal("3"), 0), (10 ** 17, Decimal("1.5"), 15 * 10 ** 16),
+])
+def test_multiplicar_centavos(centavos, fator, esperado):
+    assert dados._multiplicar_centavos(centavos, fator) == esperado
+
+
+def test_saldo_devedor_e_total_menos_pago(caixinha, tmp_path):
+    sql = dados.repositorio_sqlite(str(tmp_path / "genio.sqlite3"))
+    dados.importar_planilhas(sql)
+    for repo in (dados.RepositorioExcel(), sql):
+        resumo = repo.emprestimos_ativos_por_cpf("00000000001")
+        sem_pagamento = resumo["emprestimos"][0]
+        # 3 x 90,203 arredondadas dão 270,60; o resíduo vai para a última parcela
+        assert sem_pagamento["valor_total"] == sem_pagamento["saldo_devedor"] == "R$ 270,61"
+        assert [p["valor"] for p in sem_pagamento["parcelas_detalhes"]] == ["R$ 90,20", "R$ 90,20", "R$ 90,21"]
+
+        parcial = repo.emprestimos_ativos_por_cpf("00000000002")["emprestimos"][0]
+        assert parcial["valor_total_centavos"] == 10408
+        assert parcial["saldo_devedor_centavos"] == 10408 - 5204
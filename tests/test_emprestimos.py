@@ -0,0 +1,44 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmark
+import dados
+
+
+DATAS = [
+    "2026-02-01 00:00:00", "2026-02-01", "2026-02-13", "2026-13-02", "2026-2-1 00:00:00", " 2026-02-01 ",
+    "2026-02-30 00:00:00", "2026-02-01T05:00:00", "9999-12-31 00:00:00", "05/03/2026", "13/03/2026",
+    "05/13/2026", "5/3/2026", "31/02/2026", "01/02/2026 10:30", "2026/03/05", "abc", "", None,
+    float("nan"), 45000, datetime.datetime(2026, 1, 2), pd.Timestamp("2026-01-03 10:00"),
+]
+
+
+@pytest.mark.filterwarnings("ignore::UserWarning")
+@pytest.mark.parametrize("opcoes", [{}, {"dayfirst": True}])
+def test_datas_serie_por_valor_igual_ao_escalar(opcoes):
+    obtidas = dados._datas_serie_por_valor(DATAS * 2, **opcoes)
+    for valor, obtida in zip(DATAS * 2, obtidas):
+        if isinstance(valor, (pd.Timestamp, np.datetime64)) or hasattr(valor, "toordinal"):
+            esperada = pd.Timestamp(valor)
+        else:
+            esperada = pd.to_datetime(valor, errors="coerce", **opcoes)
+        assert (pd.isna(esperada) and pd.isna(obtida)) or esperada == obtida, valor
+
+
+@pytest.mark.filterwarnings("ignore::UserWarning")
+def test_agregacao_colunar_igual_a_por_linha(dados_isolado):
+    benchmark._gerar_emprestimos(dados_isolado.XLSX_PATH, 300, 6, participantes=120)
+    abas = dados_isolado.carregar_abas(
+        dados_isolado.XLSX_PATH,
+        {"parcelas": ["parcelas", "parcela"], "emprestimos": ["emprestimos", "emprestimo"]},
+    )
+    por_id = dados_isolado.indice_participantes()["por_id"]
+    participantes = pd.DataFrame({"id_norm": list(por_id), "cpf": [p["cpf"] for p in por_id.values()]})
+
+    colunar = dados_isolado.agregar_emprestimos_ativos(abas["parcelas"], abas["emprestimos"], participantes)
+    por_linha = benchmark._agregar_emprestimos_por_linha(abas["parcelas"].copy(), abas["emprestimos"].copy(), por_id)
+    assert len(colunar) > 200
+    assert colunar == por_linha
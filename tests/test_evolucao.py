@@ -0,0 +1,71 @@
+import os
+
+import dados
+
+
+CABECALHO = "Data,Caixinha 2026\n"
+
+
+def _linhas(inicio, fim):
+    return "".join(f"2026-01-{dia:02d} 00:00:00,{100 + dia}.5\n" for dia in range(inicio, fim))
+
+
+def _substituir(caminho, conteudo):
+    # Como a exportação completa: arquivo novo trocado por os.replace
+    tmp = caminho + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+    os.replace(tmp, caminho)
+
+
+def _tocar(caminho):
+    info = os.stat(caminho)
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+
+
+def test_serie_acrescenta_linhas_sem_trocar_geracao(dados_isolado):
+    caminho = dados_isolado.RELATORIO_CSV
+    _substituir(caminho, CABECALHO + _linhas(1, 6))
+    serie = dados_isolado.serie_evolucao()
+    geracao = serie["geracao"]
+    assert serie["total"] == 5
+
+    with open(caminho, "a", encoding="utf-8") as f:
+        f.write(_linhas(6, 9))
+    _tocar(caminho)
+    serie = dados_isolado.serie_evolucao()
+    assert serie["geracao"] == geracao
+    assert [p["valor"] for p in serie["pontos"]] == [100 + dia + 0.5 for dia in range(1, 9)]
+
+
+def test_serie_refeita_quando_arquivo_e_trocado(dados_isolado):
+    caminho = dados_isolado.RELATORIO_CSV
+    _substituir(caminho, CABECALHO + _linhas(1, 6))
+    geracao = dados_isolado.serie_evolucao()["geracao"]
+
+    # Mesmo cabeçalho e mesma última linha lida, mas uma linha antiga corrigida
+    corrigido = CABECALHO + _linhas(1, 6).replace("101.5", "999.5") + _linhas(6, 8)
+    _substituir(caminho, corrigido)
+    _tocar(caminho)
+    serie = dados_isolado.serie_evolucao()
+    assert serie["geracao"] == geracao + 1
+    assert serie["total"] == 7
+    assert serie["pontos"][0]["valor"] == 999.5
+
+    resposta = dados_isolado.buscar_evolucao_desde(5, geracao)
+    assert resposta["reset"] and resposta["desde"] == 0
+
+
+def test_reset_com_pontos_vem_reduzido(dados_isolado):
+    caminho = dados_isolado.RELATORIO_CSV
+    _substituir(caminho, CABECALHO + "".join(f"2026-01-01 00:00:00,{i % 7}\n" for i in range(40)))
+    geracao = dados_isolado.serie_evolucao()["geracao"]
+
+    resposta = dados_isolado.buscar_evolucao_desde(10, geracao + 1, pontos=8)
+    assert resposta["reset"] and resposta["total"] == 40
+    assert resposta["pontos"] == dados_isolado.buscar_evolucao_reduzida(8)
+    assert len(resposta["pontos"]) == 8
+
+    # Sem reset, o delta continua com todos os pontos novos
+    resposta = dados_isolado.buscar_evolucao_desde(10, geracao, pontos=8)
+    assert not resposta["reset"] and len(resposta["pontos"]) == 30
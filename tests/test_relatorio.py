@@ -0,0 +1,56 @@
+import os
+
+import openpyxl
+
+import dados
+
+
+def _gravar_base(caminho, valores):
+    wb = openpyxl.Workbook()
+    aba = wb.active
+    aba.title = "Base"
+    for _ in range(3):
+        aba.append(["Relatório"])
+    aba.append(["Data", "Caixinha 2026", "Investido Mês"])
+    for dia, valor in enumerate(valores, start=1):
+        aba.append([f"2026-01-{dia:02d}", valor, 50])
+    wb.save(caminho)
+
+
+def _exportar(dados_isolado, completo=False):
+    assert dados_isolado.gerar_relatorio_csv(completo=completo) == dados_isolado.RELATORIO_CSV
+    with open(dados_isolado.RELATORIO_CSV, "rb") as f:
+        return f.read(), os.stat(dados_isolado.RELATORIO_CSV).st_ino
+
+
+def test_continua_com_linhas_acrescentadas(dados_isolado):
+    _gravar_base(dados_isolado.RELATORIO_XLSX, [100.5, 101.5, 102.5])
+    _, inode = _exportar(dados_isolado)
+
+    _gravar_base(dados_isolado.RELATORIO_XLSX, [100.5, 101.5, 102.5, 103.5, 104.5])
+    conteudo, inode_continuado = _exportar(dados_isolado)
+    # Acrescentado no mesmo arquivo, igual a uma exportação completa
+    assert inode_continuado == inode
+    assert conteudo == _exportar(dados_isolado, completo=True)[0]
+    assert conteudo.count(b"\n") == 6
+
+
+def test_linha_antiga_editada_refaz_a_exportacao(dados_isolado):
+    _gravar_base(dados_isolado.RELATORIO_XLSX, [100.5, 101.5, 102.5])
+    _exportar(dados_isolado)
+
+    # A última linha exportada é a mesma; só uma anterior mudou
+    _gravar_base(dados_isolado.RELATORIO_XLSX, [100.5, 999.5, 102.5, 103.5])
+    conteudo, _ = _exportar(dados_isolado)
+    assert b"999.5" in conteudo
+    assert b"101.5" not in conteudo
+    assert conteudo == _exportar(dados_isolado, completo=True)[0]
+
+
+def test_linhas_removidas_refazem_a_exportacao(dados_isolado):
+    _gravar_base(dados_isolado.RELATORIO_XLSX, [100.5, 101.5, 102.5])
+    _exportar(dados_isolado)
+
+    _gravar_base(dados_isolado.RELATORIO_XLSX, [100.5])
+    conteudo, _ = _exportar(dados_isolado)
+    assert conteudo.count(b"\n") == 2
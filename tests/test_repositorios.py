@@ -0,0 +1,43 @@
+import pytest
+
+import dados
+
+
+def _repositorios(caixinha, tmp_path):
+    sql = dados.repositorio_sqlite(str(tmp_path / "genio.sqlite3"))
+    assert dados.importar_planilhas(sql)
+    return [dados.RepositorioExcel(), sql]
+
+
+@pytest.mark.parametrize("limite", [1, 2, 3, 7, 50])
+def test_paginas_do_extrato_cobrem_cada_linha_uma_vez(caixinha, tmp_path, limite):
+    for repo in _repositorios(caixinha, tmp_path):
+        for cpf in ("00000000001", "00000000002"):
+            completo = list(repo.extrato_por_cpf(cpf))
+            assert len(completo) == 15
+            cursor, paginas = None, []
+            while True:
+                pagina = repo.extrato_paginado(cpf, cursor, limite)
+                assert len(pagina["transacoes"]) <= limite
+                paginas += pagina["transacoes"]
+                cursor = pagina["proximo_cursor"]
+                if not cursor:
+                    break
+            assert paginas == completo, type(repo).__name__
+
+
+def test_excel_e_sql_respondem_igual_depois_da_importacao(caixinha, tmp_path):
+    excel, sql = _repositorios(caixinha, tmp_path)
+    for cpf in ("00000000001", "00000000002", "00000000003", "00000000009", "abc"):
+        assert excel.participante_por_cpf(cpf) == sql.participante_por_cpf(cpf)
+        assert excel.emprestimos_ativos_por_cpf(cpf) == sql.emprestimos_ativos_por_cpf(cpf)
+        assert excel.parcelas_abertas_por_cpf(cpf) == sql.parcelas_abertas_por_cpf(cpf)
+        assert list(excel.extrato_por_cpf(cpf)) == list(sql.extrato_por_cpf(cpf))
+        cursores = [None]
+        while True:
+            pagina = excel.extrato_paginado(cpf, cursores[-1], 4)
+            assert pagina == sql.extrato_paginado(cpf, cursores[-1], 4)
+            if not pagina["proximo_cursor"]:
+                break
+            cursores.append(pagina["proximo_cursor"])
+    assert excel.relatorio(None) == sql.relatorio(None)
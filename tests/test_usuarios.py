@@ -0,0 +1,71 @@
+import pytest
+
+import usuarios
+
+
+@pytest.fixture
+def usuarios_csv(tmp_path, monkeypatch):
+    caminho = tmp_path / "usuarios.csv"
+    monkeypatch.setattr(usuarios, "USER_CSV", str(caminho))
+    monkeypatch.setattr(usuarios, "SCRYPT_N", 2 ** 4)
+    monkeypatch.setattr(usuarios, "_HASH_FICTICIO", None)
+    return caminho
+
+
+def _gravar(caminho, linhas):
+    caminho.write_text("usuario,senha\n" + "".join(f"{u},{s}\n" for u, s in linhas), encoding="utf-8")
+
+
+def test_hash_confere_so_a_senha_certa():
+    for armazenado in (usuarios.gerar_hash("segredo", n=2 ** 4), usuarios.gerar_hash_pbkdf2("segredo", iteracoes=10)):
+        assert usuarios.eh_hash(armazenado)
+        assert usuarios.verificar_senha("segredo", armazenado)
+        assert not usuarios.verificar_senha("Segredo", armazenado)
+    # Sal novo a cada hash
+    assert usuarios.gerar_hash("segredo", n=2 ** 4) != usuarios.gerar_hash("segredo", n=2 ** 4)
+
+
+@pytest.mark.parametrize("armazenado", [
+    "scrypt$abc$8$1$AAAA$AAAA",
+    "scrypt$15$8$1$AAAA$AAAA",
+    "scrypt$16$8$1$%%%$AAAA",
+    "scrypt$" + str(2 ** 62) + "$8$1$AAAA$AAAA",
+    "scrypt$16$8$1$AAAA",
+    "pbkdf2_sha256$-1$AAAA$AAAA",
+    "pbkdf2_sha256$x$AAAA$AAAA",
+])
+def test_hash_malformado_recusa_sem_erro(armazenado):
+    assert usuarios.verificar_senha("segredo", armazenado) is False
+
+
+def test_usuario_inexistente_passa_pelo_hash_ficticio(usuarios_csv, monkeypatch):
+    _gravar(usuarios_csv, [("ana", usuarios.gerar_hash("segredo"))])
+    verificados = []
+    original = usuarios.verificar_senha
+    monkeypatch.setattr(usuarios, "verificar_senha", lambda s, a: verificados.append(a) or original(s, a))
+
+    assert usuarios.validar_login("bruno", "segredo") is False
+    assert verificados == [usuarios._HASH_FICTICIO]
+    assert usuarios._HASH_FICTICIO.startswith("scrypt$")
+
+
+def test_migracao_e_idempotente(usuarios_csv):
+    _gravar(usuarios_csv, [("ana", "123"), ("bruno", usuarios.gerar_hash("456"))])
+    assert usuarios.migrar_senhas() == 1
+    migrado = usuarios_csv.read_text(encoding="utf-8")
+    assert usuarios.migrar_senhas() == 0
+    assert usuarios_csv.read_text(encoding="utf-8") == migrado
+    assert usuarios.validar_login("ana", "123")
+    assert usuarios.validar_login("bruno", "456")
+
+
+def test_login_em_texto_puro_grava_o_hash(usuarios_csv):
+    _gravar(usuarios_csv, [("ana", "123"), ("bruno", "456")])
+    assert not usuarios.validar_login("ana", "errada")
+    assert "ana,123" in usuarios_csv.read_text(encoding="utf-8")
+
+    assert usuarios.validar_login("ana", "123")
+    senhas = usuarios.credenciais()
+    assert usuarios.eh_hash(senhas["ana"])
+    assert senhas["bruno"] == "456"
+    assert usuarios.validar_login("ana", "123")